@@ -0,0 +1,297 @@
+# alert_job.py
+# Daily alert fan-out: one shared market-data pass for every enabled user.
+# Run: python alert_job.py [--dry-run] [--sync]
+import argparse
+import datetime
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from alerts import ALERT_SENDER, SUMMARY_SUBJECT, get_resend, render_daily_summary
+from batch_summarizer import BATCH_ENABLED
+from data_fetcher import get_portfolio_news
+from instrumentation import profile_run, span, write_metrics
+from pipeline import run_pipeline
+from portfolio import load_portfolio, value_holdings
+from quotes import get_last_prices
+from rules import close_inputs, expand_spec, get_engine, parse_specs, position_inputs, render_alerts, sentiment_inputs
+
+load_dotenv()
+
+PAGE_SIZE = int(os.getenv("ALERT_PAGE_SIZE", "500"))
+BATCH_SIZE = 100  # Resend's batch endpoint accepts at most 100 emails per call
+SEND_CONCURRENCY = int(os.getenv("ALERT_SEND_CONCURRENCY", "4"))
+SEND_RETRIES = 3
+SEND_BACKOFF_SECONDS = 2.0
+BEARISH_THRESHOLD = -0.5
+
+
+# ----------------------------
+# Supabase / Resend adapters
+# ----------------------------
+# Both are plain callables so the job can run against local stand-ins. The
+# real clients also honour SUPABASE_URL / RESEND_API_URL, so pointing those
+# at a local stub server works without touching this module.
+def supabase_page_fetcher(client=None):
+    """Return `fetch(offset, limit)` reading enabled rows from `user_configs`."""
+    if client is None:
+        from supabase import create_client
+        client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+
+    def fetch(offset, limit):
+        response = (
+            client.table("user_configs").select("*").eq("enabled", True)
+            .order("email").range(offset, offset + limit - 1).execute()
+        )
+        return response.data or []
+    return fetch
+
+
+def resend_batch_sender(emails, idempotency_key=None):
+    """Send up to BATCH_SIZE emails in one Resend API call."""
+    with span("resend.batch") as s:
+        s.set(items=len(emails), bytes=sum(len(e["text"].encode("utf-8")) for e in emails))
+        options = {"idempotency_key": idempotency_key} if idempotency_key else None
+        return get_resend().Batch.send(emails, options)
+
+
+def iter_configs(fetch_page, page_size=PAGE_SIZE):
+    """Page through enabled configs until a short page comes back."""
+    offset = 0
+    while True:
+        rows = fetch_page(offset, page_size)
+        for row in rows:
+            if row.get("enabled", True) and row.get("email"):
+                yield row
+        if len(rows) < page_size:
+            return
+        offset += page_size
+
+
+# ----------------------------
+# Per-user holdings
+# ----------------------------
+def user_holdings(config, default_holdings):
+    """
+    Holdings to report for one user. A config may carry its own "tickers"
+    (list or comma-separated string) as a watchlist; otherwise the shared
+    portfolio is used.
+    """
+    tickers = config.get("tickers")
+    if not tickers:
+        return default_holdings
+    if isinstance(tickers, str):
+        tickers = tickers.split(",")
+    tickers = list(dict.fromkeys(t.strip().upper() for t in tickers if t and t.strip()))
+    return [{"ticker": t, "shares": 0.0, "buy_price": 0.0} for t in tickers]
+
+
+def user_rules(config, tickers, threshold):
+    """
+    Alert rule specs for one user: the config's own "rules" (list or JSON;
+    a spec without tickers covers all of the user's tickers) plus a
+    sentiment rule when "sentiment_alerts" is on.
+    """
+    specs = []
+    for spec in parse_specs(config.get("rules")):
+        specs.append(spec if spec.get("tickers") or spec.get("ticker") else dict(spec, tickers=list(tickers)))
+    if config.get("sentiment_alerts"):
+        specs.append({"kind": "sentiment", "tickers": list(tickers), "below": threshold})
+    return specs
+
+
+# ----------------------------
+# Sending
+# ----------------------------
+def _retryable(error):
+    """
+    Only transport failures and 5xx responses are worth retrying; a 4xx
+    (bad payload, auth, quota, idempotency conflict) fails the same way
+    again. The resend client reports connection errors as code 500.
+    """
+    code = getattr(error, "code", None)
+    if code is None:
+        return isinstance(error, (OSError, TimeoutError))
+    try:
+        return int(code) >= 500
+    except (TypeError, ValueError):
+        return False
+
+
+def _send_with_retry(send_batch, emails, key, retries=SEND_RETRIES, backoff=SEND_BACKOFF_SECONDS):
+    # Every attempt carries the same Idempotency-Key, so a retry after a
+    # timeout whose request actually landed doesn't deliver the batch twice.
+    for attempt in range(retries + 1):
+        try:
+            send_batch(emails, idempotency_key=key)
+            return True
+        except Exception as e:
+            if not _retryable(e):
+                print(f"❌ Batch {key} of {len(emails)} emails rejected: {e}")
+                return False
+            if attempt == retries:
+                print(f"❌ Batch {key} of {len(emails)} emails failed after {retries + 1} attempts: {e}")
+                return False
+            delay = backoff * (2 ** attempt)
+            print(f"⚠️ Batch send failed ({e}); retrying in {delay:.0f}s")
+            time.sleep(delay)
+
+
+def _batch_key(run_date, emails):
+    recipients = "\n".join(sorted(address for email in emails for address in email["to"]))
+    return f"daily-alerts/{run_date}/{hashlib.sha256(recipients.encode('utf-8')).hexdigest()[:32]}"
+
+
+def send_all(emails, send_batch=resend_batch_sender, concurrency=SEND_CONCURRENCY,
+             retries=SEND_RETRIES, backoff=SEND_BACKOFF_SECONDS, run_date=None):
+    """
+    Send `emails` in BATCH_SIZE chunks, at most `concurrency` calls in flight.
+    Each batch is keyed by `run_date` (today by default) and a hash of its
+    recipients, so re-sending the same batch that day is deduplicated by
+    Resend while a batch whose recipients changed goes out under a new key.
+    """
+    batches = [emails[i:i + BATCH_SIZE] for i in range(0, len(emails), BATCH_SIZE)]
+    if not batches:
+        return {"batches": 0, "sent": 0, "failed": 0}
+    run_date = run_date or datetime.date.today().isoformat()
+    keys = [_batch_key(run_date, batch) for batch in batches]
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        ok = list(pool.map(lambda b, k: _send_with_retry(send_batch, b, k, retries, backoff), batches, keys))
+    sent = sum(len(b) for b, success in zip(batches, ok) if success)
+    return {"batches": len(batches), "sent": sent, "failed": len(emails) - sent}
+
+
+# ----------------------------
+# Job
+# ----------------------------
+def _phase(stats, name, started, **counts):
+    seconds = time.perf_counter() - started
+    stats["phases"][name] = {"seconds": round(seconds, 3), **counts}
+    return seconds
+
+
+def run_daily_alerts(fetch_page=None, send_batch=None, page_size=PAGE_SIZE,
+                     concurrency=SEND_CONCURRENCY, threshold=BEARISH_THRESHOLD,
+                     max_workers=8, ticker_timeout=60, dry_run=False, batch=None):
+    """
+    Build and send every enabled user's daily summary.
+
+    Prices are fetched once and the news/summary pipeline runs once for the
+    union of all users' tickers (summaries through the OpenAI Batch API
+    unless `batch=False`; default FINGPT_LLM_BATCH); reports are rendered in
+    memory, with each user's newly triggered alert rules (rules.py) appended,
+    and sent via the batch endpoint. Returns per-phase stats.
+    """
+    stats = {"phases": {}}
+    fetch_page = fetch_page or supabase_page_fetcher()
+    send_batch = send_batch or resend_batch_sender
+
+    # 1. Configs
+    started = time.perf_counter()
+    configs = list(iter_configs(fetch_page, page_size))
+    seconds = _phase(stats, "configs", started, users=len(configs))
+    stats["phases"]["configs"]["users_per_sec"] = round(len(configs) / seconds, 1) if seconds else None
+    if not configs:
+        print("No enabled alert configs.")
+        return stats
+
+    default_holdings = None
+    plans = []
+    for config in configs:
+        if not config.get("tickers") and default_holdings is None:
+            default_holdings = load_portfolio()
+        plans.append((config, user_holdings(config, default_holdings or [])))
+    specs = {config["email"]: user_rules(config, [h["ticker"].strip().upper() for h in holdings], threshold)
+             for config, holdings in plans}
+
+    # 2. Prices: one batched download for the union
+    started = time.perf_counter()
+    requested = [h["ticker"].strip().upper() for _, holdings in plans for h in holdings]
+    union = list(dict.fromkeys(t for t in requested if t))
+    prices, failed = get_last_prices(union)
+    price_lookup = dict(zip(union, prices))
+    _phase(stats, "prices", started, tickers_requested=len(requested),
+           tickers_fetched=len(union), failed=len(failed))
+
+    # 3. News + summaries, once per ticker that some user's sentiment rule watches
+    started = time.perf_counter()
+    sentiment_requested = [
+        rule["ticker"]
+        for user_specs in specs.values() for spec in user_specs if spec.get("kind") == "sentiment"
+        for rule in expand_spec(spec)
+    ]
+    sentiment_union = list(dict.fromkeys(t for t in sentiment_requested if t))
+    analyses = {}
+    if sentiment_union:
+        # Warm the news cache for every ticker in one parallel pass first
+        get_portfolio_news(sentiment_union)
+        results, pipeline_stats = run_pipeline(
+            sentiment_union, max_workers=max_workers, ticker_timeout=ticker_timeout, incremental=True,
+            source="alert_job", batch=BATCH_ENABLED if batch is None else batch,
+        )
+        analyses = {r["ticker"]: r for r in results}
+        stats["pipeline"] = pipeline_stats
+    _phase(stats, "analysis", started, tickers_requested=len(sentiment_requested),
+           tickers_fetched=len(sentiment_union))
+
+    # 4. Alert rules: only rules whose inputs changed since the last run are evaluated
+    started = time.perf_counter()
+    engine = get_engine()
+    engine.sync(specs, source="alert_job")
+    inputs = {**sentiment_inputs(analyses.values()), **close_inputs(union)}
+    if default_holdings:
+        inputs.update(position_inputs(value_holdings(default_holdings, price_lookup)[0]))
+    alerts, rule_stats = engine.evaluate(inputs, recipients=[config["email"] for config, _ in plans],
+                                         commit=not dry_run, source="alert_job")
+    alerts_by_recipient = {}
+    for alert in alerts:
+        alerts_by_recipient.setdefault(alert["recipient"], []).append(alert)
+    notes = {t: r["summary"] for t, r in analyses.items() if r["summary"]}
+    _phase(stats, "rules", started, **{k: v for k, v in rule_stats.items() if k != "seconds"})
+
+    # 5. Render every report in memory
+    started = time.perf_counter()
+    emails = []
+    rendered = {}  # users sharing a portfolio/watchlist share one rendered report
+    for config, holdings in plans:
+        key = tuple((h["ticker"], h["shares"], h["buy_price"]) for h in holdings)
+        if key not in rendered:
+            df, summary = value_holdings(holdings, price_lookup)
+            rendered[key] = render_daily_summary(df, summary)
+        content = rendered[key]
+        # Each user's new alerts are merged into their one daily email
+        content += render_alerts(alerts_by_recipient.get(config["email"]), notes)
+        emails.append({"from": ALERT_SENDER, "to": [config["email"]], "subject": SUMMARY_SUBJECT, "text": content})
+    seconds = _phase(stats, "render", started, users=len(emails), distinct_reports=len(rendered))
+    stats["phases"]["render"]["users_per_sec"] = round(len(emails) / seconds, 1) if seconds else None
+
+    # 6. Send
+    started = time.perf_counter()
+    if dry_run:
+        result = {"batches": 0, "sent": 0, "failed": 0, "dry_run": len(emails)}
+    else:
+        result = send_all(emails, send_batch, concurrency)
+    seconds = _phase(stats, "send", started, **result)
+    stats["phases"]["send"]["users_per_sec"] = round(result["sent"] / seconds, 1) if seconds else None
+
+    stats["users"] = len(configs)
+    stats["wall_time"] = round(sum(p["seconds"] for p in stats["phases"].values()), 3)
+    print(f"✅ Daily alerts: {result['sent']}/{len(emails)} sent in {stats['wall_time']}s "
+          f"({len(union)} tickers fetched for {len(requested)} requested)")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dry-run", action="store_true", help="render every report but send nothing")
+    parser.add_argument("--sync", action="store_true", help="summarize with one OpenAI call per ticker instead of batch jobs")
+    args = parser.parse_args()
+    with profile_run("alert_job"):
+        stats = run_daily_alerts(dry_run=args.dry_run, batch=False if args.sync else None)
+    for name, phase in stats["phases"].items():
+        print(f"  {name:9s} {phase}")
+    if os.getenv("FINGPT_METRICS_FILE"):
+        write_metrics(os.getenv("FINGPT_METRICS_FILE"))
@@ -1,24 +1,46 @@
 # alerts.py (no attachment version)
 import os
-import resend
+import tempfile
 import traceback
 from dotenv import load_dotenv
 from portfolio import calculate_portfolio_value
 from summarizer import analyze_sentiment
+from instrumentation import span
 
 # --- Load environment ---
 load_dotenv()
 
 RESEND_API_KEY = os.getenv("RESEND_API_KEY")
-if not RESEND_API_KEY:
-    print("⚠️ Missing RESEND_API_KEY. Emails won't send.")
-else:
-    resend.api_key = RESEND_API_KEY
+
+ALERT_SENDER = "FinGPT Alerts <alerts@fingpt.me>"
+SUMMARY_SUBJECT = "Your FinGPT Daily Summary"
+
+
+def get_resend():
+    """The resend module with the API key applied; imported on first send."""
+    import resend
+    if not RESEND_API_KEY:
+        print("⚠️ Missing RESEND_API_KEY. Emails won't send.")
+    elif resend.api_key != RESEND_API_KEY:
+        resend.api_key = RESEND_API_KEY
+    return resend
 
 
 def generate_daily_summary():
     """Build portfolio summary text."""
     df, summary = calculate_portfolio_value()
+    message = render_daily_summary(df, summary)
+
+    # Save portfolio to CSV for attachment; a unique file per run so
+    # concurrent runs don't overwrite each other's report
+    fd, report_path = tempfile.mkstemp(prefix="portfolio_report_", suffix=".csv")
+    with os.fdopen(fd, "w", newline="") as f:
+        df.to_csv(f, index=False)
+    return message, report_path
+
+
+def render_daily_summary(df, summary):
+    """Render the summary text for one valued portfolio (in memory, no I/O)."""
     total_value = summary.get("Total Value ($)", 0)
     total_pnl = summary.get("Net P/L ($)", 0)
 
@@ -37,47 +59,84 @@ Sentiment Snapshot: {analyze_sentiment(str(df))}
 
 Generated automatically by FinGPT.me
 """
-    # Save portfolio to CSV for attachment
-    df.to_csv("portfolio_report.csv", index=False)
-    return message, "portfolio_report.csv"
+    return message
 
 import pandas as pd
-from summarizer import analyze_sentiment, summarize_text
-from data_fetcher import get_stock_data, get_extended_news
+from batch_summarizer import BATCH_ENABLED
+from pipeline import run_pipeline
+from rules import close_inputs, get_engine, parse_specs, position_inputs, render_alerts, sentiment_inputs
 
-def monitor_sentiment(threshold=-0.5):
+def alert_rules(threshold=-0.5, tickers=()):
     """
-    Monitors your portfolio sentiment and sends an alert if it turns bearish.
+    ALERT_EMAIL's rule specs: a sentiment rule over `tickers` plus any
+    extra specs in FINGPT_ALERT_RULES (JSON; see rules.expand_spec) — a spec
+    without tickers applies to the whole portfolio.
+    """
+    specs = [{"kind": "sentiment", "tickers": list(tickers), "below": threshold}]
+    for spec in parse_specs(os.getenv("FINGPT_ALERT_RULES")):
+        specs.append(spec if spec.get("tickers") or spec.get("ticker") else dict(spec, tickers=list(tickers)))
+    return specs
+
+
+def monitor_sentiment(threshold=-0.5, max_workers=8, ticker_timeout=60, batch=None):
+    """
+    Monitors your portfolio sentiment and emails ALERT_EMAIL one digest of
+    the alert rules (rules.py) that newly triggered.
+
+    Tickers are analyzed concurrently (`max_workers=1` runs them one at a time).
+    Summaries go through the OpenAI Batch API unless `batch=False` (default:
+    FINGPT_LLM_BATCH). Rules are only re-evaluated for inputs that changed
+    since the last scan, and a ticker that stays bearish alerts once.
+    Returns the bearish list, the new alerts, per-ticker results and
+    per-stage timing stats.
     """
     df, summary = calculate_portfolio_value()
-    bearish_tickers = []
-
-    for ticker in df["Ticker"]:
-        try:
-            data = get_stock_data(ticker)
-            news = get_extended_news(ticker)
-            news_text = "\n".join([n["title"] + ": " + n["summary"] for n in news])
-            summary_text = summarize_text(ticker, data, news_text)
-            sentiment = analyze_sentiment(summary_text)
-
-            # Convert sentiment to numeric score
-            score_map = {"positive": 1, "neutral": 0, "negative": -1}
-            score = score_map.get(sentiment, 0)
-
-            if score <= threshold:
-                bearish_tickers.append((ticker, sentiment, summary_text))
-        except Exception as e:
-            print(f"Error analyzing {ticker}: {e}")
-
-    if bearish_tickers:
-        alert_message = "🚨 **Bearish Sentiment Detected**\n\n"
-        for t, s, summary_text in bearish_tickers:
-            alert_message += f"**{t}** — {s.upper()}\n{summary_text[:400]}...\n\n"
-        send_email(os.getenv("ALERT_EMAIL"), alert_message)
-        print("✅ Bearish sentiment alert sent!")
+    tickers = list(df["Ticker"])
+    results, stats = run_pipeline(
+        tickers, max_workers=max_workers, ticker_timeout=ticker_timeout, incremental=True,
+        source="monitor", batch=BATCH_ENABLED if batch is None else batch,
+    )
+
+    # Results come back in portfolio order, so the alert is deterministic
+    bearish_tickers = [
+        (r["ticker"], r["sentiment"], r["summary"])
+        for r in results
+        if r["score"] is not None and r["score"] <= threshold
+    ]
+    incomplete = [r for r in results if r["status"] != "ok"]
+    for r in incomplete:
+        print(f"⚠️ {r['ticker']} analysis {r['status']}: {r['errors']}")
+
+    alerts = []
+    recipient = os.getenv("ALERT_EMAIL")
+    if recipient:
+        engine = get_engine()
+        engine.sync({recipient: alert_rules(threshold, tickers)}, source="monitor")
+        inputs = {**sentiment_inputs(results), **close_inputs(tickers), **position_inputs(df)}
+        alerts, rule_stats = engine.evaluate(inputs, recipients=[recipient], source="monitor")
+        stats["rules"] = rule_stats
+        print(f"🧮 Alert rules: {rule_stats['evaluated']} evaluated for {rule_stats['changed_inputs']} changed "
+              f"input(s), {rule_stats['fired']} fired, {rule_stats['suppressed']} in cooldown")
+    else:
+        print("⚠️ ALERT_EMAIL not set; alert rules not evaluated.")
+
+    if alerts:
+        alert_message = render_alerts(alerts, {r["ticker"]: r["summary"] for r in results if r["summary"]})
+        if incomplete:
+            alert_message += "\nIncomplete analysis: " + ", ".join(
+                f"{r['ticker']} ({', '.join(r['missing']) or r['status']})" for r in incomplete
+            ) + "\n"
+        send_email(recipient, alert_message)
+        print(f"✅ Alert digest with {len(alerts)} alert(s) sent!")
+    elif bearish_tickers:
+        print(f"No new alerts ({len(bearish_tickers)} bearish ticker(s) already alerted or in cooldown).")
     else:
         print("No bearish sentiment detected.")
 
+    print(f"⏱️ Sentiment scan of {stats['tickers']} tickers took {stats['wall_time']}s "
+          f"({stats['llm_skipped']} had no new articles and skipped the LLM)")
+    return {"bearish": bearish_tickers, "alerts": alerts, "results": results, "stats": stats}
+
 def send_email(recipient_email: str, content: str):
     """Send an email using Resend API (no attachment)."""
     if not RESEND_API_KEY:
@@ -86,13 +145,14 @@ def send_email(recipient_email: str, content: str):
 
     try:
         params = {
-            "from": "FinGPT Alerts <alerts@fingpt.me>",
+            "from": ALERT_SENDER,
             "to": [recipient_email],
-            "subject": "Your FinGPT Daily Summary",
+            "subject": SUMMARY_SUBJECT,
             "text": content
         }
 
-        response = resend.Emails.send(params)
+        with span("resend.send"):
+            response = get_resend().Emails.send(params)
         print(f"✅ Email sent successfully to {recipient_email}")
         return response
 
@@ -0,0 +1,327 @@
+# analytics.py
+"""
+Historical portfolio valuation and risk, as NumPy matrix operations.
+
+Closes for every holding (plus the benchmark) are aligned into one
+``(dates, tickers)`` matrix read straight from the history store. The matrix
+is kept per process and only grows by the bars that arrived since the last
+call; the metrics on top of it are a handful of vectorized passes.
+
+The equity curve is a backcast of today's holdings: each day's return is the
+value-weighted return of the holdings priced on both days, and the curve is
+scaled so its last point equals today's value.
+"""
+import os
+import threading
+from collections import OrderedDict
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+import history_store
+from instrumentation import span
+from portfolio_store import get_store
+
+BENCHMARK = os.getenv("FINGPT_BENCHMARK", "SPY")
+TRADING_DAYS = 252
+VOL_WINDOW = int(os.getenv("FINGPT_VOL_WINDOW", "21"))
+BETA_WINDOW = int(os.getenv("FINGPT_BETA_WINDOW", "63"))
+VAR_CONFIDENCE = float(os.getenv("FINGPT_VAR_CONFIDENCE", "0.95"))
+# Each distinct portfolio (ticker set) keeps a full-history matrix; the
+# least recently used ones are dropped past these caps
+_MATRICES_KEPT = int(os.getenv("FINGPT_MATRICES_KEPT", "8"))
+_RESULTS_KEPT = 32
+
+
+# ----------------------------
+# Vector helpers
+# ----------------------------
+def ffill(matrix):
+    """Forward-fill NaNs down each column (leading NaNs stay NaN)."""
+    rows = np.where(np.isnan(matrix), 0, np.arange(len(matrix))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return matrix[rows, np.arange(matrix.shape[1])]
+
+
+def rolling_std(x, window):
+    """Sample standard deviation over a trailing `window` (NaN until it is full)."""
+    out = np.full(len(x), np.nan)
+    if len(x) < window or window < 2:
+        return out
+    c1 = np.cumsum(np.r_[0.0, x])
+    c2 = np.cumsum(np.r_[0.0, x * x])
+    s1 = c1[window:] - c1[:-window]
+    s2 = c2[window:] - c2[:-window]
+    var = (s2 - s1 * s1 / window) / (window - 1)
+    out[window - 1:] = np.sqrt(np.clip(var, 0, None))
+    return out
+
+
+def rolling_beta(r, benchmark, window):
+    """Trailing-window beta of `r` against `benchmark` (NaN until the window is full)."""
+    out = np.full(len(r), np.nan)
+    if len(r) < window or window < 2:
+        return out
+
+    def trailing(x):
+        c = np.cumsum(np.r_[0.0, x])
+        return c[window:] - c[:-window]
+
+    sr, sb = trailing(r), trailing(benchmark)
+    cov = trailing(r * benchmark) - sr * sb / window
+    var = trailing(benchmark * benchmark) - sb * sb / window
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[window - 1:] = np.where(var > 0, cov / var, np.nan)
+    return out
+
+
+def column_betas(returns, valid, benchmark):
+    """Beta of every column of `returns` vs `benchmark`, using only the rows each column has."""
+    mask = valid.astype(float)
+    n = mask.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_r = (returns * mask).sum(axis=0) / n
+        mean_b = (benchmark[:, None] * mask).sum(axis=0) / n
+        db = (benchmark[:, None] - mean_b) * mask
+        cov = ((returns - mean_r) * db).sum(axis=0)
+        var = (db * db).sum(axis=0)
+        return np.where((n > 2) & (var > 0), cov / var, np.nan)
+
+
+def max_drawdown(values):
+    """(drawdown series, worst drawdown, peak index, trough index)."""
+    peaks = np.maximum.accumulate(values)
+    drawdown = values / peaks - 1
+    trough = int(np.argmin(drawdown))
+    peak = int(np.argmax(values[:trough + 1]))
+    return drawdown, float(drawdown[trough]), peak, trough
+
+
+def value_at_risk(returns, value, confidence=VAR_CONFIDENCE):
+    """One-day VaR in currency: historical (empirical quantile) and parametric (normal)."""
+    if len(returns) < 2:
+        return {"historical": None, "parametric": None}
+    tail = 1 - confidence
+    historical = -np.quantile(returns, tail) * value
+    parametric = -(returns.mean() + NormalDist().inv_cdf(tail) * returns.std(ddof=1)) * value
+    return {"historical": float(historical), "parametric": float(parametric)}
+
+
+# ----------------------------
+# Price matrix
+# ----------------------------
+class PriceMatrix:
+    """Aligned daily closes for a fixed ticker list, grown incrementally as bars arrive."""
+
+    def __init__(self, tickers):
+        self.tickers = list(tickers)
+        self.days = np.empty(0, dtype=np.int64)
+        self.prices = np.empty((0, len(self.tickers)))
+        self._versions = [None] * len(self.tickers)
+        self._last_days = [None] * len(self.tickers)
+        self._lock = threading.Lock()
+        self.revision = 0
+
+    def _load(self, changed):
+        """Read every changed column, then rebuild or append. Returns rows added."""
+        # Re-read each column's last known bar too: the store rewrites it once a partial session settles
+        fresh = {
+            i: history_store.read_closes(self.tickers[i], None if self._last_days[i] is None else self._last_days[i] - 1)
+            for i in changed
+        }
+        new_days = np.unique(np.concatenate([d for d, _ in fresh.values()] + [np.empty(0, dtype=np.int64)]))
+        if len(new_days) == 0:
+            return 0
+        end = self.days[-1] if len(self.days) else None
+        if end is not None and new_days[0] <= end and not np.isin(new_days[new_days <= end], self.days).all():
+            # A bar landed on a date the matrix doesn't have yet; realign from scratch
+            return self._rebuild()
+
+        first_new = len(self.days)
+        appended = new_days[new_days > end] if end is not None else new_days
+        if len(appended):
+            self.days = np.concatenate([self.days, appended])
+            self.prices = np.vstack([self.prices, np.full((len(appended), len(self.tickers)), np.nan)])
+        touched = first_new
+        for i, (days, closes) in fresh.items():
+            if len(days):
+                rows = np.searchsorted(self.days, days)
+                self.prices[rows, i] = closes
+                touched = min(touched, int(rows[0]))
+                self._last_days[i] = int(days[-1])
+        # Carry prices over gaps in the rows that changed (and from the row before them)
+        start = max(touched - 1, 0)
+        self.prices[start:] = ffill(self.prices[start:])
+        return len(appended)
+
+    def _rebuild(self):
+        self.days = np.empty(0, dtype=np.int64)
+        self.prices = np.empty((0, len(self.tickers)))
+        self._last_days = [None] * len(self.tickers)
+        return self._load(range(len(self.tickers)))
+
+    def update(self):
+        """Pull bars stored since the last call. Returns the number of new rows."""
+        with self._lock:
+            versions = [history_store.version(t) for t in self.tickers]
+            changed = [i for i, v in enumerate(versions) if v != self._versions[i]]
+            if not changed:
+                return 0
+            added = self._load(changed)
+            self._versions = versions
+            self.revision += 1
+            return added
+
+    def snapshot(self):
+        """(days, prices, revision, tickers without stored history), consistent with each other."""
+        with self._lock:
+            missing = [t for t, d in zip(self.tickers, self._last_days) if d is None]
+            return self.days, self.prices.copy(), self.revision, missing
+
+
+_matrices = OrderedDict()
+_results = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def price_matrix(tickers):
+    """The process-wide PriceMatrix for `tickers`, brought up to date."""
+    key = tuple(tickers)
+    with _cache_lock:
+        matrix = _matrices.get(key)
+        if matrix is None:
+            matrix = _matrices[key] = PriceMatrix(key)
+            while len(_matrices) > _MATRICES_KEPT:
+                _matrices.popitem(last=False)
+        else:
+            _matrices.move_to_end(key)
+    with span("analytics.matrix", tickers=str(len(key))) as s:
+        added = matrix.update()
+        s.set(items=added, cache="hit" if added == 0 else "miss")
+    return matrix
+
+
+# ----------------------------
+# Portfolio analytics
+# ----------------------------
+def _window_start(days, period):
+    offset = history_store.PERIODS.get(period)
+    if offset is None or not len(days):
+        return 0
+    last = pd.Timestamp(int(days[-1]), unit="D")
+    start_day = np.datetime64((last - offset).date(), "D").astype("int64")
+    # One bar earlier so the first day in the window has a return
+    return max(int(np.searchsorted(days, start_day, side="left")) - 1, 0)
+
+
+def _compute(tickers, shares, days, prices, benchmark):
+    prev, cur = prices[:-1], prices[1:]
+    valid = np.isfinite(prev) & np.isfinite(cur)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        asset_returns = np.where(valid, cur / prev - 1, 0.0)
+    positions = np.where(valid, prev * shares, 0.0)
+    invested = positions.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.where(invested > 0, (positions * asset_returns).sum(axis=1) / invested, 0.0)
+
+    current_value = float(np.nansum(prices[-1] * shares))
+    growth = np.r_[1.0, np.cumprod(1 + returns)]
+    values = current_value * growth / growth[-1]
+    drawdown, worst, peak, trough = max_drawdown(values)
+
+    volatility = rolling_std(returns, VOL_WINDOW) * np.sqrt(TRADING_DAYS)
+    dates = pd.DatetimeIndex(days.astype("datetime64[D]"), name="date")
+    frame = pd.DataFrame({
+        "Value": values,
+        "Return": np.r_[np.nan, returns],
+        "Drawdown": drawdown,
+        "Volatility": np.r_[np.nan, volatility],
+    }, index=dates)
+
+    positions_now = np.where(np.isfinite(prices[-1]), prices[-1] * shares, 0.0)
+    weights = positions_now / current_value if current_value else positions_now
+    # Per-holding volatility over the days each one actually traded
+    counts = valid.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = asset_returns.sum(axis=0) / counts
+        variances = (((asset_returns - means) * valid) ** 2).sum(axis=0) / (counts - 1)
+        holding_vol = np.where(counts > 1, np.sqrt(variances) * np.sqrt(TRADING_DAYS), np.nan)
+    holdings = pd.DataFrame({"Ticker": tickers, "Weight": weights, "Volatility": holding_vol})
+
+    beta = None
+    if benchmark is not None:
+        b_valid = np.isfinite(benchmark[:-1]) & np.isfinite(benchmark[1:])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            b_returns = np.where(b_valid, benchmark[1:] / benchmark[:-1] - 1, 0.0)
+        rows = b_valid & (invested > 0)
+        if rows.sum() > 2 and b_returns[rows].var() > 0:
+            beta = float(np.cov(returns[rows], b_returns[rows])[0, 1] / b_returns[rows].var(ddof=1))
+        frame["Beta"] = np.r_[np.nan, rolling_beta(returns, b_returns, BETA_WINDOW)]
+        holdings["Beta"] = column_betas(asset_returns, valid & b_valid[:, None], b_returns)
+
+    annual_vol = float(returns.std(ddof=1) * np.sqrt(TRADING_DAYS)) if len(returns) > 1 else None
+    metrics = {
+        "value": current_value,
+        "total_return": float(growth[-1] - 1),
+        "max_drawdown": worst,
+        "drawdown_peak": dates[peak],
+        "drawdown_trough": dates[trough],
+        "volatility": annual_vol,
+        "beta": beta,
+        "var": value_at_risk(returns, current_value),
+        "var_confidence": VAR_CONFIDENCE,
+        "days": len(returns),
+    }
+    return {"frame": frame, "metrics": metrics, "holdings": holdings}
+
+
+def portfolio_analytics(holdings=None, period="1y", benchmark=BENCHMARK):
+    """
+    Equity curve, drawdown, rolling volatility / beta and VaR for `holdings`
+    (default: the stored portfolio) over `period`, from stored history only.
+
+    Returns {"frame", "metrics", "holdings", "missing"}, or None when no
+    holding has stored history yet.
+    """
+    # The store directly rather than portfolio.load_portfolio, which pulls in yfinance
+    holdings = get_store().holdings() if holdings is None else holdings
+    shares_by_ticker = {}
+    for h in holdings:
+        ticker = h["ticker"].strip().upper()
+        shares_by_ticker[ticker] = shares_by_ticker.get(ticker, 0.0) + float(h["shares"])
+    tickers = sorted(shares_by_ticker)
+    if not tickers:
+        return None
+    benchmark = (benchmark or "").strip().upper() or None
+
+    columns = tickers + ([benchmark] if benchmark and benchmark not in shares_by_ticker else [])
+    matrix = price_matrix(columns)
+    all_days, all_prices, revision, unavailable = matrix.snapshot()
+    missing = [t for t in unavailable if t in shares_by_ticker]
+    if len(all_days) < 2 or len(missing) == len(tickers):
+        return {"frame": None, "metrics": None, "holdings": None, "missing": missing, "benchmark": None}
+
+    shares = np.array([shares_by_ticker[t] for t in tickers])
+    key = (tuple(columns), tuple(shares), period, revision)
+    with _cache_lock:
+        result = _results.get(key)
+        if result is not None:
+            _results.move_to_end(key)
+    if result is not None:
+        return result
+
+    with span("analytics.compute", tickers=str(len(tickers))):
+        start = _window_start(all_days, period)
+        bench = None
+        if benchmark and benchmark not in unavailable:
+            bench = all_prices[start:, columns.index(benchmark)]
+        result = _compute(tickers, shares, all_days[start:], all_prices[start:, :len(tickers)], bench)
+        result["missing"] = missing
+        result["benchmark"] = benchmark if bench is not None else None
+
+    with _cache_lock:
+        _results[key] = result
+        while len(_results) > _RESULTS_KEPT:
+            _results.popitem(last=False)
+    return result
@@ -1,58 +1,84 @@
 # app.py
 import streamlit as st
-import pandas as pd
 import time
-import matplotlib.pyplot as plt
-import json, os, re
+import os, re, queue
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from alpha_vantage.timeseries import TimeSeries
+from av_scheduler import DeadlineExceeded, get_scheduler
+from cache import get_cache
+import jobs
+from instrumentation import prometheus_text, start_metrics_server, start_profile, stop_profile
+from instrumentation import summary as performance_summary
+
+# Streamlit re-executes this script on every interaction. Heavy libraries
+# (pandas, yfinance, plotly, OpenAI, Supabase, Resend) are imported inside the
+# section that uses them, and long-lived clients are created once per process.
 
 # --- Load environment ---
 load_dotenv()
 
 # =====================================================
-# SAFE DATA FETCHER (Alpha Vantage ONLY)
+# SAFE DATA FETCHER (Alpha Vantage via local history store)
 # =====================================================
-@st.cache_data(ttl=3600)
 def safe_download(ticker, period="6mo"):
     """
-    Fetch historical daily stock data from Alpha Vantage (compact for free-tier).
+    Fetch historical daily stock data for `period` from the local OHLCV store,
+    which tops itself up from Alpha Vantage with one small delta call per day.
     """
     import pandas as pd
-    import os
+    from history_store import get_history, last_bar_date
 
     ALPHA_KEY = os.getenv("ALPHA_VANTAGE_KEY")
-    if not ALPHA_KEY:
+    if not ALPHA_KEY and last_bar_date(ticker) is None:
         st.error("Missing ALPHA_VANTAGE_KEY in .env file.")
         return pd.DataFrame()
 
     try:
-        ts = TimeSeries(key=ALPHA_KEY, output_format="pandas")
-        data, meta = ts.get_daily(symbol=ticker, outputsize="compact")  # ~100 days
-        data = data.rename(columns={
-            "1. open": "Open",
-            "2. high": "High",
-            "3. low": "Low",
-            "4. close": "Close",
-            "5. volume": "Volume"
-        })
-        data.index = pd.to_datetime(data.index)
-        data = data.sort_index()
-        print(f"✅ Loaded {len(data)} rows from Alpha Vantage for {ticker}")
+        data = get_history(ticker, period)
+        print(f"✅ Loaded {len(data)} rows ({period}) for {ticker}")
         return data
     except Exception as e:
         print(f"❌ Alpha Vantage error for {ticker}: {e}")
         return pd.DataFrame()
 
 
-# =====================================================
-# IMPORTS FOR APP FUNCTIONALITY
-# =====================================================
-from supabase import create_client, Client
-from data_fetcher import get_stock_data, get_extended_news
-from summarizer import summarize_text, analyze_sentiment
-from portfolio import add_holding, remove_holding, calculate_portfolio_value
-from alerts import send_email, generate_daily_summary
+@st.cache_resource(show_spinner=False)
+def get_supabase():
+    """Supabase client shared by every session; None when credentials are missing."""
+    url, key = os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY")
+    if not (url and key):
+        return None
+    from supabase import create_client
+    try:
+        return create_client(url, key)
+    except Exception as e:
+        print(f"❌ Supabase client error: {e}")
+        return None
+
+
+def track_job(job_id, label):
+    """Remember a queued job for this session so its status is shown until it finishes."""
+    st.session_state.setdefault("jobs", {})[job_id] = label
+
+
+@st.fragment(run_every=3)
+def job_status_panel():
+    """Status of this session's background jobs, refreshed every few seconds."""
+    tracked = st.session_state.get("jobs", {})
+    for job_id, label in list(tracked.items())[-5:]:
+        job = jobs.status(job_id)
+        if job is None:
+            continue
+        if job["status"] == jobs.SUCCEEDED:
+            st.success(f"✅ {label}: done")
+        elif job["status"] == jobs.FAILED:
+            st.error(f"❌ {label}: failed after {job['attempts']} attempt(s) — {job['error']}")
+        elif job["status"] == jobs.RUNNING:
+            st.info(f"⏳ {label}: running (attempt {job['attempts']}/{job['max_attempts']})")
+        elif job["attempts"]:
+            st.warning(f"🔁 {label}: retrying after an error — {job['error']}")
+        else:
+            st.info(f"🕒 {label}: queued")
 
 
 # =====================================================
@@ -60,14 +86,12 @@ from alerts import send_email, generate_daily_summary
 # =====================================================
 st.set_page_config(page_title="FinGPT-Personal", layout="wide")
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+# Profile this rerun when FINGPT_PROFILE is set or the sidebar asked for it
+start_profile("streamlit", mode="cprofile" if st.session_state.pop("profile_next_run", False) else None)
+start_metrics_server()
 
-if SUPABASE_URL and SUPABASE_KEY:
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-else:
+if not (os.getenv("SUPABASE_URL") and os.getenv("SUPABASE_KEY")):
     st.error("⚠️ Supabase credentials missing. Please set SUPABASE_URL and SUPABASE_KEY in your environment.")
-    supabase = None
 
 
 # =====================================================
@@ -92,10 +116,41 @@ st.title("FinGPT+ : Your Private Equity Workstation")
 # Sidebar navigation
 section = st.sidebar.radio("Navigate", ["AI Research Copilot", "Portfolio Tracker", "Daily Alerts Setup"])
 
+av_usage = get_scheduler().usage()
+st.sidebar.caption(
+    f"Alpha Vantage quota: {av_usage['day_remaining']:.0f} calls left today, "
+    f"{av_usage['calls']} made, {av_usage['coalesced']} merged"
+)
+cache_stats = get_cache().stats()
+cache_hits = sum(c["memory_hits"] + c["disk_hits"] for c in cache_stats["namespaces"].values())
+cache_misses = sum(c["misses"] for c in cache_stats["namespaces"].values())
+st.sidebar.caption(
+    f"Cache: {cache_hits} hits / {cache_misses} misses, "
+    f"{cache_stats['memory_bytes'] / 1e6:.1f} of {cache_stats['memory_limit'] / 1e6:.0f} MB in memory"
+)
+job_counts = jobs.get_queue().counts()
+st.sidebar.caption(
+    f"Background jobs: {job_counts.get(jobs.QUEUED, 0)} queued, {job_counts.get(jobs.RUNNING, 0)} running"
+)
+with st.sidebar.expander("⏱️ Performance"):
+    performance_rows = performance_summary()
+    if performance_rows:
+        st.caption("Timed calls since this server process started (p50/p95 over recent calls).")
+        st.dataframe(performance_rows, use_container_width=True, hide_index=True)
+    else:
+        st.caption("No calls recorded yet.")
+    if st.button("Profile next rerun"):
+        st.session_state["profile_next_run"] = True
+        st.caption("The next rerun will be written to a cProfile dump.")
+    st.download_button("Download metrics", prometheus_text(), file_name="fingpt_metrics.prom", mime="text/plain")
+
 # =====================================================
 # PORTFOLIO TRACKER
 # =====================================================
 if section == "Portfolio Tracker":
+    import pandas as pd
+    from portfolio import add_holding, remove_holding, calculate_portfolio_value, get_lots
+
     st.header("Portfolio Tracker")
 
     with st.expander("➕ Add Holding"):
@@ -105,12 +160,21 @@ if section == "Portfolio Tracker":
         if st.button("Add to Portfolio"):
             add_holding(ticker, shares, buy_price)
             st.success(f"Added {shares} shares of {ticker} @ ${buy_price}")
+            # History, fundamentals and the summary are fetched by the worker, not this request
+            if ticker.strip():
+                new_ticker = ticker.strip().upper()
+                track_job(jobs.enqueue("analyze_prefetch", {"ticker": new_ticker},
+                                       dedupe_key=f"analyze_prefetch:{new_ticker}"), f"Fetch {new_ticker}")
 
     portfolio_df, summary = calculate_portfolio_value()
+    if summary.get("Failed Tickers"):
+        st.warning(f"No recent price data for: {', '.join(summary['Failed Tickers'])}")
 
     if not portfolio_df.empty:
         st.subheader("Your Holdings")
         st.dataframe(portfolio_df)
+        with st.expander("Lots (per-purchase cost basis)"):
+            st.dataframe(pd.DataFrame(get_lots()))
 
         st.subheader("Portfolio Summary")
         st.metric(label="Total Value ($)", value=f"{summary['Total Value ($)']:,}")
@@ -120,6 +184,43 @@ if section == "Portfolio Tracker":
         if remove_ticker != "None" and st.button("Remove"):
             remove_holding(remove_ticker)
             st.warning(f"Removed {remove_ticker} from portfolio.")
+
+        st.subheader("Performance & Risk")
+        from analytics import portfolio_analytics
+
+        risk_period = st.selectbox("Window", ["3mo", "6mo", "1y", "2y", "5y", "max"], index=2, key="risk_period")
+        risk = portfolio_analytics(period=risk_period)
+        if risk and risk["missing"]:
+            st.caption(f"No stored price history yet for: {', '.join(risk['missing'])}. "
+                       "Analyze them once (or let the cache warmer run) to include them.")
+            if st.button("Fetch missing history in the background"):
+                for missing_ticker in risk["missing"]:
+                    track_job(jobs.enqueue("analyze_prefetch", {"ticker": missing_ticker},
+                                           dedupe_key=f"analyze_prefetch:{missing_ticker}"), f"Fetch {missing_ticker}")
+        if st.session_state.get("jobs"):
+            job_status_panel()
+        if not risk or risk["frame"] is None:
+            st.info("Not enough stored price history to chart performance yet.")
+        else:
+            metrics = risk["metrics"]
+            var = metrics["var"]
+            col_dd, col_vol, col_beta, col_var = st.columns(4)
+            col_dd.metric("Max Drawdown", f"{metrics['max_drawdown']:.1%}",
+                          help=f"{metrics['drawdown_peak'].date()} → {metrics['drawdown_trough'].date()}")
+            col_vol.metric("Volatility (ann.)", f"{metrics['volatility']:.1%}" if metrics["volatility"] is not None else "—")
+            col_beta.metric(f"Beta vs {risk['benchmark'] or 'benchmark'}",
+                            f"{metrics['beta']:.2f}" if metrics["beta"] is not None else "—")
+            col_var.metric(f"1-day VaR ({metrics['var_confidence']:.0%})",
+                           f"${var['historical']:,.0f}" if var["historical"] is not None else "—",
+                           help=f"Parametric (normal): ${var['parametric']:,.0f}" if var["parametric"] is not None else None)
+
+            frame = risk["frame"]
+            st.line_chart(frame["Value"], height=250)
+            st.area_chart(frame["Drawdown"], height=150)
+            rolling = [c for c in ("Volatility", "Beta") if c in frame]
+            st.line_chart(frame[rolling], height=150)
+            with st.expander("Per-holding risk"):
+                st.dataframe(risk["holdings"].set_index("Ticker"))
     else:
         st.info("Your portfolio is empty. Add holdings above to get started.")
 
@@ -128,13 +229,19 @@ if section == "Portfolio Tracker":
 # AI RESEARCH COPILOT
 # =====================================================
 elif section == "AI Research Copilot":
-    import plotly.graph_objects as go
-    from plotly.subplots import make_subplots
+    import pandas as pd
+    from charts import lead_lag_chart, price_chart, sentiment_gauge, sentiment_history_chart
+    from data_fetcher import get_stock_data, get_extended_news
+    from history_store import get_history
+    from indicators import indicators_for
+    from sentiment import label, sentiment_score
+    import sentiment_store
+    from summarizer import summarize_text_stream, normalize_summary, FALLBACK_SUMMARY, STREAM_INCOMPLETE
 
     st.header("AI Equity Research Copilot")
 
     ticker = st.text_input("Enter Stock Ticker (e.g. AAPL)", "AAPL").upper()
-    period = st.selectbox("Select Price History Range", ["1mo", "3mo", "6mo", "1y"], index=2)
+    period = st.selectbox("Select Price History Range", ["1mo", "3mo", "6mo", "1y", "2y", "5y", "max"], index=2)
 
     # Indicators
     st.markdown("**Indicators**")
@@ -147,106 +254,54 @@ elif section == "AI Research Copilot":
         show_macd = st.checkbox("MACD (12, 26, 9)", value=True)
 
     if st.button("Analyze"):
-        with st.spinner('Fetching fundamentals...'):
-            data = get_stock_data(ticker)
-
-        with st.spinner(f'Fetching {period} price history...'):
-            hist = safe_download(ticker, period)
-
-        if hist.empty:
-            st.warning("No historical data found for this ticker / period.")
-            st.stop()
-
-        with st.spinner('Fetching latest news...'):
-            news_items = get_extended_news(ticker)
-
-        with st.spinner('Generating AI summary...'):
-            news_text = "\n".join([f"{n['title']}: {n['summary']}" for n in news_items])
-            summary = summarize_text(ticker, data, news_text)
-            sentiment = analyze_sentiment(summary)
-
+        # Lay out every section up front; each one fills in as soon as its data lands
         st.subheader(f"Fundamentals for {ticker}")
-        if data:
-            fundamentals_df = pd.DataFrame([data]).T
-            fundamentals_df.columns = ["Value"]
-            st.table(fundamentals_df)
-        else:
-            st.info("No fundamental data available.")
-
-        # --- Chart ---
+        fundamentals_slot = st.empty()
+        fundamentals_slot.info("Fetching fundamentals...")
         st.subheader(f"Price History ({period}) — Interactive Chart")
-
-        if show_ma and len(hist) >= 50:
-            hist["MA50"] = hist["Close"].rolling(window=50).mean()
-        if show_ma and len(hist) >= 200:
-            hist["MA200"] = hist["Close"].rolling(window=200).mean()
-
-        # RSI
-        delta = hist["Close"].diff()
-        gain = delta.clip(lower=0)
-        loss = -delta.clip(upper=0)
-        avg_gain = gain.ewm(alpha=1/14, min_periods=14, adjust=False).mean()
-        avg_loss = loss.ewm(alpha=1/14, min_periods=14, adjust=False).mean()
-        rs = avg_gain / avg_loss
-        hist["RSI"] = 100 - (100 / (1 + rs))
-
-        # MACD
-        fast_ema = hist["Close"].ewm(span=12, adjust=False).mean()
-        slow_ema = hist["Close"].ewm(span=26, adjust=False).mean()
-        hist["MACD"] = fast_ema - slow_ema
-        hist["Signal"] = hist["MACD"].ewm(span=9, adjust=False).mean()
-        hist["MACD_Hist"] = hist["MACD"] - hist["Signal"]
-
-        # Plotly chart
-        subplot_titles = ["Price (Candlesticks)", "Volume"]
-        row_heights = [0.5, 0.2]
-        if show_rsi:
-            subplot_titles.append("RSI (14)")
-            row_heights.append(0.15)
-        if show_macd:
-            subplot_titles.append("MACD (12, 26, 9)")
-            row_heights.append(0.15)
-
-        fig = make_subplots(
-            rows=len(subplot_titles),
-            cols=1,
-            shared_xaxes=True,
-            row_heights=row_heights,
-            vertical_spacing=0.03,
-            subplot_titles=tuple(subplot_titles)
-        )
-
-        fig.add_trace(go.Candlestick(
-            x=hist.index, open=hist['Open'], high=hist['High'],
-            low=hist['Low'], close=hist['Close'],
-            name='Price', increasing_line_color="green", decreasing_line_color="red"
-        ), row=1, col=1)
-
-        if show_ma and "MA50" in hist:
-            fig.add_trace(go.Scatter(x=hist.index, y=hist["MA50"], line=dict(color="blue"), name="MA50"), row=1, col=1)
-        if show_ma and "MA200" in hist:
-            fig.add_trace(go.Scatter(x=hist.index, y=hist["MA200"], line=dict(color="orange"), name="MA200"), row=1, col=1)
-
-        vol_colors = ["green" if c >= o else "red" for o, c in zip(hist["Open"], hist["Close"])]
-        fig.add_trace(go.Bar(x=hist.index, y=hist["Volume"], marker_color=vol_colors, name="Volume"), row=2, col=1)
-
-        if show_rsi:
-            fig.add_trace(go.Scatter(x=hist.index, y=hist["RSI"], line=dict(color="purple"), name="RSI"), row=3, col=1)
-        if show_macd:
-            fig.add_trace(go.Scatter(x=hist.index, y=hist["MACD"], line=dict(color="blue"), name="MACD"), row=len(subplot_titles), col=1)
-            fig.add_trace(go.Scatter(x=hist.index, y=hist["Signal"], line=dict(color="orange"), name="Signal"), row=len(subplot_titles), col=1)
-            fig.add_trace(go.Bar(x=hist.index, y=hist["MACD_Hist"], name="MACD Hist", opacity=0.4), row=len(subplot_titles), col=1)
-
-        fig.update_layout(height=900, template="plotly_white", title=f"{ticker} — Price, Volume, RSI & MACD ({period})")
-        st.plotly_chart(fig, use_container_width=True)
-
-        # --- Recent News ---
+        chart_slot = st.empty()
+        chart_slot.info(f"Fetching {period} price history...")
         st.subheader("Recent News")
-        for n in news_items:
-            st.markdown(f"- [{n['title']}]({n['link']})")
-
-        # --- AI Summary (CLEAN RENDER) ---
+        news_slot = st.empty()
+        news_slot.info("Fetching latest news...")
         st.subheader("AI Summary")
+        summary_slot = st.empty()
+        summary_slot.info("Waiting for fundamentals and news...")
+        sentiment_box = st.container()
+
+        def render_fundamentals(data):
+            if data:
+                fundamentals_df = pd.DataFrame([data]).T
+                fundamentals_df.columns = ["Value"]
+                fundamentals_slot.table(fundamentals_df)
+            else:
+                fundamentals_slot.info("No fundamental data available.")
+
+        def render_chart(hist):
+            if hist.empty:
+                chart_slot.warning("No historical data found for this ticker / period.")
+                return
+
+            # Indicators run over the full stored history (so MA200 exists on short ranges),
+            # are cached per ticker + last bar, and are then aligned to the chart range
+            indicators = indicators_for(ticker, get_history(ticker, "max", refresh_first=False)).reindex(hist.index)
+
+            # Long ranges are downsampled to the chart width before they are sent to the browser
+            fig, chart_stats = price_chart(
+                hist, indicators, f"{ticker} — Price, Volume, RSI & MACD ({period})",
+                show_ma=show_ma, show_rsi=show_rsi, show_macd=show_macd,
+            )
+            with chart_slot.container():
+                st.plotly_chart(fig, use_container_width=True)
+                if chart_stats["candles"] < chart_stats["bars"]:
+                    st.caption(f"{chart_stats['bars']} daily bars shown as {chart_stats['candles']} candles "
+                               f"({chart_stats['payload_bytes'] / 1024:.0f} KB chart payload)")
+
+        def render_news(news_items):
+            if news_items:
+                news_slot.markdown("\n".join(f"- [{n['title']}]({n['link']})" for n in news_items))
+            else:
+                news_slot.info("No recent news found.")
 
         def clean_html(raw_text):
             """Remove HTML tags and entities the AI might include."""
@@ -254,6 +309,67 @@ elif section == "AI Research Copilot":
             raw_text = re.sub(r"&[a-z]+;", "", raw_text)  # Remove entities
             return raw_text.strip()
 
+        # --- Fetch everything concurrently, render in completion order ---
+        renderers = {"fundamentals": render_fundamentals, "history": render_chart, "news": render_news}
+        defaults = {"fundamentals": {}, "history": pd.DataFrame(), "news": []}
+        results = {}
+        tokens = queue.Queue()
+        streamed = ""
+        summary_started = summary_done = summary_incomplete = False
+
+        def stream_summary(data, news):
+            try:
+                for chunk in summarize_text_stream(ticker, data, news):
+                    tokens.put(chunk)
+            finally:
+                tokens.put(None)
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            pending = {
+                pool.submit(get_stock_data, ticker): "fundamentals",
+                pool.submit(safe_download, ticker, period): "history",
+                pool.submit(get_extended_news, ticker): "news",
+            }
+            while pending or not summary_done:
+                for future in [f for f in pending if f.done()]:
+                    name = pending.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except DeadlineExceeded as e:
+                        st.warning(f"⏳ {e}; showing the rest without it. Try again in a minute.")
+                        results[name] = defaults[name]
+                    except Exception as e:
+                        print(f"❌ {name} fetch failed for {ticker}: {e}")
+                        results[name] = defaults[name]
+                    renderers[name](results[name])
+
+                if not summary_started and "fundamentals" in results and "news" in results:
+                    pool.submit(stream_summary, results["fundamentals"], results["news"])
+                    summary_started = True
+
+                while True:
+                    try:
+                        chunk = tokens.get_nowait()
+                    except queue.Empty:
+                        break
+                    if chunk is None:
+                        summary_done = True
+                        break
+                    if chunk is STREAM_INCOMPLETE:
+                        summary_incomplete = True
+                        continue
+                    streamed += chunk
+                    summary_slot.markdown(streamed + " ▌")
+
+                time.sleep(0.05)
+
+        # --- AI Summary (CLEAN RENDER) ---
+        summary = normalize_summary(streamed) or FALLBACK_SUMMARY
+        # A cut-off or missing summary would score as whatever fragment arrived
+        summary_complete = not summary_incomplete and summary != FALLBACK_SUMMARY
+        score = sentiment_score(summary) if summary_complete else None
+        sentiment = label(score) if summary_complete else None
+
         # Clean any stray HTML from the AI response
         cleaned_summary = clean_html(summary)
         
@@ -279,24 +395,47 @@ elif section == "AI Research Copilot":
         
         styled_summary += '</div>'
 
-        st.markdown(styled_summary, unsafe_allow_html=True)
-
-        # --- Sentiment Indicator ---
-        st.subheader("Sentiment Indicator")
-        if sentiment == "positive":
-            st.success("Bullish sentiment detected")
-        elif sentiment == "negative":
-            st.error("Bearish sentiment detected")
-        else:
-            st.info("Neutral sentiment detected")
-
-        score_map = {"positive": 1, "neutral": 0, "negative": -1}
-        score = score_map[sentiment]
-        fig_sent, ax = plt.subplots(figsize=(4, 0.5))
-        ax.barh(["Sentiment"], [score], color="green" if score > 0 else "red" if score < 0 else "gray")
-        ax.set_xlim(-1, 1)
-        ax.set_yticks([]); ax.set_xticks([]); ax.set_frame_on(False)
-        st.pyplot(fig_sent)
+        summary_slot.markdown(styled_summary, unsafe_allow_html=True)
+        if summary_incomplete:
+            st.warning("⚠️ The AI summary was cut off mid-stream; try again for the full text.")
+
+        # --- Sentiment Indicator (once the stream has completed) ---
+        with sentiment_box:
+            st.subheader("Sentiment Indicator")
+            if not summary_complete:
+                st.info("Sentiment unavailable without a complete AI summary")
+            elif sentiment == "positive":
+                st.success("Bullish sentiment detected")
+            elif sentiment == "negative":
+                st.error("Bearish sentiment detected")
+            else:
+                st.info("Neutral sentiment detected")
+
+            if summary_complete:
+                st.caption(f"Sentiment score: {score:+.2f} (−1 bearish … +1 bullish)")
+                st.plotly_chart(sentiment_gauge(score), use_container_width=True)
+
+        if summary_complete:
+            sentiment_store.record(ticker, score, "analyze")
+
+        with st.expander("📊 Sentiment history & correlation"):
+            from portfolio_store import get_store as get_portfolio_store
+            watched = list(dict.fromkeys([ticker] + [h["ticker"] for h in get_portfolio_store().holdings()]))
+            points = sentiment_store.get_store().history(ticker)
+            if len(points) < 2:
+                st.caption("Sentiment is recorded on every analysis, alert run and cache warm; "
+                           "history for this ticker will appear as scores accumulate.")
+            else:
+                close = get_history(ticker, "max", refresh_first=False)["Close"]
+                correlation = sentiment_store.rolling_correlation(watched)
+                points.index = points.index.tz_localize(None)
+                st.plotly_chart(sentiment_history_chart(ticker, close, points["score"], correlation["tickers"][ticker]),
+                                use_container_width=True)
+                st.caption(f"{len(points)} recorded scores. Rolling window correlation of a day's sentiment "
+                           "with the following 5-day return.")
+                table = sentiment_store.lead_lag(watched)
+                if table["pairs"].max() > 0:
+                    st.plotly_chart(lead_lag_chart(table), use_container_width=True)
 
 
 # =====================================================
@@ -311,6 +450,7 @@ elif section == "Daily Alerts Setup":
     enable_sentiment_alerts = st.checkbox("Enable sentiment monitoring alerts")
 
     if st.button("Save Settings"):
+        supabase = get_supabase()
         if supabase and email:
             config_data = {"email": email, "enabled": enable_alerts, "sentiment_alerts": enable_sentiment_alerts}
             try:
@@ -330,10 +470,17 @@ elif section == "Daily Alerts Setup":
         if not email:
             st.error("Please enter your email first.")
         else:
-            st.info("Sending test email...")
-            try:
-                content, _ = generate_daily_summary()
-                send_email(email, content)
-                st.success(f"✅ Test email sent successfully to {email}!")
-            except Exception as e:
-                st.error(f"❌ Failed to send test email: {e}")
\ No newline at end of file
+            # Revaluing the portfolio and sending run in the worker; repeated clicks share one job
+            job_id = jobs.enqueue("send_test_email", {"email": email}, dedupe_key=f"send_test_email:{email}")
+            track_job(job_id, f"Test email to {email}")
+
+    st.divider()
+    st.subheader("Sentiment Scan")
+    st.write("Scan the portfolio's news sentiment now and email ALERT_EMAIL if it turns bearish.")
+    if st.button("Run Sentiment Scan"):
+        track_job(jobs.enqueue("sentiment_scan", {}, dedupe_key="sentiment_scan"), "Sentiment scan")
+
+    if st.session_state.get("jobs"):
+        job_status_panel()
+
+stop_profile()
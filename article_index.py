@@ -0,0 +1,158 @@
+# article_index.py
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from news_client import title_fingerprint
+
+ARTICLE_DB = os.getenv("FINGPT_ARTICLE_DB", os.path.join(".cache", "articles.sqlite3"))
+# A ticker's aggregate sentiment loses half its weight every HALF_LIFE seconds.
+HALF_LIFE = float(os.getenv("FINGPT_SENTIMENT_HALF_LIFE_HOURS", "72")) * 3600
+
+_TRACKING_PARAMS = ("utm_", "guccounter", "cmpid", "ncid", "ocid", "soc_src", "taid")
+
+
+def canonical_link(link):
+    """Normalize a URL so the same article seen twice maps to the same key."""
+    if not link:
+        return ""
+    parts = urlsplit(link.strip())
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(_TRACKING_PARAMS)
+    ]
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(sorted(query)), ""))
+
+
+class ArticleIndex:
+    """
+    Which articles have already been processed, per ticker, plus a decayed
+    sentiment aggregate per ticker.
+
+    An article counts as seen if either its canonical link or its title
+    fingerprint was recorded before, so the same story syndicated under
+    another URL is not re-summarized.
+    """
+
+    def __init__(self, path=ARTICLE_DB, half_life=HALF_LIFE):
+        self.path = path
+        self.half_life = half_life
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS articles ("
+                " ticker TEXT NOT NULL, link_key TEXT NOT NULL, fingerprint TEXT NOT NULL,"
+                " title TEXT, source TEXT, link TEXT, first_seen REAL NOT NULL, score REAL,"
+                " PRIMARY KEY (ticker, link_key))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS articles_fp ON articles (ticker, fingerprint)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS aggregates ("
+                " ticker TEXT PRIMARY KEY, score REAL NOT NULL, weight REAL NOT NULL,"
+                " updated_at REAL NOT NULL, summary TEXT)"
+            )
+
+    def unseen(self, ticker, items):
+        """The subset of `items` not recorded for `ticker` yet (deduped, order kept)."""
+        ticker = ticker.strip().upper()
+        with self._lock:
+            links = {r[0] for r in self._conn.execute("SELECT link_key FROM articles WHERE ticker = ?", (ticker,))}
+            prints = {r[0] for r in self._conn.execute("SELECT fingerprint FROM articles WHERE ticker = ?", (ticker,))}
+        fresh = []
+        for item in items:
+            link_key = canonical_link(item.get("link")) or title_fingerprint(item.get("title"))
+            fingerprint = title_fingerprint(item.get("title"))
+            if link_key in links or fingerprint in prints:
+                continue
+            links.add(link_key)
+            prints.add(fingerprint)
+            fresh.append(item)
+        return fresh
+
+    def aggregate(self, ticker, now=None):
+        """
+        Current decayed aggregate for `ticker`, or None if nothing was ever
+        recorded. Both weight and score decay with age, so a ticker with no
+        news drifts back toward neutral instead of keeping its last score.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT score, weight, updated_at, summary FROM aggregates WHERE ticker = ?",
+                (ticker.strip().upper(),),
+            ).fetchone()
+        if row is None:
+            return None
+        score, weight, updated_at, summary = row
+        decay = self._decay(updated_at, now)
+        return {
+            "score": score * decay,
+            "weight": weight * decay,
+            "updated_at": updated_at,
+            "summary": summary,
+        }
+
+    def _decay(self, since, now=None):
+        now = time.time() if now is None else now
+        return 0.5 ** (max(0.0, now - since) / self.half_life)
+
+    def record(self, ticker, items, scores, summary=None, now=None):
+        """
+        Mark `items` as seen with their per-article `scores` and fold them into
+        the ticker's aggregate: old evidence (weight and score) is decayed by
+        age, each new article adds weight 1. Returns the updated aggregate.
+        """
+        ticker = ticker.strip().upper()
+        now = time.time() if now is None else now
+        rows = [
+            (ticker, canonical_link(item.get("link")) or title_fingerprint(item.get("title")),
+             title_fingerprint(item.get("title")), item.get("title"), item.get("source"),
+             item.get("link"), now, float(score))
+            for item, score in zip(items, scores)
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO articles"
+                " (ticker, link_key, fingerprint, title, source, link, first_seen, score)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            row = self._conn.execute(
+                "SELECT score, weight, updated_at, summary FROM aggregates WHERE ticker = ?", (ticker,)
+            ).fetchone()
+            old_score, old_weight, old_summary = 0.0, 0.0, None
+            if row is not None:
+                decay = self._decay(row[2], now)
+                old_score, old_weight, old_summary = row[0] * decay, row[1] * decay, row[3]
+            new_weight = old_weight + len(rows)
+            new_score = (old_score * old_weight + sum(r[7] for r in rows)) / new_weight if new_weight else old_score
+            self._conn.execute(
+                "INSERT OR REPLACE INTO aggregates (ticker, score, weight, updated_at, summary) VALUES (?, ?, ?, ?, ?)",
+                (ticker, new_score, new_weight, now, summary if summary is not None else old_summary),
+            )
+        return {"score": new_score, "weight": new_weight, "updated_at": now, "summary": summary or old_summary}
+
+    def stats(self):
+        with self._lock:
+            articles, tickers = self._conn.execute("SELECT COUNT(*), COUNT(DISTINCT ticker) FROM articles").fetchone()
+        return {"articles": articles, "tickers": tickers}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Process-wide article index."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = ArticleIndex()
+        return _index
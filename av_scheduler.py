@@ -0,0 +1,565 @@
+# av_scheduler.py
+import contextlib
+import contextvars
+import heapq
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import requests
+
+from cache import CACHE_PATH
+from instrumentation import add_bytes, register_collector, span
+
+ALPHA_VANTAGE_URL = os.getenv("ALPHA_VANTAGE_URL", "https://www.alphavantage.co/query")
+CALLS_PER_MINUTE = int(os.getenv("ALPHA_VANTAGE_CALLS_PER_MINUTE", "5"))
+CALLS_PER_DAY = int(os.getenv("ALPHA_VANTAGE_CALLS_PER_DAY", "25"))
+# Daily calls background work may not touch, so Analyze clicks still work late in the day.
+INTERACTIVE_RESERVE = int(os.getenv("ALPHA_VANTAGE_INTERACTIVE_RESERVE", "5"))
+# Bucket state shared by every process using the key (web, warmer, worker, alert_job)
+QUOTA_DB = os.getenv("FINGPT_QUOTA_DB", CACHE_PATH)
+# How long an interactive caller waits for a queued call (background callers wait it out)
+INTERACTIVE_TIMEOUT = float(os.getenv("ALPHA_VANTAGE_INTERACTIVE_TIMEOUT", "30"))
+MAX_RETRIES = 3
+BACKOFF_SECONDS = 20.0
+
+# Lower value = served first
+INTERACTIVE = 0
+BACKGROUND = 10
+
+_THROTTLE_MARKERS = ("call frequency", "rate limit", "requests per", "api call volume")
+# Per-minute and burst notices also quote the daily limit ("5 calls per minute and
+# 500 calls per day"), so these rule a notice out as daily exhaustion
+_SHORT_TERM_MARKERS = ("per minute", "per second", "burst", "call frequency", "spreading out")
+
+_priority = contextvars.ContextVar("alpha_vantage_priority", default=INTERACTIVE)
+_deadline = contextvars.ContextVar("alpha_vantage_deadline", default=None)
+
+
+class QuotaExceeded(Exception):
+    """Raised when the daily Alpha Vantage budget is used up."""
+
+
+class Throttled(Exception):
+    """Raised when Alpha Vantage keeps answering with a throttle notice."""
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a queued call isn't answered before the caller's deadline."""
+
+
+def result_timeout():
+    """
+    Seconds the current caller may wait for a call: until its request_deadline
+    if one is set, else bounded when interactive and None in the background.
+    """
+    deadline = _deadline.get()
+    if deadline is not None:
+        return max(0.0, deadline - time.monotonic())
+    return INTERACTIVE_TIMEOUT if _priority.get() <= INTERACTIVE else None
+
+
+@contextlib.contextmanager
+def request_deadline(deadline):
+    """
+    Calls queued in this block are dropped unsent once `deadline`
+    (time.monotonic()) passes, so work that was given up on spends no quota.
+    """
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextlib.contextmanager
+def request_priority(priority):
+    """Run Alpha Vantage calls made in this block at `priority` (e.g. BACKGROUND)."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def _throttle_message(payload):
+    """Return Alpha Vantage's throttle notice if `payload` is one, else None."""
+    if isinstance(payload, dict):
+        for field in ("Note", "Information"):
+            message = payload.get(field)
+            if message and any(m in message.lower() for m in _THROTTLE_MARKERS):
+                return message
+    return None
+
+
+def _daily_exhausted(message):
+    """True only for the "rate limit is 25 requests per day" notice, not per-minute/burst throttles."""
+    message = message.lower()
+    return "per day" in message and not any(m in message for m in _SHORT_TERM_MARKERS)
+
+
+# ----------------------------
+# Token bucket
+# ----------------------------
+class TokenBucket:
+    """Classic token bucket holding up to `capacity` calls, refilled evenly over `period` seconds."""
+
+    def __init__(self, capacity, period):
+        self.capacity = float(capacity)
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self):
+        self._refill()
+        return self.tokens
+
+    def wait_time(self):
+        """Seconds until a whole token is available."""
+        return max(0.0, (1 - self.available()) / self.rate)
+
+    def consume(self):
+        self._refill()
+        self.tokens -= 1
+
+    def drain(self):
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+
+class SharedQuota:
+    """
+    The minute and day buckets of the API key, persisted in one SQLite table
+    so every process spends the same budget. Each update refills from wall
+    time and runs under BEGIN IMMEDIATE, so two processes never both take
+    the last token.
+    """
+
+    def __init__(self, path=QUOTA_DB, per_minute=CALLS_PER_MINUTE, per_day=CALLS_PER_DAY):
+        self.path = path
+        self.buckets = {"minute": (float(per_minute), 60.0), "day": (float(per_day), 86400.0)}
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS alpha_vantage_quota ("
+                " bucket TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+        # Snapshots read on their own connection: under WAL they never wait
+        # for a write transaction, here or in another process
+        self._reader = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._reader_lock = threading.Lock()
+
+    def _load(self, now, conn=None):
+        """Refilled token counts (caller holds the connection's lock, inside a transaction for writes)."""
+        conn = conn or self._conn
+        stored = dict((b, (t, u)) for b, t, u in conn.execute("SELECT bucket, tokens, updated FROM alpha_vantage_quota"))
+        tokens = {}
+        for bucket, (capacity, period) in self.buckets.items():
+            held, updated = stored.get(bucket, (capacity, now))
+            tokens[bucket] = min(capacity, held + max(0.0, now - updated) * capacity / period)
+        return tokens
+
+    def _store(self, tokens, now):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO alpha_vantage_quota (bucket, tokens, updated) VALUES (?, ?, ?)",
+            [(bucket, value, now) for bucket, value in tokens.items()],
+        )
+
+    def _update(self, change):
+        """Run `change(tokens)` on the refilled buckets in one write transaction; returns its result and the tokens."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                tokens = self._load(now)
+                result = change(tokens)
+                self._store(tokens, now)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return result, tokens
+
+    def acquire(self, reserve=0):
+        """
+        Take one call from both buckets if the day keeps `reserve` calls back
+        and the minute has a token. Returns ("ok" | "quota" | "wait", tokens).
+        """
+        def take(tokens):
+            if tokens["day"] < reserve + 1:
+                return "quota"
+            if tokens["minute"] < 1:
+                return "wait"
+            tokens["minute"] -= 1
+            tokens["day"] -= 1
+            return "ok"
+        return self._update(take)
+
+    def drain(self, bucket):
+        def empty(tokens):
+            tokens[bucket] = min(tokens[bucket], 0.0)
+        return self._update(empty)[1]
+
+    def snapshot(self):
+        with self._reader_lock:
+            return self._load(time.time(), self._reader)
+
+
+# ----------------------------
+# Scheduler
+# ----------------------------
+class _Request:
+    def __init__(self, key, fetch, priority, deadline=None):
+        self.key = key
+        self.fetch = fetch
+        self.priority = priority
+        self.deadline = deadline  # None while any caller waits indefinitely
+        self.attempts = 0
+        self.running = False
+        self.future = Future()
+
+
+class AlphaVantageScheduler:
+    """
+    Single gate for every Alpha Vantage call in the process.
+
+    Calls wait for both the per-minute and per-day buckets, are served in
+    priority order, and identical in-flight calls (same key) share one request.
+    Throttle notices are retried with exponential backoff.
+
+    With `shared` (a SharedQuota) the buckets other processes spend from are
+    authoritative; the in-process buckets mirror them and only let the
+    dispatcher wait without touching the database.
+    """
+
+    def __init__(self, per_minute=CALLS_PER_MINUTE, per_day=CALLS_PER_DAY,
+                 max_retries=MAX_RETRIES, backoff=BACKOFF_SECONDS, max_workers=4, shared=None):
+        self._minute = TokenBucket(per_minute, 60)
+        self._day = TokenBucket(per_day, 86400)
+        self._shared = shared
+        self._max_retries = max_retries
+        self._backoff = backoff
+        self._queue = []    # (priority, seq, key)
+        self._delayed = []  # (ready_at, seq, key) waiting out a backoff
+        self._pending = {}  # key -> _Request, queued or running
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="alpha-vantage")
+        self._thread = None
+        self._stats = {
+            "requested": 0,
+            "coalesced": 0,
+            "calls": 0,
+            "throttled": 0,
+            "retries": 0,
+            "failed": 0,
+            "expired": 0,
+            "calls_by_priority": {},
+        }
+
+    # --- public API ---
+    def submit(self, key, fetch, priority=None, deadline=None):
+        """
+        Queue `fetch()` under `key`; returns a Future shared by duplicate
+        requests. A request not yet sent when `deadline` (default: the
+        request_deadline in effect) passes fails with DeadlineExceeded.
+        """
+        priority = _priority.get() if priority is None else priority
+        deadline = _deadline.get() if deadline is None else deadline
+        with self._cond:
+            self._stats["requested"] += 1
+            request = self._pending.get(key)
+            if request is not None:
+                self._stats["coalesced"] += 1
+                # Kept alive for the most patient caller
+                if request.deadline is not None:
+                    request.deadline = None if deadline is None else max(request.deadline, deadline)
+                if priority < request.priority and request.attempts == 0:
+                    # Promote: the stale heap entry is skipped when popped
+                    request.priority = priority
+                    heapq.heappush(self._queue, (priority, next(self._seq), key))
+                    self._cond.notify()
+                return request.future
+
+            request = _Request(key, fetch, priority, deadline)
+            self._pending[key] = request
+            heapq.heappush(self._queue, (priority, next(self._seq), key))
+            self._ensure_dispatcher()
+            self._cond.notify()
+            return request.future
+
+    def call(self, key, fetch, priority=None, timeout=None):
+        return self.submit(key, fetch, priority).result(timeout=timeout)
+
+    def usage(self):
+        """Snapshot of quota usage and scheduler counters."""
+        tokens = None
+        if self._shared is not None:
+            try:
+                tokens = self._shared.snapshot()
+            except sqlite3.Error as e:
+                print(f"⚠️ Shared Alpha Vantage quota unreadable: {e}")
+        with self._cond:
+            if tokens is not None:
+                self._mirror(tokens)
+            return {
+                **self._stats,
+                "calls_by_priority": dict(self._stats["calls_by_priority"]),
+                "minute_remaining": round(self._minute.available(), 2),
+                "day_remaining": round(self._day.available(), 2),
+                "queued": len(self._pending),
+            }
+
+    # --- shared quota ---
+    def _mirror(self, tokens):
+        """Copy the shared bucket levels into the in-process buckets."""
+        now = time.monotonic()
+        for bucket, name in ((self._minute, "minute"), (self._day, "day")):
+            bucket.tokens, bucket.updated = tokens[name], now
+
+    def _acquire(self, request, reserve):
+        """
+        Take a call for `request` from the shared buckets (or the local ones
+        without sharing). Called without the lock: the shared quota is a
+        SQLite write that may wait on other processes, and submit()/usage()
+        must not queue behind it. Returns whether the call may go out; if
+        not, the request is requeued.
+        """
+        status, tokens = "ok", None
+        if self._shared is not None:
+            try:
+                status, tokens = self._shared.acquire(reserve)
+            except sqlite3.Error as e:
+                print(f"⚠️ Shared Alpha Vantage quota unavailable ({e}); using this process's budget")
+        with self._cond:
+            if tokens is not None:
+                self._mirror(tokens)
+            else:
+                self._minute.consume()
+                self._day.consume()
+            if status != "ok":
+                # Other processes spent the budget: requeue, and the mirrored buckets
+                # make the dispatcher wait for the minute or fail the call for the day
+                request.running = False
+                heapq.heappush(self._queue, (request.priority, next(self._seq), request.key))
+                return False
+            self._stats["calls"] += 1
+            by_priority = self._stats["calls_by_priority"]
+            by_priority[request.priority] = by_priority.get(request.priority, 0) + 1
+            return True
+
+    def _drain_shared(self, name):
+        """Empty a bucket for every process sharing the quota; called without the lock."""
+        if self._shared is None:
+            return
+        try:
+            tokens = self._shared.drain(name)
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not update the shared Alpha Vantage quota: {e}")
+            return
+        with self._cond:
+            self._mirror(tokens)
+
+    # --- dispatcher ---
+    def _ensure_dispatcher(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._dispatch, name="alpha-vantage-dispatcher", daemon=True)
+            self._thread.start()
+
+    def _next_request(self):
+        """Pop the best live request off the heap, failing expired ones unsent (caller holds the lock)."""
+        while self._queue:
+            priority, _, key = heapq.heappop(self._queue)
+            request = self._pending.get(key)
+            if request is None or request.priority != priority or request.running:
+                continue
+            if request.deadline is not None and time.monotonic() >= request.deadline:
+                self._stats["expired"] += 1
+                self._finish(request, error=DeadlineExceeded(f"{key} dropped: its caller's deadline passed"))
+                continue
+            return request
+        return None
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    _, _, key = heapq.heappop(self._delayed)
+                    request = self._pending.get(key)
+                    if request is not None:
+                        request.running = False
+                        heapq.heappush(self._queue, (request.priority, next(self._seq), key))
+
+                if not self._queue:
+                    timeout = self._delayed[0][0] - now if self._delayed else None
+                    self._cond.wait(timeout)
+                    continue
+
+                top_priority = self._queue[0][0]
+                reserve = INTERACTIVE_RESERVE if top_priority > INTERACTIVE else 0
+                if self._day.available() < reserve + 1:
+                    request = self._next_request()
+                    if request is not None:
+                        self._finish(request, error=QuotaExceeded(
+                            f"Alpha Vantage daily budget exhausted ({self._day.capacity:.0f}/day)"))
+                    continue
+
+                wait = self._minute.wait_time()
+                if wait > 0:
+                    # Re-check after waiting so a newly queued interactive call can jump ahead
+                    self._cond.wait(wait)
+                    continue
+
+                request = self._next_request()
+                if request is None:
+                    continue
+                # Keeps promoted duplicates of it in the heap from being dispatched meanwhile
+                request.running = True
+
+            if self._acquire(request, reserve):
+                self._executor.submit(self._execute, request)
+
+    def _execute(self, request):
+        request.attempts += 1
+        try:
+            with span("alpha_vantage", function=str(request.key[0])):
+                payload = request.fetch()
+            message = _throttle_message(payload)
+        except Exception as e:
+            # alpha_vantage.TimeSeries raises ValueError carrying the throttle notice
+            if any(m in str(e).lower() for m in _THROTTLE_MARKERS):
+                message = str(e)
+            else:
+                with self._cond:
+                    self._finish(request, error=e)
+                return
+
+        drained = None
+        with self._cond:
+            if message is None:
+                self._finish(request, result=payload)
+                return
+
+            self._stats["throttled"] += 1
+            if _daily_exhausted(message):
+                drained = "day"
+                self._day.drain()
+                self._finish(request, error=QuotaExceeded(message))
+            elif request.attempts <= self._max_retries:
+                self._stats["retries"] += 1
+                drained = "minute"
+                self._minute.drain()
+                delay = self._backoff * (2 ** (request.attempts - 1))
+                print(f"⏳ Alpha Vantage throttled {request.key}; retrying in {delay:.0f}s")
+                heapq.heappush(self._delayed, (time.monotonic() + delay, next(self._seq), request.key))
+                self._cond.notify()
+            else:
+                self._finish(request, error=Throttled(message))
+        if drained:
+            self._drain_shared(drained)
+
+    def _finish(self, request, result=None, error=None):
+        """Resolve a request (caller holds the lock)."""
+        self._pending.pop(request.key, None)
+        if error is not None:
+            self._stats["failed"] += 1
+            request.future.set_exception(error)
+        else:
+            request.future.set_result(result)
+
+
+# ----------------------------
+# Module-level helpers
+# ----------------------------
+_scheduler = None
+_scheduler_lock = threading.Lock()
+_session = None
+
+
+def get_scheduler():
+    """Process-wide scheduler shared by the UI and background jobs."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = AlphaVantageScheduler(shared=SharedQuota())
+        return _scheduler
+
+
+def get_session():
+    """Keep-alive session for Alpha Vantage REST calls, shared by the whole process."""
+    global _session
+    with _scheduler_lock:
+        if _session is None:
+            _session = requests.Session()
+        return _session
+
+
+def query_async(function, symbol, priority=None, **params):
+    """Queue an Alpha Vantage REST call through the shared scheduler; returns a Future of the JSON payload."""
+    api_key = os.getenv("ALPHA_VANTAGE_KEY")
+
+    def fetch():
+        response = get_session().get(
+            ALPHA_VANTAGE_URL,
+            params={"function": function, "symbol": symbol, "apikey": api_key, **params},
+            timeout=10,
+        )
+        add_bytes(len(response.content))
+        return response.json()
+
+    key = (function, symbol.upper()) + tuple(sorted(params.items()))
+    return get_scheduler().submit(key, fetch, priority)
+
+
+def wait_result(future, deadline=None, what="Alpha Vantage call"):
+    """
+    `future.result()` until `deadline` (time.monotonic(); None waits for as
+    long as it takes). Raises DeadlineExceeded instead of blocking through
+    the scheduler's throttle backoff.
+    """
+    timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeout:
+        raise DeadlineExceeded(f"{what} still waiting on the Alpha Vantage quota after the deadline") from None
+
+
+def query(function, symbol, priority=None, timeout=None, **params):
+    """Blocking form of `query_async`; waits at most `timeout` seconds (default: result_timeout())."""
+    timeout = result_timeout() if timeout is None else timeout
+    deadline = None if timeout is None else time.monotonic() + timeout
+    return wait_result(query_async(function, symbol, priority, **params), deadline, f"{function} {symbol}")
+
+
+def usage():
+    return get_scheduler().usage()
+
+
+def _quota_metrics():
+    if _scheduler is None:
+        return []
+    u = _scheduler.usage()
+    return [
+        ("fingpt_alpha_vantage_day_remaining", {}, u["day_remaining"], "gauge"),
+        ("fingpt_alpha_vantage_minute_remaining", {}, u["minute_remaining"], "gauge"),
+        ("fingpt_alpha_vantage_calls_total", {}, u["calls"], "counter"),
+        ("fingpt_alpha_vantage_coalesced_total", {}, u["coalesced"], "counter"),
+        ("fingpt_alpha_vantage_throttled_total", {}, u["throttled"], "counter"),
+    ]
+
+
+register_collector(_quota_metrics)
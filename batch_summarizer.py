@@ -0,0 +1,202 @@
+# batch_summarizer.py
+"""
+Summaries for the nightly jobs through the OpenAI Batch API.
+
+`summarize_batch()` writes one chat request per uncached ticker to a JSONL
+file, submits it as a batch job (half the price of synchronous calls),
+polls until the job finishes and maps each output line back to its ticker
+by `custom_id`. Requests that fail are re-queued individually in the next
+round; whatever is still missing after FINGPT_BATCH_RETRIES rounds or
+FINGPT_BATCH_TIMEOUT_MINUTES falls back to synchronous calls.
+
+Results go into the same "llm" cache as summarize_text, so the Analyze page
+picks them up. The interactive path never goes through here.
+"""
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import get_cache
+from instrumentation import observe, span
+from summarizer import chat_request, get_client, normalize_summary, summarize_text, summary_cache_key
+
+# Whether monitor_sentiment / alert_job summarize through batches
+BATCH_ENABLED = os.getenv("FINGPT_LLM_BATCH", "1").strip().lower() not in ("0", "false", "no")
+BATCH_MAX_REQUESTS = int(os.getenv("FINGPT_BATCH_MAX_REQUESTS", "1000"))  # per batch job
+# Fewer uncached requests than this are not worth a batch round trip
+BATCH_MIN_REQUESTS = int(os.getenv("FINGPT_BATCH_MIN_REQUESTS", "2"))
+BATCH_POLL_SECONDS = float(os.getenv("FINGPT_BATCH_POLL_SECONDS", "30"))
+BATCH_TIMEOUT_SECONDS = float(os.getenv("FINGPT_BATCH_TIMEOUT_MINUTES", "60")) * 60
+BATCH_RETRIES = int(os.getenv("FINGPT_BATCH_RETRIES", "2"))
+SYNC_CONCURRENCY = int(os.getenv("OPENAI_CONCURRENCY", "4"))
+ENDPOINT = "/v1/chat/completions"
+TERMINAL = ("completed", "failed", "expired", "cancelled")
+
+
+def _request_line(custom_id, ticker, fundamentals, news):
+    return json.dumps({
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": ENDPOINT,
+        "body": chat_request(ticker, fundamentals, news),
+    })
+
+
+def submit(requests, label="summaries"):
+    """Upload `requests` ({custom_id: (ticker, fundamentals, news)}) as one batch job; returns the batch id."""
+    client = get_client()
+    lines = "".join(_request_line(cid, *args) + "\n" for cid, args in requests.items())
+    with span("openai.batch.submit") as s:
+        s.set(bytes=len(lines), items=len(requests))
+        upload = client.files.create(file=(f"fingpt-{label}.jsonl", lines.encode("utf-8")), purpose="batch")
+        batch = client.batches.create(input_file_id=upload.id, endpoint=ENDPOINT, completion_window="24h",
+                                      metadata={"job": label})
+    return batch.id
+
+
+def wait(batch_ids, deadline, poll_interval=BATCH_POLL_SECONDS):
+    """Poll until every batch is finished or `deadline` (monotonic) passes; returns {id: Batch}."""
+    client = get_client()
+    finished = {}
+    while True:
+        for batch_id in [b for b in batch_ids if b not in finished]:
+            batch = client.batches.retrieve(batch_id)
+            if batch.status in TERMINAL:
+                finished[batch_id] = batch
+        remaining = deadline - time.monotonic()
+        if len(finished) == len(batch_ids) or remaining <= 0:
+            break
+        time.sleep(min(poll_interval, remaining))
+
+    for batch_id in [b for b in batch_ids if b not in finished]:
+        try:
+            client.batches.cancel(batch_id)
+            print(f"⏸️ Batch {batch_id} still running at the deadline; cancelled")
+        except Exception as e:
+            print(f"⚠️ Could not cancel batch {batch_id}: {e}")
+    return finished
+
+
+def _read_lines(file_id):
+    if not file_id:
+        return []
+    text = get_client().files.content(file_id).text
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def collect(batch):
+    """({custom_id: summary}, {custom_id: error}) from a finished batch's output and error files."""
+    summaries, errors = {}, {}
+    for row in _read_lines(batch.output_file_id) + _read_lines(batch.error_file_id):
+        custom_id = row.get("custom_id")
+        response = row.get("response") or {}
+        if row.get("error") or response.get("status_code") != 200:
+            errors[custom_id] = (row.get("error") or {}).get("message") or f"HTTP {response.get('status_code')}"
+            continue
+        try:
+            content = response["body"]["choices"][0]["message"]["content"] or ""
+        except (KeyError, IndexError, TypeError):
+            errors[custom_id] = "malformed response"
+            continue
+        summary = normalize_summary(content)
+        if summary:
+            summaries[custom_id] = summary
+        else:
+            errors[custom_id] = "empty summary"
+    return summaries, errors
+
+
+def _sync(pending, keys, summaries, stats):
+    """Synchronous summaries for whatever the batch rounds couldn't produce."""
+    def one(custom_id):
+        return custom_id, summarize_text(*pending[custom_id])
+
+    with ThreadPoolExecutor(max_workers=max(1, SYNC_CONCURRENCY)) as pool:
+        for custom_id, summary in pool.map(one, list(pending)):
+            # summarize_text caches successes itself and returns a fallback text on errors
+            if get_cache().get("llm", keys[custom_id]):
+                summaries[custom_id] = summary
+                stats["sync"] += 1
+
+
+def summarize_batch(items, label="summaries", poll_interval=None, timeout=None, retries=None,
+                    sync_fallback=True, min_requests=None):
+    """
+    Summaries for [(ticker, fundamentals, news)], in input order (None where
+    no summary could be produced). Cached summaries are reused and identical
+    inputs are sent once. Returns (summaries, stats).
+    """
+    poll_interval = BATCH_POLL_SECONDS if poll_interval is None else poll_interval
+    timeout = BATCH_TIMEOUT_SECONDS if timeout is None else timeout
+    retries = BATCH_RETRIES if retries is None else retries
+    min_requests = BATCH_MIN_REQUESTS if min_requests is None else min_requests
+    started = time.perf_counter()
+    deadline = time.monotonic() + timeout
+    cache = get_cache()
+    stats = {"requests": len(items), "cached": 0, "batches": 0, "batched": 0, "requeued": 0, "sync": 0, "failed": 0}
+
+    keys, pending, slots = {}, {}, []
+    summaries = {}
+    for ticker, fundamentals, news in items:
+        key = summary_cache_key(ticker, fundamentals, news)
+        custom_id = f"{ticker.strip().upper()}-{key[:16]}"
+        slots.append(custom_id)
+        if custom_id in keys:
+            continue
+        keys[custom_id] = key
+        cached_summary = cache.get("llm", key)
+        observe("llm.lookup", 0.0, cache="hit" if cached_summary else "miss")
+        if cached_summary:
+            summaries[custom_id] = cached_summary
+            stats["cached"] += 1
+        else:
+            pending[custom_id] = (ticker, fundamentals, news)
+
+    use_batch = len(pending) >= max(1, min_requests)
+    attempt = 0
+    while use_batch and pending and attempt <= retries and time.monotonic() < deadline:
+        ids = list(pending)
+        try:
+            batch_ids = [submit({cid: pending[cid] for cid in ids[i:i + BATCH_MAX_REQUESTS]}, label)
+                         for i in range(0, len(ids), BATCH_MAX_REQUESTS)]
+        except Exception as e:
+            print(f"❌ Batch submission failed: {e}")
+            break
+        stats["batches"] += len(batch_ids)
+        print(f"📦 Submitted {len(ids)} summaries in {len(batch_ids)} batch job(s)"
+              + (f" (retry {attempt})" if attempt else ""))
+
+        with span("openai.batch.wait", attempt=attempt):
+            finished = wait(batch_ids, deadline, poll_interval)
+        errors = {}
+        for batch_id, batch in finished.items():
+            if batch.status != "completed":
+                print(f"⚠️ Batch {batch_id} ended {batch.status}")
+            try:
+                done, failed = collect(batch)
+            except Exception as e:
+                print(f"⚠️ Could not read results of batch {batch_id}: {e}")
+                continue
+            errors.update(failed)
+            for custom_id, summary in done.items():
+                if custom_id in pending:
+                    cache.set("llm", keys[custom_id], summary)
+                    summaries[custom_id] = summary
+                    del pending[custom_id]
+                    stats["batched"] += 1
+        attempt += 1
+        if pending and attempt <= retries and time.monotonic() < deadline:
+            # Only the failed requests go into the next round, each as its own line again
+            stats["requeued"] += len(pending)
+            print(f"🔁 {len(pending)} batch request(s) failed or unfinished; re-queuing"
+                  + (f" (e.g. {next(iter(errors.values()))})" if errors else ""))
+
+    if pending and (sync_fallback or not use_batch):
+        _sync(pending, keys, summaries, stats)
+    stats["failed"] = sum(1 for cid in keys if cid not in summaries)
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    if keys:
+        print(f"✅ Batch summaries: {stats['batched']} batched, {stats['cached']} cached, {stats['sync']} sync, "
+              f"{stats['failed']} failed in {stats['seconds']}s")
+    return [summaries.get(custom_id) for custom_id in slots], stats
@@ -0,0 +1,100 @@
+# bench_analytics.py
+# Portfolio analytics over a synthetic history store: cold matrix build, warm
+# (cached) call, a one-bar incremental update, and a pandas cross-check.
+# Run: python bench_analytics.py [--tickers 500] [--bars 2500]
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# The store location is read at import time
+_workdir = tempfile.mkdtemp(prefix="fingpt_analytics_")
+os.environ["FINGPT_HISTORY_DIR"] = os.path.join(_workdir, "history")
+
+import analytics  # noqa: E402
+import history_store  # noqa: E402
+
+
+def write_store(n_tickers, n_bars, seed=0):
+    """Random-walk bars for T0000… plus the benchmark; some tickers start late."""
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end=pd.Timestamp.today().normalize() - pd.Timedelta(days=1), periods=n_bars)
+    market = rng.normal(0.0003, 0.01, n_bars)
+    tickers = [f"T{i:04d}" for i in range(n_tickers)]
+    for i, ticker in enumerate(tickers + [analytics.BENCHMARK]):
+        beta = 1.0 if ticker == analytics.BENCHMARK else rng.uniform(0.5, 1.5)
+        noise = 0.002 if ticker == analytics.BENCHMARK else 0.012
+        close = 100 * np.exp(np.cumsum(beta * market + rng.normal(0, noise, n_bars)))
+        start = int(rng.integers(0, n_bars // 2)) if i % 10 == 9 else 0
+        df = pd.DataFrame({c: close for c in ("Open", "High", "Low", "Close")}, index=index)[start:]
+        df["Volume"] = 1e6
+        history_store._write(ticker, history_store._to_array(df), {"seeded": "full", "checked_at": time.time()})
+    return tickers
+
+
+def append_bar(tickers):
+    """One new bar for every ticker, as the daily refresh would write it."""
+    for ticker in tickers + [analytics.BENCHMARK]:
+        array = np.asarray(history_store._read_array(ticker))
+        bar = array[:, -1:].copy()
+        bar[0] += 1
+        bar[4] *= 1.01
+        history_store._write(ticker, np.hstack([array, bar]), {"seeded": "full", "checked_at": time.time()})
+
+
+def pandas_reference(tickers, shares):
+    closes = pd.concat({t: history_store.get_history(t, "max", refresh_first=False)["Close"] for t in tickers}, axis=1)
+    closes = closes.ffill()
+    returns = closes.pct_change()
+    positions = closes.shift(1) * shares
+    valid = returns.notna() & positions.notna()
+    weighted = (positions.where(valid, 0) * returns.where(valid, 0)).sum(axis=1) / positions.where(valid, 0).sum(axis=1)
+    return weighted.iloc[1:]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--bars", type=int, default=2500)
+    args = parser.parse_args()
+
+    try:
+        tickers = write_store(args.tickers, args.bars)
+        holdings = [{"ticker": t, "shares": 10 + i % 7} for i, t in enumerate(tickers)]
+        print(f"{args.tickers} holdings x {args.bars} bars (+ {analytics.BENCHMARK})")
+
+        result, t_cold = timed(lambda: analytics.portfolio_analytics(holdings, period="max"))
+        _, t_warm = timed(lambda: analytics.portfolio_analytics(holdings, period="max"))
+        _, t_period = timed(lambda: analytics.portfolio_analytics(holdings, period="1y"))
+        append_bar(tickers)
+        updated, t_incremental = timed(lambda: analytics.portfolio_analytics(holdings, period="max"))
+
+        m = updated["metrics"]
+        print(f"  cold (load + align + metrics) : {t_cold * 1000:8.1f} ms")
+        print(f"  warm (cached)                 : {t_warm * 1000:8.1f} ms")
+        print(f"  other window (1y)             : {t_period * 1000:8.1f} ms")
+        print(f"  after one new bar per ticker  : {t_incremental * 1000:8.1f} ms  "
+              f"({len(updated['frame']) - len(result['frame'])} row appended)")
+        print(f"  max drawdown {m['max_drawdown']:.1%}, vol {m['volatility']:.1%}, beta {m['beta']:.2f}, "
+              f"VaR {m['var_confidence']:.0%} hist ${m['var']['historical']:,.0f} / param ${m['var']['parametric']:,.0f}")
+
+        shares = pd.Series({h["ticker"]: h["shares"] for h in holdings})
+        reference = pandas_reference(tickers, shares)
+        ours = updated["frame"]["Return"].iloc[1:].to_numpy()
+        print(f"  max |return - pandas reference| : {np.nanmax(np.abs(ours - reference.to_numpy())):.2e}")
+    finally:
+        shutil.rmtree(_workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
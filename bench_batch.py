@@ -0,0 +1,95 @@
+# bench_batch.py
+# Nightly summarization through the OpenAI Batch API vs one synchronous call
+# per ticker, against the bench_stubs OpenAI stand-in (chat + Files/Batches).
+# Injected request failures exercise the per-item re-queue. Batch turnaround
+# is simulated (--batch-seconds); the real API promises results within 24h,
+# usually minutes, so the wall-time column only shows the client side.
+# Run: python bench_batch.py [--tickers 200] [--error-rate 0.05] [--batch-seconds 2]
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_prompt import synthetic_fundamentals, synthetic_news
+from bench_stubs import Faults, StubServer
+
+# gpt-4o-mini list prices, USD per million tokens; batch requests are billed at half
+INPUT_PRICE = 0.15
+OUTPUT_PRICE = 0.60
+BATCH_DISCOUNT = 0.5
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=200)
+    parser.add_argument("--items", type=int, default=5, help="headlines per source")
+    parser.add_argument("--openai-latency", type=float, default=0.25, help="sync call latency, seconds")
+    parser.add_argument("--token-ms", type=float, default=0.3, help="sync latency per prompt token, ms")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="share of OpenAI requests that fail")
+    parser.add_argument("--batch-seconds", type=float, default=2.0, help="simulated batch turnaround")
+    parser.add_argument("--concurrency", type=int, default=4, help="sync calls in flight (OPENAI_CONCURRENCY)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="fingpt_batch_")
+    faults = Faults({"openai": args.openai_latency}, {"openai": args.error_rate}, prompt_token_latency=args.token_ms / 1000)
+    server = StubServer(faults, batch_seconds=args.batch_seconds).start()
+    os.environ.update({k: v for k, v in server.env().items() if k.startswith("OPENAI")})
+    os.environ["FINGPT_CACHE_PATH"] = os.path.join(workdir, "cache.sqlite3")
+    os.environ["OPENAI_CONCURRENCY"] = str(args.concurrency)
+    import batch_summarizer
+    import cache
+    import prompt_builder
+    import summarizer
+
+    try:
+        items = []
+        for i in range(args.tickers):
+            ticker, name = f"T{i:04d}", f"Company{i} Inc"
+            items.append((ticker, synthetic_fundamentals(ticker, name), synthetic_news(ticker, name, args.items)))
+        prompt_builder.count_tokens("", summarizer.MODEL)  # load the tokenizer outside the timings
+
+        def run(label, fn):
+            cache.get_cache().clear()
+            before, tokens_before = faults.snapshot(), prompt_builder.totals()["tokens"]
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                summaries, stats = fn()
+            seconds = time.perf_counter() - start
+            after, tokens_after = faults.snapshot(), prompt_builder.totals()["tokens"]
+            ok = [s for s in summaries if s and s != summarizer.FALLBACK_SUMMARY]
+            output_tokens = sum(prompt_builder.count_tokens(s, summarizer.MODEL) for s in ok)
+            calls = after["calls"]["openai"] - before["calls"]["openai"]
+            errors = after["errors"]["openai"] - before["errors"]["openai"]
+            return {"label": label, "seconds": seconds, "ok": len(ok), "calls": calls, "errors": errors,
+                    "input_tokens": tokens_after - tokens_before, "output_tokens": output_tokens, "stats": stats}
+
+        def sync():
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                return list(pool.map(lambda item: summarizer.summarize_text(*item), items)), None
+
+        def batch():
+            return batch_summarizer.summarize_batch(items, label="bench", poll_interval=0.2, timeout=600)
+
+        results = [run("sync", sync), run("batch", batch)]
+        print(f"{args.tickers} summaries, {args.error_rate:.0%} of OpenAI requests failing")
+        print(f"  {'path':6s} {'wall s':>7s} {'ok':>5s} {'requests':>9s} {'failed':>7s} {'cost $':>8s}  notes")
+        for r in results:
+            stats = r["stats"] or {}
+            batched = stats.get("batched", 0)
+            # Sync requests are billed at list price even on the batch path (its fallback)
+            cost_per_request = (INPUT_PRICE * r["input_tokens"] + OUTPUT_PRICE * r["output_tokens"]) / 1e6 / max(r["ok"], 1)
+            cost = cost_per_request * (batched * BATCH_DISCOUNT + (r["ok"] - batched))
+            notes = (f"{stats['batches']} batch jobs, {stats['requeued']} re-queued, {stats['sync']} sync fallback"
+                     if stats else f"{args.concurrency} in flight")
+            print(f"  {r['label']:6s} {r['seconds']:7.2f} {r['ok']:5d} {r['calls']:9d} {r['errors']:7d} {cost:8.4f}  {notes}")
+    finally:
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# bench_charts.py
+# Compares the downsampled WebGL chart builder with the original full-resolution
+# SVG figure from app.py: build time and the JSON payload sent to the browser.
+# Run: python bench_charts.py [--bars 100,1000,2500,5000,10000] [--width 1400]
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+import charts
+import indicators
+
+
+def legacy_chart(hist):
+    """The original app.py figure: every bar, SVG traces, per-bar color list."""
+    fig = make_subplots(rows=4, cols=1, shared_xaxes=True, row_heights=[0.5, 0.2, 0.15, 0.15],
+                        vertical_spacing=0.03,
+                        subplot_titles=("Price (Candlesticks)", "Volume", "RSI (14)", "MACD (12, 26, 9)"))
+    fig.add_trace(go.Candlestick(x=hist.index, open=hist["Open"], high=hist["High"], low=hist["Low"],
+                                 close=hist["Close"], name="Price"), row=1, col=1)
+    fig.add_trace(go.Scatter(x=hist.index, y=hist["MA50"], name="MA50"), row=1, col=1)
+    fig.add_trace(go.Scatter(x=hist.index, y=hist["MA200"], name="MA200"), row=1, col=1)
+    vol_colors = ["green" if c >= o else "red" for o, c in zip(hist["Open"], hist["Close"])]
+    fig.add_trace(go.Bar(x=hist.index, y=hist["Volume"], marker_color=vol_colors, name="Volume"), row=2, col=1)
+    fig.add_trace(go.Scatter(x=hist.index, y=hist["RSI"], name="RSI"), row=3, col=1)
+    fig.add_trace(go.Scatter(x=hist.index, y=hist["MACD"], name="MACD"), row=4, col=1)
+    fig.add_trace(go.Scatter(x=hist.index, y=hist["Signal"], name="Signal"), row=4, col=1)
+    fig.add_trace(go.Bar(x=hist.index, y=hist["MACD_Hist"], name="MACD Hist", opacity=0.4), row=4, col=1)
+    fig.update_layout(height=900, template="plotly_white")
+    return fig
+
+
+def synthetic_history(n_bars, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end="2024-12-31", periods=n_bars)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, n_bars)))
+    open_ = close * (1 + rng.normal(0, 0.005, n_bars))
+    return pd.DataFrame({
+        "Open": open_,
+        "High": np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, n_bars)),
+        "Low": np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, n_bars)),
+        "Close": close,
+        "Volume": rng.integers(1_000_000, 50_000_000, n_bars).astype(float),
+    }, index=index)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bars", default="100,1000,2500,5000,10000")
+    parser.add_argument("--width", type=int, default=charts.CHART_WIDTH_PX, help="chart width in pixels")
+    args = parser.parse_args()
+    points = charts.max_points(args.width)
+
+    # Plotly builds its trace validators on first use; keep that out of the first row
+    warmup = synthetic_history(300)
+    warmup_panel = indicators.indicators_for("WARMUP", warmup)
+    legacy_chart(warmup.join(warmup_panel)).to_json()
+    charts.price_chart(warmup, warmup_panel, "warmup", points=points)
+
+    print(f"target {points} points for a {args.width}px chart")
+    print(f"  {'bars':>6s} {'legacy ms':>10s} {'legacy KB':>10s} {'new ms':>8s} {'new KB':>8s} {'candles':>8s} {'smaller':>8s}")
+    for n_bars in (int(b) for b in args.bars.split(",") if b.strip()):
+        hist = synthetic_history(n_bars)
+        panel = indicators.indicators_for(f"BENCH{n_bars}", hist)
+        full = hist.join(panel[["MA50", "MA200", "RSI", "MACD", "Signal", "MACD_Hist"]])
+
+        start = time.perf_counter()
+        legacy_kb = charts.payload_bytes(legacy_chart(full)) / 1024
+        t_legacy = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, stats = charts.price_chart(hist, panel, "bench", points=points)
+        t_new = time.perf_counter() - start
+        new_kb = stats["payload_bytes"] / 1024
+
+        # Both timings include serializing the figure, as Streamlit does before sending it
+        print(f"  {n_bars:6d} {t_legacy * 1000:10.1f} {legacy_kb:10.0f} {t_new * 1000:8.1f} {new_kb:8.0f} "
+              f"{stats['candles']:8d} {legacy_kb / new_kb:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+# bench_e2e.py
+# Offline end-to-end latency benchmark. Every external service is replaced by
+# bench_stubs (local HTTP server + yfinance stand-in) with configurable latency
+# and error rates, so runs are repeatable and comparable between commits.
+#
+# Run:   python bench_e2e.py [--sizes 1,10,50,100,500] [--repeat 5]
+#                            [--latency openai=0.3,alpha_vantage=0.05] [--error-rate news=0.05]
+#                            [--output results.json] [--compare previous.json]
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from bench_stubs import Faults, StubServer, make_download_closes, parse_spec
+
+DEFAULT_LATENCY = "alpha_vantage=0.03,news=0.05,finviz=0.08,openai=0.25,resend=0.04,yfinance=0.2"
+SCENARIOS = (
+    "calculate_portfolio_value", "get_stock_data", "get_extended_news",
+    "summarize_text", "monitor_sentiment", "analyze_flow",
+)
+# The Analyze page handles one ticker per click; cap the clicks sampled per size.
+ANALYZE_CLICKS = 10
+REGRESSION_RATIO = 1.2
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class Bench:
+    """Owns the stub server, the isolated on-disk state and the app modules under test."""
+
+    def __init__(self, args):
+        self.args = args
+        self.workdir = tempfile.mkdtemp(prefix="fingpt_bench_")
+        self.faults = Faults(parse_spec(args.latency), parse_spec(args.error_rate), seed=args.seed)
+        self.server = StubServer(self.faults, full_bars=args.bars).start()
+
+        # Everything is configured through the environment before the app is imported
+        os.environ.update(self.server.env())
+        os.environ.update({
+            "FINGPT_CACHE_PATH": os.path.join(self.workdir, "cache.sqlite3"),
+            "FINGPT_PORTFOLIO_DB": os.path.join(self.workdir, "portfolio.db"),
+            "FINGPT_HISTORY_DIR": os.path.join(self.workdir, "history"),
+            "FINGPT_ARTICLE_DB": os.path.join(self.workdir, "articles.sqlite3"),
+            "FINGPT_SENTIMENT_LOG": os.path.join(self.workdir, "sentiment.bin"),
+            "FINGPT_JOBS_DB": os.path.join(self.workdir, "jobs.sqlite3"),
+            "FINGPT_RULES_DB": os.path.join(self.workdir, "rules.sqlite3"),
+            # Quota pacing is not what is being measured here
+            "ALPHA_VANTAGE_CALLS_PER_MINUTE": "1000000",
+            "ALPHA_VANTAGE_CALLS_PER_DAY": "1000000",
+            "ALERT_EMAIL": "bench@example.com",
+            # monitor_sentiment is measured on the synchronous path; bench_batch.py covers batches
+            "FINGPT_LLM_BATCH": "0",
+        })
+        self.server.patch_alpha_vantage_library()
+
+        import alerts
+        import article_index
+        import cache
+        import data_fetcher
+        import history_store
+        import indicators
+        import portfolio
+        import quotes
+        import sentiment
+        import summarizer
+        self.m = {name: module for name, module in locals().items() if name not in ("self",)}
+        quotes._download_closes = make_download_closes(self.faults)
+        self._generation = 0
+
+    def close(self):
+        self.server.stop()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    # --- state ---
+    def reset(self):
+        """Drop every cache so the next measurement is cold."""
+        m = self.m
+        m["cache"].get_cache().clear()
+        m["quotes"].clear_price_cache()
+        m["indicators"]._cache.clear()
+        shutil.rmtree(m["history_store"].HISTORY_DIR, ignore_errors=True)
+        self._generation += 1
+        m["article_index"]._index = m["article_index"].ArticleIndex(
+            os.path.join(self.workdir, f"articles_{self._generation}.sqlite3")
+        )
+
+    def set_portfolio(self, tickers):
+        self.m["portfolio"].save_portfolio([
+            {"ticker": t, "shares": 10 + i % 7, "buy_price": 50 + i % 90} for i, t in enumerate(tickers)
+        ])
+
+    # --- scenarios: each returns a list of latency samples (seconds) ---
+    def _fan_out(self, fn, tickers, workers):
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(fn, tickers))
+
+    def prepare(self, name, tickers):
+        """Inputs a scenario needs that are not part of what it measures."""
+        m = self.m
+        if name == "summarize_text":
+            return [(t, m["data_fetcher"].get_stock_data(t), _news_text(m["data_fetcher"].get_extended_news(t)))
+                    for t in tickers]
+        return None
+
+    def run_scenario(self, name, tickers, inputs=None):
+        m = self.m
+        if name == "calculate_portfolio_value":
+            return [_timed(m["portfolio"].calculate_portfolio_value)]
+        if name == "get_stock_data":
+            return [_timed(lambda: self._fan_out(m["data_fetcher"].get_stock_data, tickers, 8))]
+        if name == "get_extended_news":
+            return [_timed(lambda: self._fan_out(m["data_fetcher"].get_extended_news, tickers, 8))]
+        if name == "summarize_text":
+            return [_timed(lambda: self._fan_out(lambda args: m["summarizer"].summarize_text(*args), inputs, 4))]
+        if name == "monitor_sentiment":
+            return [_timed(m["alerts"].monitor_sentiment)]
+        if name == "analyze_flow":
+            return [_timed(lambda: self.analyze_flow(t)) for t in tickers[:ANALYZE_CLICKS]]
+        raise ValueError(f"Unknown scenario {name}")
+
+    def analyze_flow(self, ticker, period="6mo"):
+        """The Analyze page's data path without Streamlit: fetch concurrently, then stream the summary."""
+        m = self.m
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            fundamentals = pool.submit(m["data_fetcher"].get_stock_data, ticker)
+            history = pool.submit(m["history_store"].get_history, ticker, period)
+            news = pool.submit(m["data_fetcher"].get_extended_news, ticker)
+            hist = history.result()
+            if not hist.empty:
+                m["indicators"].indicators_for(ticker, hist)
+            chunks = m["summarizer"].summarize_text_stream(ticker, fundamentals.result(), _news_text(news.result()))
+            streamed = "".join(c for c in chunks if isinstance(c, str))
+        summary = m["summarizer"].normalize_summary(streamed) or m["summarizer"].FALLBACK_SUMMARY
+        return m["sentiment"].label(m["sentiment"].sentiment_score(summary))
+
+    def measure(self, name, size):
+        tickers = [f"T{i:04d}" for i in range(size)]
+        self.set_portfolio(tickers)
+        samples = []
+        calls = {}
+        errors = {}
+        with self._quiet():
+            for _ in range(self.args.repeat):
+                if not self.args.warm:
+                    self.reset()
+                inputs = self.prepare(name, tickers)
+                before = self.faults.snapshot()
+                samples.extend(self.run_scenario(name, tickers, inputs))
+                after = self.faults.snapshot()
+                for service in after["calls"]:
+                    calls[service] = calls.get(service, 0) + after["calls"][service] - before["calls"][service]
+                    errors[service] = errors.get(service, 0) + after["errors"][service] - before["errors"][service]
+
+        peak = None
+        if not self.args.no_memory:
+            with self._quiet():
+                if not self.args.warm:
+                    self.reset()
+                inputs = self.prepare(name, tickers)
+                tracemalloc.start()
+                try:
+                    self.run_scenario(name, tickers, inputs)
+                    peak = tracemalloc.get_traced_memory()[1]
+                finally:
+                    tracemalloc.stop()
+
+        samples = np.array(samples) * 1000
+        return {
+            "scenario": name,
+            "size": size,
+            "samples": len(samples),
+            "p50_ms": round(float(np.percentile(samples, 50)), 2),
+            "p95_ms": round(float(np.percentile(samples, 95)), 2),
+            "mean_ms": round(float(samples.mean()), 2),
+            # Calls per repeat, so numbers stay comparable across --repeat values
+            "calls": {s: round(n / self.args.repeat, 1) for s, n in calls.items() if n},
+            "errors_injected": {s: n for s, n in errors.items() if n},
+            "peak_memory_kb": round(peak / 1024, 1) if peak is not None else None,
+        }
+
+    @contextlib.contextmanager
+    def _quiet(self):
+        if self.args.verbose:
+            yield
+            return
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def _news_text(items):
+    return "\n".join(f"{n['title']}: {n['summary']}" for n in items)
+
+
+# ----------------------------
+# Comparison
+# ----------------------------
+def compare(current, previous_path):
+    with open(previous_path) as f:
+        previous = json.load(f)
+    old = {(r["scenario"], r["size"]): r for r in previous["results"]}
+    print(f"\nvs {previous_path} ({previous['meta'].get('revision')})")
+    regressions = 0
+    for r in current["results"]:
+        base = old.get((r["scenario"], r["size"]))
+        if base is None:
+            continue
+        ratio = r["p50_ms"] / base["p50_ms"] if base["p50_ms"] else float("inf")
+        flag = "  REGRESSION" if ratio > REGRESSION_RATIO else ""
+        regressions += bool(flag)
+        print(f"  {r['scenario']:26s} {r['size']:4d}  p50 {base['p50_ms']:9.1f} -> {r['p50_ms']:9.1f} ms "
+              f"({ratio:5.2f}x){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1,10,50,100,500")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--latency", default=DEFAULT_LATENCY, help="seconds per service, e.g. openai=0.3")
+    parser.add_argument("--error-rate", default="", help="failure probability per service, e.g. news=0.05")
+    parser.add_argument("--bars", type=int, default=1000, help="bars served for full daily history")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--warm", action="store_true", help="keep caches between repeats")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--output", default=None, help="JSON results path (default bench_results/e2e_<rev>.json)")
+    parser.add_argument("--compare", default=None, help="previous JSON results to diff against")
+    parser.add_argument("--verbose", action="store_true", help="show the app's own log output")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    revision = git_revision()
+
+    bench = Bench(args)
+    results = []
+    try:
+        for name in scenarios:
+            for size in sizes:
+                result = bench.measure(name, size)
+                results.append(result)
+                print(f"{name:26s} {size:4d}  p50 {result['p50_ms']:9.1f} ms  p95 {result['p95_ms']:9.1f} ms  "
+                      f"peak {result['peak_memory_kb'] or 0:9.0f} KB  calls {result['calls']}")
+    finally:
+        bench.close()
+
+    report = {
+        "meta": {
+            "revision": revision,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "verbose")},
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join("bench_results", f"e2e_{revision}.json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📄 Results written to {output}")
+
+    if args.compare:
+        regressions = compare(report, args.compare)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
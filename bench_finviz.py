@@ -0,0 +1,81 @@
+# bench_finviz.py
+# Compares the streaming Finviz news-table parser with the original full-page
+# BeautifulSoup parse over the saved pages in fixtures/finviz.
+# Run: python bench_finviz.py [--repeat 20] [--limit 5] [--processes 4]
+import argparse
+import glob
+import os
+import time
+
+from bs4 import BeautifulSoup
+
+import finviz_parser
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "finviz")
+
+
+def legacy_parse(html, limit=5):
+    """The original data_fetcher Finviz block (titles and links only)."""
+    soup = BeautifulSoup(html, "html.parser")
+    table = soup.find(id="news-table")
+    items = []
+    if table:
+        for row in table.find_all("tr")[:limit]:
+            items.append({"title": row.a.text, "link": row.a["href"]})
+    return items
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            pages[os.path.basename(path)] = f.read()
+
+    print(f"{len(pages)} fixture pages, {sum(map(len, pages.values())) / 1e6:.2f} MB")
+    print(f"  {'page':26s} {'legacy ms':>10s} {'stream ms':>10s} {'speedup':>8s}  rows")
+    for name, html in pages.items():
+        try:
+            legacy = legacy_parse(html, args.limit)
+            t_legacy = timed(lambda: legacy_parse(html, args.limit), args.repeat)
+            legacy_note = ""
+        except Exception as e:
+            legacy, t_legacy, legacy_note = None, None, f"legacy crashed: {type(e).__name__}"
+        items = finviz_parser.parse_news_table(html, limit=args.limit)
+        t_stream = timed(lambda: finviz_parser.parse_news_table(html, limit=args.limit), args.repeat)
+
+        if legacy is not None and [i["title"] for i in legacy] != [i["title"] for i in items]:
+            legacy_note = "titles differ from legacy"
+        legacy_ms = f"{t_legacy * 1000:10.2f}" if t_legacy is not None else f"{'-':>10s}"
+        speedup = f"{t_legacy / t_stream:7.1f}x" if t_legacy is not None else f"{'-':>8s}"
+        print(f"  {name:26s} {legacy_ms} {t_stream * 1000:10.2f} {speedup}  {len(items):4d}  {legacy_note}")
+
+    # Watchlist-scale batch: every fixture page many times over, all rows
+    batch = list(pages.values()) * 25
+    start = time.perf_counter()
+    finviz_parser.parse_many(batch)
+    t_serial = time.perf_counter() - start
+    start = time.perf_counter()
+    finviz_parser.parse_many(batch, processes=args.processes)
+    t_parallel = time.perf_counter() - start
+    print(f"parse_many, {len(batch)} pages, all rows ({os.cpu_count()} CPUs)")
+    print(f"  serial                   : {t_serial * 1000:9.1f} ms  ({len(batch) / t_serial:7.0f} pages/s)")
+    print(f"  {args.processes} processes              : {t_parallel * 1000:9.1f} ms  ({len(batch) / t_parallel:7.0f} pages/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# bench_indicators.py
+# Compares the NumPy indicator engine with the per-ticker pandas code that used
+# to live in app.py.  Run: python bench_indicators.py [--tickers 50] [--bars 2500]
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import indicators
+
+
+def pandas_reference(hist):
+    """The original app.py indicator block, one ticker at a time."""
+    hist = hist.copy()
+    hist["MA50"] = hist["Close"].rolling(window=50).mean()
+    hist["MA200"] = hist["Close"].rolling(window=200).mean()
+
+    delta = hist["Close"].diff()
+    gain = delta.clip(lower=0)
+    loss = -delta.clip(upper=0)
+    avg_gain = gain.ewm(alpha=1/14, min_periods=14, adjust=False).mean()
+    avg_loss = loss.ewm(alpha=1/14, min_periods=14, adjust=False).mean()
+    rs = avg_gain / avg_loss
+    hist["RSI"] = 100 - (100 / (1 + rs))
+
+    fast_ema = hist["Close"].ewm(span=12, adjust=False).mean()
+    slow_ema = hist["Close"].ewm(span=26, adjust=False).mean()
+    hist["MACD"] = fast_ema - slow_ema
+    hist["Signal"] = hist["MACD"].ewm(span=9, adjust=False).mean()
+    hist["MACD_Hist"] = hist["MACD"] - hist["Signal"]
+    return hist
+
+
+def synthetic_histories(n_tickers, n_bars, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end="2024-12-31", periods=n_bars)
+    histories = {}
+    for i in range(n_tickers):
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, n_bars)))
+        histories[f"T{i:03d}"] = pd.DataFrame({
+            "Open": close * (1 + rng.normal(0, 0.003, n_bars)),
+            "High": close * 1.01,
+            "Low": close * 0.99,
+            "Close": close,
+            "Volume": rng.integers(100_000, 5_000_000, n_bars).astype(float),
+        }, index=index)
+    return histories
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=50)
+    parser.add_argument("--bars", type=int, default=2500)
+    args = parser.parse_args()
+
+    histories = synthetic_histories(args.tickers, args.bars)
+
+    t_pandas, reference = timed(lambda: {t: pandas_reference(h) for t, h in histories.items()})
+    t_numpy, panel = timed(lambda: indicators.panel(histories))
+
+    worst = 0.0
+    for name in ("MA50", "MA200", "RSI", "MACD", "Signal", "MACD_Hist"):
+        for ticker, ref in reference.items():
+            diff = np.nanmax(np.abs(panel[name][ticker].to_numpy() - ref[name].to_numpy()))
+            worst = max(worst, diff)
+
+    # Incremental: one new bar on top of a warm state vs a full recompute
+    sample = next(iter(histories.values()))
+    warm = sample.iloc[:-1]
+    indicators._cache.clear()
+    indicators.indicators_for("BENCH", warm)
+    start = time.perf_counter()
+    indicators.indicators_for("BENCH", sample)
+    t_incremental = time.perf_counter() - start
+    t_single, _ = timed(lambda: pandas_reference(sample))
+
+    print(f"{args.tickers} tickers x {args.bars} bars")
+    print(f"  pandas, per ticker loop : {t_pandas * 1000:9.1f} ms")
+    print(f"  numpy, one panel pass   : {t_numpy * 1000:9.1f} ms  ({t_pandas / t_numpy:.1f}x, incl. 5 extra indicators)")
+    print(f"  max abs difference      : {worst:.2e}")
+    print("one ticker, one new bar")
+    print(f"  pandas full recompute   : {t_single * 1000:9.2f} ms")
+    print(f"  incremental update      : {t_incremental * 1000:9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# bench_prompt.py
+# Prompt size and summary latency before/after prompt compaction. News is
+# synthetic but shaped like the real feeds: Google News titles carry a
+# " - Publisher" suffix and an HTML summary repeating the title, Finviz runs
+# many of the same stories reworded, and fundamentals are Alpha Vantage strings.
+# Latency runs against the bench_stubs OpenAI stand-in, whose delay grows with
+# the prompt (--token-ms per prompt token); --live uses the real API instead.
+# Run: python bench_prompt.py [--items 5,10,15] [--tickers 20] [--token-ms 0.3] [--live]
+import argparse
+import contextlib
+import io
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import numpy as np
+
+from bench_stubs import Faults, StubServer
+
+_STORIES = (
+    "{name} beats quarterly earnings estimates as services revenue hits record",
+    "{name} shares slip after {t} supplier warns on weaker demand",
+    "Analysts raise {name} price target ahead of product launch",
+    "{name} announces $90 billion share buyback and dividend increase",
+    "Regulators open antitrust probe into {name} app store practices",
+    "{t} stock: what to watch before the Fed rate decision",
+    "{name} expands manufacturing in India to diversify supply chain",
+    "Is {name} stock a buy after the recent pullback?",
+    "{name} faces lawsuit over patent infringement claims",
+    "Hedge funds trim {t} positions in latest 13F filings",
+    "{name} unveils new AI features for its flagship devices",
+    "Chipmakers rally as {name} orders surge",
+    "{name} CFO says margins will stay under pressure next quarter",
+    "Why {t} is lagging the Nasdaq this month",
+    "{name} to report earnings next week: what to expect",
+    "{name} hires former rival executive to lead chip design",
+    "Short interest in {t} climbs to a two-year high",
+    "{name} cuts prices in China as smartphone competition heats up",
+    "Warren Buffett's Berkshire sells more {name} stock",
+    "{name} wins Pentagon cloud contract worth $2 billion",
+    "{name} recalls devices over battery overheating concerns",
+    "{t} options traders bet on big move after earnings",
+    "{name} delays flagship launch amid component shortage",
+    "EU fines {name} over digital markets rules",
+    "{name} market value tops $3 trillion for the first time",
+    "{name} partners with OpenAI on assistant upgrade",
+    "Insiders sell {t} shares as stock nears all-time high",
+    "{name} streaming unit posts first profitable quarter",
+    "Goldman Sachs downgrades {name} citing valuation",
+    "{name} supplier Foxconn reports record monthly sales",
+)
+_REWORDS = (("beats", "tops"), ("shares slip", "stock falls"), ("raise", "lift"), ("announces", "unveils"),
+            ("open", "launch"), ("expands", "boosts"), ("faces", "hit with"))
+_PUBLISHERS = ("Reuters", "Bloomberg", "CNBC", "MarketWatch", "Yahoo Finance", "The Motley Fool", "Barron's")
+
+
+def synthetic_news(ticker, name, per_source, seed=0):
+    """Google News and Finviz items for one ticker, newest first within each source."""
+    rng = random.Random(f"{ticker}-{seed}")
+    now = datetime.now(timezone.utc)
+    stories = [s.format(name=name, t=ticker) for s in rng.sample(_STORIES, min(per_source * 2, len(_STORIES)))]
+    stories += [rng.choice(stories) for _ in range(per_source * 2 - len(stories))]
+    google, finviz = [], []
+    for i in range(per_source):
+        headline, publisher = stories[i], rng.choice(_PUBLISHERS)
+        google.append({
+            "title": f"{headline} - {publisher}",
+            "summary": f'<a href="https://news.google.com/rss/articles/CBMi{rng.getrandbits(64):x}?oc=5" '
+                       f'target="_blank">{headline} - {publisher}</a>&nbsp;&nbsp;<font color="#6f6f6f">{publisher}</font>',
+            "source": "Google News",
+            "link": f"https://news.example.com/{ticker.lower()}/g{i}",
+            "published": format_datetime(now - timedelta(hours=6 * i + rng.uniform(0, 6))),
+        })
+        # Half of Finviz's rows are the same stories, reworded
+        headline = stories[i] if i % 2 == 0 else stories[per_source + i]
+        for old, new in _REWORDS[:rng.randint(0, 2)]:
+            headline = headline.replace(old, new)
+        finviz.append({
+            "title": headline,
+            "summary": "(via Finviz)",
+            "source": "Finviz",
+            "link": f"https://finviz.example.com/{ticker.lower()}/{i}",
+            "published": (now - timedelta(hours=8 * i + rng.uniform(0, 8))).replace(tzinfo=None).isoformat(timespec="seconds"),
+        })
+    return google + finviz
+
+
+def synthetic_fundamentals(ticker, name, seed=0):
+    """Alpha Vantage OVERVIEW/INCOME_STATEMENT fields as data_fetcher.get_stock_data returns them."""
+    rng = random.Random(f"{ticker}-{seed}")
+    return {
+        "Company": name, "Sector": "TECHNOLOGY", "Industry": "ELECTRONIC COMPUTERS",
+        "Market Cap ($)": str(rng.randint(10**11, 4 * 10**12)), "P/E Ratio": f"{rng.uniform(10, 45):.2f}",
+        "EPS": f"{rng.uniform(1, 12):.2f}", "Dividend Yield": f"{rng.uniform(0, 0.03):.4f}",
+        "Beta": f"{rng.uniform(0.6, 1.8):.3f}", "52w High": f"{rng.uniform(150, 260):.2f}",
+        "52w Low": f"{rng.uniform(100, 150):.2f}", "EBITDA ($)": str(rng.randint(10**10, 2 * 10**11)),
+        "Revenue ($)": str(rng.randint(5 * 10**10, 4 * 10**11)), "Net Income ($)": "None",
+    }
+
+
+def token_table(prompt_builder, model, sizes, tickers):
+    print(f"prompt tokens ({prompt_builder.tokenizer_name(model)}, budget {prompt_builder.PROMPT_TOKEN_BUDGET})")
+    print(f"  {'items':>5s} {'legacy':>8s} {'compact':>8s} {'saved':>7s} {'headlines used':>15s} {'build ms':>9s}")
+    for per_source in sizes:
+        rows = []
+        for i in range(tickers):
+            ticker, name = f"T{i:03d}", f"Company{i} Inc"
+            news = synthetic_news(ticker, name, per_source)
+            fundamentals = synthetic_fundamentals(ticker, name)
+            start = time.perf_counter()
+            _, report = prompt_builder.build(ticker, fundamentals, news, model)
+            rows.append((report, time.perf_counter() - start))
+        legacy = np.mean([r["baseline_tokens"] for r, _ in rows])
+        compact = np.mean([r["tokens"] for r, _ in rows])
+        used = np.mean([r["used"] for r, _ in rows])
+        print(f"  {2 * per_source:5d} {legacy:8.0f} {compact:8.0f} {1 - compact / legacy:6.0%} "
+              f"{used:8.1f} / {2 * per_source:<4d} {np.mean([t for _, t in rows]) * 1000:9.2f}")
+
+
+def latency(summarizer, prompt_builder, per_source, tickers):
+    """Mean and p95 seconds per uncached summary with the legacy and the compact prompt."""
+    inputs = []
+    for i in range(tickers):
+        ticker, name = f"L{i:03d}", f"Company{i} Inc"
+        inputs.append((ticker, synthetic_fundamentals(ticker, name), synthetic_news(ticker, name, per_source)))
+    compact_prompt = summarizer.build_prompt
+    results = {}
+    for label, builder in (("legacy", prompt_builder.legacy_prompt), ("compact", compact_prompt)):
+        summarizer.build_prompt = builder
+        timings = []
+        for ticker, fundamentals, news in inputs:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                summarizer._generate_summary(ticker, fundamentals, news)
+            timings.append(time.perf_counter() - start)
+        results[label] = (float(np.mean(timings)), float(np.percentile(timings, 95)))
+    summarizer.build_prompt = compact_prompt
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", default="5,10,15", help="headlines per source")
+    parser.add_argument("--tickers", type=int, default=20)
+    parser.add_argument("--openai-latency", type=float, default=0.25, help="stub base latency, seconds")
+    parser.add_argument("--token-ms", type=float, default=0.3, help="stub latency per prompt token, ms")
+    parser.add_argument("--live", action="store_true", help="call the real OpenAI API (uses OPENAI_API_KEY, costs tokens)")
+    args = parser.parse_args()
+
+    server = None
+    if not args.live:
+        server = StubServer(Faults({"openai": args.openai_latency}, prompt_token_latency=args.token_ms / 1000)).start()
+        os.environ.update({k: v for k, v in server.env().items() if k.startswith("OPENAI")})
+    import prompt_builder
+    import summarizer
+
+    try:
+        sizes = [int(n) for n in args.items.split(",") if n.strip()]
+        token_table(prompt_builder, summarizer.MODEL, sizes, args.tickers)
+        per_source = sizes[len(sizes) // 2]
+        results = latency(summarizer, prompt_builder, per_source, args.tickers)
+        where = "OpenAI API" if args.live else f"stub: {args.openai_latency * 1000:.0f} ms + {args.token_ms} ms/prompt token"
+        print(f"latency per summary, {2 * per_source} headlines ({where})")
+        for label, (mean, p95) in results.items():
+            print(f"  {label:8s} mean {mean * 1000:7.1f} ms   p95 {p95 * 1000:7.1f} ms")
+        print(f"  saved    {(results['legacy'][0] - results['compact'][0]) * 1000:7.1f} ms per summary")
+    finally:
+        if server is not None:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
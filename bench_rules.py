@@ -0,0 +1,85 @@
+# bench_rules.py
+# Alert-rule evaluation cost vs how many inputs changed since the last run.
+# Synthetic users each hold sentiment, price-move, RSI and drawdown rules over
+# a share of a common ticker universe; every run presents all inputs, of which
+# a varying fraction carry a new value. The 100% row is what re-checking every
+# rule each run costs.
+# Run: python bench_rules.py [--users 500] [--tickers 200] [--per-user 20] [--changed 0,0.01,0.1,1]
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--tickers", type=int, default=200)
+    parser.add_argument("--per-user", type=int, default=20, help="tickers per user")
+    parser.add_argument("--changed", default="0,0.01,0.1,1", help="fractions of inputs with new values")
+    parser.add_argument("--bars", type=int, default=250, help="closes per ticker")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="fingpt_rules_")
+    os.environ["FINGPT_RULES_DB"] = os.path.join(workdir, "rules.sqlite3")
+    import rules
+
+    try:
+        rng = random.Random(0)
+        np_rng = np.random.default_rng(0)
+        universe = [f"T{i:04d}" for i in range(args.tickers)]
+        specs = {}
+        for u in range(args.users):
+            tickers = rng.sample(universe, min(args.per_user, len(universe)))
+            specs[f"user{u}@example.com"] = [
+                {"kind": "sentiment", "tickers": tickers, "below": rng.choice([-0.3, -0.5])},
+                {"kind": "price_move", "tickers": tickers[:5], "above": 3.0, "below": -3.0},
+                {"kind": "rsi", "tickers": tickers[:5]},
+                {"kind": "drawdown", "tickers": tickers[:3], "below": -8.0},
+            ]
+        engine = rules.RuleEngine()
+        start = time.perf_counter()
+        added, _ = engine.sync(specs)
+        print(f"{added} rules for {args.users} users over {args.tickers} tickers (sync {time.perf_counter() - start:.2f}s)")
+
+        state = {t: {"score": rng.uniform(-1, 1),
+                     "closes": 100 * np.exp(np.cumsum(np_rng.normal(0, 0.02, args.bars))),
+                     "buy": rng.uniform(60, 140), "version": 0} for t in universe}
+
+        def inputs():
+            out = {}
+            for t, s in state.items():
+                out[("sentiment", t)] = (round(s["score"], 4), s["score"])
+                out[("closes", t)] = (s["version"], lambda s=s: s["closes"])
+                out[("position", t)] = ([round(s["closes"][-1], 4), s["buy"]], (float(s["closes"][-1]), s["buy"]))
+            return out
+
+        def change(fraction):
+            for t in rng.sample(universe, int(round(fraction * len(universe)))):
+                s = state[t]
+                s["score"] = rng.uniform(-1, 1)
+                s["closes"] = np.append(s["closes"][1:], s["closes"][-1] * np.exp(np_rng.normal(0, 0.03)))
+                s["version"] += 1
+
+        engine.evaluate(inputs(), now=0)  # first run sees every rule once
+        print(f"  {'changed':>8s} {'inputs':>7s} {'changed in':>11s} {'evaluated':>10s} {'fired':>6s} {'ms':>8s}")
+        now = 0
+        for fraction in [float(f) for f in args.changed.split(",") if f.strip()]:
+            change(fraction)
+            now += 3600
+            current = inputs()
+            start = time.perf_counter()
+            _, stats = engine.evaluate(current, now=now)
+            ms = (time.perf_counter() - start) * 1000
+            print(f"  {fraction:8.0%} {stats['inputs']:7d} {stats['changed_inputs']:11d} {stats['evaluated']:10d} "
+                  f"{stats['fired']:6d} {ms:8.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
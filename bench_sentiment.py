@@ -0,0 +1,73 @@
+# bench_sentiment.py
+# Throughput of the compiled sentiment scorer vs the original keyword scan.
+# Run: python bench_sentiment.py [--texts 20000]
+import argparse
+import random
+import time
+
+import sentiment
+
+HEADLINE_WORDS = (
+    "Apple shares record quarterly profit as iPhone growth beats estimates but China risk remains "
+    "analysts downgrade stock on slowdown fears margins decline amid weak demand headwinds "
+    "company did not miss guidance resilient momentum upside bearish investors loss lawsuit "
+    "the a of to in on for with revenue earnings outlook market sector dividend buyback"
+).split()
+
+
+def legacy_analyze_sentiment(summary):
+    """The original summarizer.analyze_sentiment."""
+    text = summary.lower()
+    positive_keywords = ["growth", "strong", "beat", "bullish", "improved", "upside", "profit", "resilient", "momentum"]
+    negative_keywords = ["decline", "weak", "bearish", "loss", "downgrade", "headwind", "slowdown", "risk"]
+
+    if any(word in text for word in positive_keywords):
+        return "positive"
+    elif any(word in text for word in negative_keywords):
+        return "negative"
+    else:
+        return "neutral"
+
+
+def synthetic_texts(n, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(HEADLINE_WORDS, k=rng.randint(8, 40))) for _ in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--texts", type=int, default=20000)
+    args = parser.parse_args()
+
+    texts = synthetic_texts(args.texts)
+    chars = sum(len(t) for t in texts)
+
+    start = time.perf_counter()
+    [legacy_analyze_sentiment(t) for t in texts]
+    t_legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    [sentiment.sentiment_score(t) for t in texts]
+    t_single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scores = sentiment.score_batch(texts)
+    t_batch = time.perf_counter() - start
+
+    print(f"{len(texts)} texts, {chars / 1e6:.1f}M chars")
+    for name, seconds in (
+        ("legacy keyword scan (label only)", t_legacy),
+        ("compiled scorer, one call each", t_single),
+        ("compiled scorer, score_batch", t_batch),
+    ):
+        print(f"  {name:34s} {seconds * 1000:8.1f} ms  {len(texts) / seconds:10.0f} texts/s")
+
+    flips = sum(
+        1 for t, s in zip(texts, scores)
+        if legacy_analyze_sentiment(t) == "positive" and sentiment.label(s) == "negative"
+    )
+    print(f"  texts the legacy scan called positive that score negative: {flips}")
+
+
+if __name__ == "__main__":
+    main()
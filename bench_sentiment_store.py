@@ -0,0 +1,76 @@
+# bench_sentiment_store.py
+# Sentiment store queries over a synthetic portfolio: append throughput, log
+# load, and rolling correlation / lead-lag across every ticker. Scores are
+# generated with a known link to the next 5-day return so the output can be
+# sanity-checked (correlation should peak at small positive lags).
+# Run: python bench_sentiment_store.py [--tickers 500] [--bars 750]
+import argparse
+import os
+import shutil
+import time
+
+import numpy as np
+
+import bench_analytics  # sets FINGPT_HISTORY_DIR to a temp store before analytics is imported
+import history_store
+import sentiment_store
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def synthetic_scores(tickers, density, seed=1):
+    """One score per (day, ticker) with probability `density`, tilted toward the next 5-day return."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for ticker in tickers:
+        days, closes = history_store.read_closes(ticker)
+        forward = np.r_[closes[5:] / closes[:-5] - 1, np.zeros(5)]
+        picked = rng.random(len(days)) < density
+        scores = np.tanh(8 * forward + rng.normal(0, 0.5, len(days)))
+        for day, score in zip(days[picked], scores[picked]):
+            rows.append((ticker, float(score), "bench", day * 86400.0 + 15 * 3600))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--bars", type=int, default=750)
+    parser.add_argument("--density", type=float, default=0.6, help="share of days with a recorded score")
+    args = parser.parse_args()
+
+    store = sentiment_store.SentimentStore(os.path.join(bench_analytics._workdir, "sentiment.bin"))
+    sentiment_store._store = store
+    try:
+        tickers = bench_analytics.write_store(args.tickers, args.bars)
+        rows = synthetic_scores(tickers, args.density)
+        _, t_append = timed(lambda: store.append(rows))
+        _, t_load = timed(store.records)
+        _, t_matrix = timed(lambda: sentiment_store.rolling_correlation(tickers))
+        corr, t_corr = timed(lambda: sentiment_store.rolling_correlation(tickers))
+        table, t_lead = timed(lambda: sentiment_store.lead_lag(tickers))
+        store.append(rows[:args.tickers])
+        _, t_tail = timed(store.records)
+
+        print(f"{len(rows):,} scores for {args.tickers} tickers over {args.bars} days "
+              f"({os.path.getsize(store.path) / 1e6:.1f} MB log)")
+        print(f"  append (one batch)              : {t_append * 1000:8.1f} ms")
+        print(f"  load log                        : {t_load * 1000:8.1f} ms")
+        print(f"  read {args.tickers} appended records       : {t_tail * 1000:8.1f} ms")
+        print(f"  rolling correlation, first call : {t_matrix * 1000:8.1f} ms  (includes price matrix build)")
+        print(f"  rolling correlation             : {t_corr * 1000:8.1f} ms")
+        print(f"  lead-lag, 21 lags               : {t_lead * 1000:8.1f} ms")
+        print(f"  latest pooled 60-day correlation: {corr['portfolio'].dropna().iloc[-1]:+.3f}")
+        print("  lead-lag (pooled):")
+        for lag in (-5, -1, 0, 1, 2, 5, 10):
+            print(f"    lag {lag:+3d}  {table.loc[lag, 'correlation']:+.3f}  ({table.loc[lag, 'pairs']:,} pairs)")
+    finally:
+        shutil.rmtree(bench_analytics._workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
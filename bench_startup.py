@@ -0,0 +1,174 @@
+# bench_startup.py
+# Streamlit cold-start and rerun latency for app.py, measured headless with
+# AppTest in a fresh interpreter per sample. No network: every service is
+# either unconfigured or pointed at a closed local port.
+#
+# Run:   python bench_startup.py [--repeat 5] [--reruns 10] [--compare REF]
+#        (--compare measures git revision REF from a temporary worktree too)
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+SECTIONS = ("AI Research Copilot", "Portfolio Tracker", "Daily Alerts Setup")
+TOP_IMPORTS = 8
+
+# Executed in the child interpreter with the app directory as cwd
+_CHILD = r"""
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+
+sections, reruns = json.loads(sys.argv[1])
+sys.stderr.write("--- app run ---\n")
+sys.stderr.flush()
+
+at = AppTest.from_file("app.py", default_timeout=120)
+start = time.perf_counter()
+at.run()
+result = {"cold_ms": (time.perf_counter() - start) * 1000, "rerun_ms": {}, "errors": [str(e.value) for e in at.exception]}
+
+for section in sections:
+    at.sidebar.radio[0].set_value(section).run()
+    samples = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        at.run()
+        samples.append((time.perf_counter() - start) * 1000)
+    result["rerun_ms"][section] = samples
+    result["errors"] += [str(e.value) for e in at.exception]
+
+print("RESULT " + json.dumps(result))
+"""
+
+_IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _child_env(workdir):
+    env = dict(os.environ)
+    for name in ("FINGPT_METRICS_PORT", "FINGPT_PROFILE"):
+        env.pop(name, None)
+    env.update({
+        "FINGPT_CACHE_PATH": os.path.join(workdir, "cache.sqlite3"),
+        "FINGPT_PORTFOLIO_DB": os.path.join(workdir, "portfolio.db"),
+        "FINGPT_HISTORY_DIR": os.path.join(workdir, "history"),
+        "FINGPT_ARTICLE_DB": os.path.join(workdir, "articles.sqlite3"),
+        "FINGPT_SENTIMENT_LOG": os.path.join(workdir, "sentiment.bin"),
+        "FINGPT_JOBS_DB": os.path.join(workdir, "jobs.sqlite3"),
+        "FINGPT_RULES_DB": os.path.join(workdir, "rules.sqlite3"),
+        # Configured but unreachable, so client construction is still exercised
+        "SUPABASE_URL": "http://127.0.0.1:9",
+        "SUPABASE_KEY": "bench-anon-key",
+        "ALPHA_VANTAGE_KEY": "bench",
+        "OPENAI_API_KEY": "bench",
+        "RESEND_API_KEY": "bench",
+        "PYTHONDONTWRITEBYTECODE": "1",
+    })
+    return env
+
+
+def _top_imports(stderr):
+    """Slowest top-level imports triggered by the app script (cumulative ms)."""
+    _, _, after = stderr.partition("--- app run ---\n")
+    rows = []
+    for line in after.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match and len(match.group(3)) == 1:
+            rows.append((match.group(4), int(match.group(2)) / 1000))
+    rows.sort(key=lambda r: -r[1])
+    return rows
+
+
+def measure(app_dir, repeat, reruns):
+    """Median cold start, per-section rerun p50 and the import breakdown for one checkout."""
+    workdir = tempfile.mkdtemp(prefix="fingpt_startup_")
+    colds, reruns_by_section, imports, errors = [], {s: [] for s in SECTIONS}, {}, set()
+    try:
+        for i in range(repeat):
+            # Fresh state per sample: a cold process with no warm caches on disk
+            for name in os.listdir(workdir):
+                path = os.path.join(workdir, name)
+                shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+            proc = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", _CHILD, json.dumps([SECTIONS, reruns])],
+                cwd=app_dir, env=_child_env(workdir), capture_output=True, text=True,
+            )
+            line = next((l for l in proc.stdout.splitlines() if l.startswith("RESULT ")), None)
+            if line is None:
+                raise RuntimeError(f"benchmark child failed in {app_dir}:\n{proc.stderr[-2000:]}")
+            result = json.loads(line[len("RESULT "):])
+            colds.append(result["cold_ms"])
+            for section, samples in result["rerun_ms"].items():
+                reruns_by_section[section].extend(samples)
+            errors.update(result["errors"])
+            for name, ms in _top_imports(proc.stderr):
+                imports.setdefault(name, []).append(ms)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    import_ms = sorted(((n, statistics.median(v)) for n, v in imports.items()), key=lambda r: -r[1])
+    return {
+        "cold_ms": round(statistics.median(colds), 1),
+        "rerun_p50_ms": {s: round(statistics.median(v), 1) for s, v in reruns_by_section.items()},
+        "import_ms": round(sum(ms for _, ms in import_ms), 1),
+        "top_imports": [(n, round(ms, 1)) for n, ms in import_ms[:TOP_IMPORTS]],
+        "errors": sorted(errors),
+    }
+
+
+def _worktree(ref):
+    path = tempfile.mkdtemp(prefix="fingpt_ref_")
+    os.rmdir(path)
+    subprocess.run(["git", "worktree", "add", "--detach", path, ref], check=True, capture_output=True)
+    return path
+
+
+def report(label, r):
+    print(f"\n{label}")
+    print(f"  cold start (first script run) : {r['cold_ms']:8.1f} ms")
+    print(f"  imports pulled in by app.py   : {r['import_ms']:8.1f} ms")
+    for name, ms in r["top_imports"]:
+        print(f"      {name:26s}{ms:8.1f} ms")
+    for section, ms in r["rerun_p50_ms"].items():
+        print(f"  rerun p50 {section:20s}: {ms:8.1f} ms")
+    for error in r["errors"]:
+        print(f"  ⚠️ app raised: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streamlit cold-start / rerun benchmark.")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per checkout")
+    parser.add_argument("--reruns", type=int, default=10, help="timed reruns per section")
+    parser.add_argument("--compare", default=None, help="git revision to measure as the baseline")
+    parser.add_argument("--output", default=None, help="write results as JSON")
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = {"current": measure(here, args.repeat, args.reruns)}
+    if args.compare:
+        path = _worktree(args.compare)
+        try:
+            results[args.compare] = measure(path, args.repeat, args.reruns)
+        finally:
+            subprocess.run(["git", "worktree", "remove", "--force", path], capture_output=True)
+        report(f"baseline ({args.compare})", results[args.compare])
+    report("current", results["current"])
+
+    if args.compare:
+        base, current = results[args.compare], results["current"]
+        print("\ncurrent vs baseline")
+        print(f"  cold start : {base['cold_ms']:8.1f} -> {current['cold_ms']:8.1f} ms")
+        for section in SECTIONS:
+            print(f"  {section:20s}: {base['rerun_p50_ms'][section]:8.1f} -> {current['rerun_p50_ms'][section]:8.1f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
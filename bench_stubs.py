@@ -0,0 +1,482 @@
+# bench_stubs.py
+# Local stand-ins for every external service the app talks to, for offline
+# benchmarks: one threaded HTTP server serving Alpha Vantage, Google News RSS,
+# Finviz, OpenAI (chat and Batch API) and Resend, plus an in-process
+# replacement for the yfinance batch download. Each service has its own
+# injectable latency and error rate.
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from datetime import date, timedelta
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+SERVICES = ("alpha_vantage", "news", "finviz", "openai", "resend", "yfinance")
+FINVIZ_FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "finviz", "aapl_full.html")
+
+_WORDS = (
+    "shares rally record earnings beat guidance analysts upgrade demand supply chain margin "
+    "outlook dividend buyback market rates inflation chip weak decline lawsuit growth strong"
+).split()
+_SUMMARY = (
+    "{t} operates in a competitive sector with solid margins and a reasonable valuation relative to peers. "
+    "Revenue growth has been steady and the balance sheet remains strong.\n\n"
+    "Recent headlines point to record earnings and an analyst upgrade, while supply chain commentary was mixed. "
+    "Management reiterated guidance for the coming quarters.\n\n"
+    "Risks include rate sensitivity, slowing demand and regulatory headwinds; the outlook is balanced with "
+    "modest upside if margins hold."
+)
+
+
+def parse_spec(spec, default=0.0):
+    """Parse "alpha_vantage=0.05,openai=0.3" (or a bare number for all services)."""
+    values = {name: default for name in SERVICES}
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "=" in part:
+            name, value = part.split("=", 1)
+            if name.strip() not in values:
+                raise ValueError(f"Unknown service {name!r}; expected one of {', '.join(SERVICES)}")
+            values[name.strip()] = float(value)
+        else:
+            values = {name: float(part) for name in SERVICES}
+    return values
+
+
+def _seed_for(*parts):
+    return zlib.crc32("|".join(map(str, parts)).encode("utf-8"))
+
+
+class Faults:
+    """
+    Per-service latency (seconds, ±50% jitter) and error probability, plus call
+    counters. `prompt_token_latency` adds seconds per OpenAI prompt token, so
+    prompt size shows up in completion latency.
+    """
+
+    def __init__(self, latency=None, error_rate=None, seed=0, prompt_token_latency=0.0):
+        self.latency = {name: 0.0 for name in SERVICES}
+        self.latency.update(latency or {})
+        self.error_rate = {name: 0.0 for name in SERVICES}
+        self.error_rate.update(error_rate or {})
+        self.prompt_token_latency = prompt_token_latency
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = {name: 0 for name in SERVICES}
+        self.errors = {name: 0 for name in SERVICES}
+
+    def hit(self, service):
+        """Count a call, sleep its latency and return True if it should fail."""
+        with self._lock:
+            self.calls[service] += 1
+            jitter = self._rng.uniform(0.5, 1.5)
+            fail = self._rng.random() < self.error_rate[service]
+            if fail:
+                self.errors[service] += 1
+        delay = self.latency[service] * jitter
+        if delay:
+            time.sleep(delay)
+        return fail
+
+    def snapshot(self):
+        with self._lock:
+            return {"calls": dict(self.calls), "errors": dict(self.errors)}
+
+
+# ----------------------------
+# Payloads
+# ----------------------------
+def overview(symbol):
+    rng = random.Random(_seed_for("overview", symbol))
+    return {
+        "Symbol": symbol, "Name": f"{symbol} Holdings Inc", "Sector": "TECHNOLOGY",
+        "Industry": "SOFTWARE", "MarketCapitalization": str(rng.randint(10**9, 10**12)),
+        "PERatio": f"{rng.uniform(8, 60):.2f}", "EPS": f"{rng.uniform(-2, 12):.2f}",
+        "DividendYield": f"{rng.uniform(0, 0.04):.4f}", "Beta": f"{rng.uniform(0.5, 2):.2f}",
+        "52WeekHigh": f"{rng.uniform(150, 250):.2f}", "52WeekLow": f"{rng.uniform(50, 150):.2f}",
+    }
+
+
+def income_statement(symbol):
+    rng = random.Random(_seed_for("income", symbol))
+    return {"symbol": symbol, "annualReports": [{
+        "fiscalDateEnding": "2024-12-31",
+        "ebitda": str(rng.randint(10**8, 10**11)),
+        "totalRevenue": str(rng.randint(10**9, 10**12)),
+        "netIncome": str(rng.randint(10**7, 10**10)),
+    }]}
+
+
+def daily_series(symbol, bars):
+    rng = np.random.default_rng(_seed_for("daily", symbol))
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, bars)))
+    end = date.today()
+    days = []
+    d = end
+    while len(days) < bars:
+        if d.weekday() < 5:
+            days.append(d)
+        d -= timedelta(days=1)
+    series = {}
+    for i, day in enumerate(days):  # newest first, like the real API
+        c = close[bars - 1 - i]
+        series[day.isoformat()] = {
+            "1. open": f"{c * 0.998:.4f}", "2. high": f"{c * 1.01:.4f}",
+            "3. low": f"{c * 0.99:.4f}", "4. close": f"{c:.4f}",
+            "5. volume": str(int(rng.integers(100_000, 5_000_000))),
+        }
+    return {
+        "Meta Data": {"1. Information": "Daily Prices", "2. Symbol": symbol, "3. Last Refreshed": end.isoformat()},
+        "Time Series (Daily)": series,
+    }
+
+
+def rss_feed(query, items=10):
+    rng = random.Random(_seed_for("rss", query, date.today()))
+    symbol = query.split()[0].upper() if query else "MARKET"
+    entries = []
+    for i in range(items):
+        title = f"{symbol} " + " ".join(rng.choice(_WORDS) for _ in range(rng.randint(5, 10))) + " - Reuters"
+        entries.append(
+            f"<item><title>{title}</title><link>https://news.example.com/{symbol.lower()}/{i}</link>"
+            f"<pubDate>Mon, 13 Oct 2025 {9 + i % 8:02d}:00:00 GMT</pubDate>"
+            f"<description>{' '.join(rng.choice(_WORDS) for _ in range(20))}</description></item>"
+        )
+    return '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>News</title>' + "".join(entries) + "</channel></rss>"
+
+
+def chat_completion(prompt, model):
+    ticker = "the company"
+    marker = "stock **"
+    if marker in prompt:
+        ticker = prompt.split(marker, 1)[1].split("**", 1)[0]
+    return _SUMMARY.format(t=ticker), len(prompt) // 4
+
+
+def completion_body(payload, faults=None):
+    """Chat completion response for a request body; sleeps the per-prompt-token latency."""
+    prompt = "".join(m.get("content", "") for m in payload.get("messages", []))
+    model = payload.get("model", "stub")
+    text, prompt_tokens = chat_completion(prompt, model)
+    if faults is not None and faults.prompt_token_latency:
+        time.sleep(prompt_tokens * faults.prompt_token_latency)
+    return {
+        "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(text) // 4,
+                  "total_tokens": prompt_tokens + len(text) // 4},
+    }
+
+
+class BatchQueue:
+    """
+    In-memory OpenAI Files + Batch API. A batch completes `batch_seconds` after
+    it is created (checked when polled); each request in it fails with the
+    OpenAI error rate and lands in the error file instead of the output file.
+    """
+
+    def __init__(self, faults, batch_seconds=1.0):
+        self.faults = faults
+        self.batch_seconds = batch_seconds
+        self.files = {}
+        self.batches = {}
+        self._lock = threading.Lock()
+        self._ids = 0
+
+    def _next_id(self, prefix):
+        self._ids += 1
+        return f"{prefix}-stub-{self._ids}"
+
+    def create_file(self, name, content, purpose):
+        with self._lock:
+            file_id = self._next_id("file")
+            self.files[file_id] = content
+        return {"id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+                "filename": name, "purpose": purpose, "status": "processed"}
+
+    def create_batch(self, payload):
+        now = int(time.time())
+        with self._lock:
+            batch_id = self._next_id("batch")
+            lines = [l for l in self.files.get(payload.get("input_file_id"), b"").decode("utf-8").splitlines() if l.strip()]
+            self.batches[batch_id] = {
+                "id": batch_id, "object": "batch", "endpoint": payload.get("endpoint"), "errors": None,
+                "input_file_id": payload.get("input_file_id"), "completion_window": payload.get("completion_window"),
+                "status": "in_progress", "output_file_id": None, "error_file_id": None, "created_at": now,
+                "in_progress_at": now, "metadata": payload.get("metadata"),
+                "request_counts": {"total": len(lines), "completed": 0, "failed": 0},
+                "_ready_at": time.monotonic() + self.batch_seconds,
+            }
+            return self._public(batch_id)
+
+    def _public(self, batch_id):
+        return {k: v for k, v in self.batches[batch_id].items() if not k.startswith("_")}
+
+    def _finish(self, batch):
+        output, errors = [], []
+        for line in self.files[batch["input_file_id"]].decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            with self.faults._lock:
+                self.faults.calls["openai"] += 1
+                fail = self.faults._rng.random() < self.faults.error_rate["openai"]
+                if fail:
+                    self.faults.errors["openai"] += 1
+            if fail:
+                errors.append({"id": self._next_id("batch_req"), "custom_id": request["custom_id"], "response": None,
+                               "error": {"code": "server_error", "message": "injected failure"}})
+            else:
+                output.append({"id": self._next_id("batch_req"), "custom_id": request["custom_id"], "error": None,
+                               "response": {"status_code": 200, "request_id": self._next_id("req"),
+                                            "body": completion_body(request.get("body", {}))}})
+        for name, rows in (("output_file_id", output), ("error_file_id", errors)):
+            if rows:
+                file_id = self._next_id("file")
+                self.files[file_id] = "".join(json.dumps(r) + "\n" for r in rows).encode("utf-8")
+                batch[name] = file_id
+        batch["status"] = "completed"
+        batch["completed_at"] = int(time.time())
+        batch["request_counts"].update(completed=len(output), failed=len(errors))
+
+    def retrieve(self, batch_id):
+        with self._lock:
+            batch = self.batches.get(batch_id)
+            if batch is None:
+                return None
+            if batch["status"] == "in_progress" and time.monotonic() >= batch["_ready_at"]:
+                self._finish(batch)
+            return self._public(batch_id)
+
+    def cancel(self, batch_id):
+        with self._lock:
+            batch = self.batches.get(batch_id)
+            if batch is None:
+                return None
+            if batch["status"] == "in_progress":
+                batch["status"] = "cancelled"
+                batch["cancelled_at"] = int(time.time())
+            return self._public(batch_id)
+
+
+# ----------------------------
+# HTTP server
+# ----------------------------
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FinGPTStub/1.0"
+
+    def log_message(self, *args):
+        pass
+
+    # --- plumbing ---
+    def _send(self, status, body, content_type="application/json", headers=None):
+        if not isinstance(body, bytes):
+            body = (body if isinstance(body, str) else json.dumps(body)).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _conditional(self, body, content_type):
+        """Serve `body` with an ETag, answering If-None-Match with 304."""
+        etag = '"' + hashlib.sha1(body.encode("utf-8")).hexdigest()[:16] + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self._send(200, body, content_type, {"ETag": etag})
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+    def _route(self):
+        parts = urlsplit(self.path)
+        prefix = parts.path.strip("/").split("/", 1)[0]
+        service = {"av": "alpha_vantage", "rss": "news", "finviz": "finviz", "openai": "openai", "resend": "resend"}.get(prefix)
+        return service, parts.path, {k: v[0] for k, v in parse_qs(parts.query).items()}
+
+    # --- verbs ---
+    def _batch_api(self, method, path):
+        """Serve the Files/Batches endpoints (no injected latency or errors); False if `path` is neither."""
+        queue = self.server.batch_queue
+        parts = path.strip("/").split("/")[2:]  # after openai/v1
+        if not parts or parts[0] not in ("files", "batches"):
+            return False
+        if parts == ["files"] and method == "POST":
+            length = int(self.headers.get("Content-Length") or 0)
+            message = BytesParser().parsebytes(
+                f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode("utf-8") + self.rfile.read(length))
+            fields = {part.get_param("name", header="content-disposition"): part for part in message.get_payload()}
+            upload, purpose = fields["file"], fields["purpose"].get_payload(decode=True).decode("utf-8")
+            self._send(200, queue.create_file(upload.get_filename() or "batch.jsonl", upload.get_payload(decode=True), purpose))
+        elif parts == ["batches"] and method == "POST":
+            self._send(200, queue.create_batch(self._body()))
+        elif len(parts) == 3 and parts[0] == "files" and parts[2] == "content":
+            content = queue.files.get(parts[1])
+            if content is None:
+                self._send(404, {"error": {"message": "no such file"}})
+            else:
+                self._send(200, content, "application/octet-stream")
+        elif len(parts) >= 2 and parts[0] == "batches":
+            batch = queue.cancel(parts[1]) if parts[2:] == ["cancel"] else queue.retrieve(parts[1])
+            if batch is None:
+                self._send(404, {"error": {"message": "no such batch"}})
+            else:
+                self._send(200, batch)
+        else:
+            self._send(404, {"error": {"message": "unknown route"}})
+        return True
+
+    def do_GET(self):
+        service, path, query = self._route()
+        if service is None:
+            return self._send(404, {"error": "unknown route"})
+        if service == "openai" and self._batch_api("GET", path):
+            return
+        if self.server.faults.hit(service):
+            return self._send(503, {"error": "injected failure"})
+
+        if service == "alpha_vantage":
+            function, symbol = query.get("function"), query.get("symbol", "").upper()
+            if function == "OVERVIEW":
+                return self._send(200, overview(symbol))
+            if function == "INCOME_STATEMENT":
+                return self._send(200, income_statement(symbol))
+            if function == "TIME_SERIES_DAILY":
+                bars = self.server.full_bars if query.get("outputsize") == "full" else 100
+                return self._send(200, self.server.series(symbol, bars))
+            return self._send(200, {"Error Message": f"Unsupported function {function}"})
+        if service == "news":
+            return self._conditional(rss_feed(query.get("q", "")), "application/rss+xml")
+        if service == "finviz":
+            return self._send(200, self.server.finviz_page, "text/html")
+        return self._send(404, {"error": "unknown route"})
+
+    def do_POST(self):
+        service, path, _ = self._route()
+        if service is None:
+            return self._send(404, {"error": "unknown route"})
+        if service == "openai" and self._batch_api("POST", path):
+            return
+        payload = self._body()
+        if self.server.faults.hit(service):
+            return self._send(503, {"error": {"message": "injected failure", "type": "server_error"}})
+
+        if service == "resend":
+            if path.endswith("/emails/batch"):
+                return self._send(200, {"data": [{"id": f"stub-{i}"} for i in range(len(payload))]})
+            return self._send(200, {"id": "stub-email"})
+        if service == "openai" and path.endswith("/chat/completions"):
+            body = completion_body(payload, self.server.faults)
+            if payload.get("stream"):
+                return self._stream(body["choices"][0]["message"]["content"], body["model"])
+            return self._send(200, body)
+        return self._send(404, {"error": "unknown route"})
+
+    def _stream(self, text, model):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        words = text.split(" ")
+        for i in range(0, len(words), 8):
+            chunk = " ".join(words[i:i + 8]) + (" " if i + 8 < len(words) else "")
+            event = {
+                "id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "delta": {"content": chunk}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+
+class StubServer(ThreadingHTTPServer):
+    """Threaded local server for all HTTP services; use `env()` to point the app at it."""
+
+    daemon_threads = True
+
+    def __init__(self, faults=None, full_bars=1000, port=0, batch_seconds=1.0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.faults = faults or Faults()
+        self.full_bars = full_bars
+        self.batch_queue = BatchQueue(self.faults, batch_seconds)
+        with open(FINVIZ_FIXTURE, encoding="utf-8") as f:
+            self.finviz_page = f.read()
+        self._series = {}
+        self._series_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def series(self, symbol, bars):
+        with self._series_lock:
+            key = (symbol, bars)
+            if key not in self._series:
+                self._series[key] = json.dumps(daily_series(symbol, bars))
+            return self._series[key]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="stub-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def env(self):
+        """Environment variables that route every client in the app to this server."""
+        return {
+            "ALPHA_VANTAGE_URL": f"{self.url}/av/query",
+            "ALPHA_VANTAGE_KEY": "bench",
+            "FINGPT_GOOGLE_NEWS_URL": f"{self.url}/rss/search",
+            "FINGPT_FINVIZ_URL": f"{self.url}/finviz/quote.ashx",
+            "OPENAI_BASE_URL": f"{self.url}/openai/v1",
+            "OPENAI_API_KEY": "bench",
+            "RESEND_API_URL": f"{self.url}/resend",
+            "RESEND_API_KEY": "re_bench",
+        }
+
+    def patch_alpha_vantage_library(self):
+        """alpha_vantage.TimeSeries has a hard-coded base URL; point it here."""
+        from alpha_vantage.alphavantage import AlphaVantage
+        AlphaVantage._ALPHA_VANTAGE_API_URL = f"{self.url}/av/query?"
+
+
+# ----------------------------
+# yfinance stand-in
+# ----------------------------
+def make_download_closes(faults):
+    """
+    Replacement for quotes._download_closes: same shape (dates x tickers of
+    closes), synthetic prices, one counted call per batch.
+    """
+    def download_closes(tickers):
+        if faults.hit("yfinance"):
+            raise ConnectionError("injected yfinance failure")
+        index = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=5)
+        data = {}
+        for ticker in tickers:
+            rng = np.random.default_rng(_seed_for("quote", ticker))
+            data[ticker] = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(index))))
+        return pd.DataFrame(data, index=index, columns=list(tickers))
+    return download_closes
@@ -0,0 +1,306 @@
+# cache.py
+import functools
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from instrumentation import register_collector
+
+CACHE_PATH = os.getenv("FINGPT_CACHE_PATH", os.path.join(".cache", "fingpt_cache.sqlite3"))
+MEMORY_LIMIT_BYTES = int(float(os.getenv("FINGPT_CACHE_MEMORY_MB", "64")) * 1024 * 1024)
+
+# Seconds each kind of data stays fresh; override with FINGPT_TTL_<NAMESPACE>.
+DEFAULT_TTLS = {
+    "fundamentals": 6 * 3600,
+    "daily_bars": 3600,
+    "news": 15 * 60,
+    "llm": 6 * 3600,
+}
+NAMESPACE_TTLS = {
+    name: int(os.getenv(f"FINGPT_TTL_{name.upper()}", ttl))
+    for name, ttl in DEFAULT_TTLS.items()
+}
+
+_MISS = object()
+
+
+class TwoTierCache:
+    """
+    Byte-bounded in-memory LRU in front of a SQLite file.
+
+    The memory tier is per process; the SQLite tier is shared by every process
+    pointing at the same file (Streamlit, alert jobs, workers). Values are
+    stored pickled, so callers always get their own copy back.
+    """
+
+    def __init__(self, path=CACHE_PATH, memory_limit=MEMORY_LIMIT_BYTES, ttls=None):
+        self.path = path
+        self.memory_limit = memory_limit
+        self.ttls = dict(NAMESPACE_TTLS if ttls is None else ttls)
+        self._memory = OrderedDict()  # (namespace, key) -> (expires_at, blob)
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = {}
+        self._sets_since_purge = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL,"
+                " expires_at REAL NOT NULL, value BLOB NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+
+    # --- sqlite ---
+    def _connect(self):
+        """One connection per thread; WAL lets readers and a writer from other processes coexist."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, namespace, field, n=1):
+        counters = self._stats.setdefault(namespace, {
+            "memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "evictions": 0,
+        })
+        counters[field] += n
+
+    # --- memory tier (caller holds the lock) ---
+    def _memory_put(self, mkey, expires_at, blob):
+        if len(blob) > self.memory_limit // 4:
+            return  # a single huge value would flush everything else
+        old = self._memory.pop(mkey, None)
+        if old is not None:
+            self._memory_bytes -= len(old[1])
+        self._memory[mkey] = (expires_at, blob)
+        self._memory_bytes += len(blob)
+        while self._memory_bytes > self.memory_limit and self._memory:
+            (namespace, _), (_, evicted) = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self._count(namespace, "evictions")
+
+    def _memory_drop(self, mkey):
+        old = self._memory.pop(mkey, None)
+        if old is not None:
+            self._memory_bytes -= len(old[1])
+
+    # --- public API ---
+    def get(self, namespace, key, default=None):
+        mkey = (namespace, key)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(mkey)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(mkey)
+                    self._count(namespace, "memory_hits")
+                    return pickle.loads(entry[1])
+                self._memory_drop(mkey)
+
+        try:
+            row = self._connect().execute(
+                "SELECT expires_at, value FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"⚠️ Cache read error ({namespace}): {e}")
+            row = None
+
+        with self._lock:
+            if row is None or row[0] <= now:
+                self._count(namespace, "misses")
+                return default
+            self._count(namespace, "disk_hits")
+            self._memory_put(mkey, row[0], bytes(row[1]))
+        return pickle.loads(row[1])
+
+    def set(self, namespace, key, value, ttl=None):
+        ttl = self.ttls.get(namespace, 3600) if ttl is None else ttl
+        expires_at = time.time() + ttl
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+        with self._lock:
+            self._memory_put((namespace, key), expires_at, blob)
+            self._count(namespace, "sets")
+            self._sets_since_purge += 1
+            purge = self._sets_since_purge >= 200
+            if purge:
+                self._sets_since_purge = 0
+
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (namespace, key, expires_at, value) VALUES (?, ?, ?, ?)",
+                    (namespace, key, expires_at, sqlite3.Binary(blob)),
+                )
+                if purge:
+                    conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+        except sqlite3.Error as e:
+            print(f"⚠️ Cache write error ({namespace}): {e}")
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self._memory_drop((namespace, key))
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def clear(self, namespace=None):
+        with self._lock:
+            for mkey in [k for k in self._memory if namespace is None or k[0] == namespace]:
+                self._memory_drop(mkey)
+        conn = self._connect()
+        with conn:
+            if namespace is None:
+                conn.execute("DELETE FROM entries")
+            else:
+                conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+
+    def stats(self):
+        """Hit/miss/eviction counters per namespace plus memory usage."""
+        with self._lock:
+            return {
+                "namespaces": {ns: dict(c) for ns, c in self._stats.items()},
+                "memory_bytes": self._memory_bytes,
+                "memory_limit": self.memory_limit,
+                "memory_entries": len(self._memory),
+            }
+
+
+# ----------------------------
+# Shared instance + decorator
+# ----------------------------
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide cache shared by the UI and background jobs."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TwoTierCache()
+        return _cache
+
+
+def make_key(*parts):
+    """Stable hash key for arbitrary picklable/reprable parts."""
+    return hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()
+
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def join_flight(key):
+    """
+    The in-flight Future for `key` and whether this caller leads it. For work
+    that can't be wrapped in one call (a stream): followers wait on the
+    Future, and the leader must resolve it with `land_flight`.
+    """
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+    return future, leader
+
+
+def land_flight(key, future, result=None, error=None):
+    """Resolve a flight led via `join_flight` and let the next caller lead."""
+    with _inflight_lock:
+        _inflight.pop(key, None)
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+def single_flight(key, fn):
+    """
+    Run `fn()` once per `key` at a time; concurrent callers with the same key
+    wait for and share the first caller's result (or exception).
+    """
+    future, leader = join_flight(key)
+    if not leader:
+        return future.result()
+
+    try:
+        result = fn()
+    except BaseException as e:
+        land_flight(key, future, error=e)
+        raise
+    land_flight(key, future, result=result)
+    return result
+
+
+def _worth_caching(value):
+    """Don't pin failures (None / empty results) for a whole TTL."""
+    if value is None:
+        return False
+    if hasattr(value, "empty"):
+        return not value.empty
+    if isinstance(value, (dict, list, tuple, str)):
+        return len(value) > 0
+    return True
+
+
+def cached(namespace, ttl=None):
+    """Cache a function's results in `namespace`, keyed by its arguments."""
+    def decorator(fn):
+        name = f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = make_key(name, args, sorted(kwargs.items()))
+            value = get_cache().get(namespace, key, _MISS)
+            if value is not _MISS:
+                return value
+            value = fn(*args, **kwargs)
+            if _worth_caching(value):
+                get_cache().set(namespace, key, value, ttl)
+            return value
+
+        def peek(*args, **kwargs):
+            """The cached result for these arguments, or None, without calling `fn`."""
+            value = get_cache().get(namespace, make_key(name, args, sorted(kwargs.items())), _MISS)
+            return None if value is _MISS else value
+
+        wrapper.uncached = fn
+        wrapper.peek = peek
+        return wrapper
+    return decorator
+
+
+def stats():
+    return get_cache().stats()
+
+
+def _cache_metrics():
+    if _cache is None:
+        return []
+    snapshot = _cache.stats()
+    samples = [
+        ("fingpt_cache_memory_bytes", {}, snapshot["memory_bytes"], "gauge"),
+        ("fingpt_cache_memory_entries", {}, snapshot["memory_entries"], "gauge"),
+    ]
+    for namespace, counters in snapshot["namespaces"].items():
+        for event, n in counters.items():
+            samples.append(("fingpt_cache_events_total", {"namespace": namespace, "event": event}, n, "counter"))
+    return samples
+
+
+register_collector(_cache_metrics)
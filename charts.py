@@ -0,0 +1,239 @@
+# charts.py
+"""
+Plotly figures for the Analyze page.
+
+Long histories are reduced server-side before they reach the browser: candles
+and volume are aggregated into OHLCV buckets and indicator lines are thinned
+with Largest-Triangle-Three-Buckets (LTTB), both to about one point per
+CHART_PX_PER_POINT pixels of chart width. Lines use WebGL (Scattergl);
+Plotly has no WebGL candlestick or bar, so those rely on the aggregation.
+"""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from instrumentation import observe
+
+# Streamlit doesn't expose the viewport, so the target width is configured
+CHART_WIDTH_PX = int(os.getenv("FINGPT_CHART_WIDTH_PX", "1400"))
+CHART_PX_PER_POINT = float(os.getenv("FINGPT_CHART_PX_PER_POINT", "2"))
+LINE_COLORS = {"MA50": "blue", "MA200": "orange", "RSI": "purple", "MACD": "blue", "Signal": "orange"}
+
+
+def max_points(width_px=None):
+    """Points worth sending for a chart `width_px` wide."""
+    return max(16, int((width_px or CHART_WIDTH_PX) / CHART_PX_PER_POINT))
+
+
+# ----------------------------
+# Downsampling
+# ----------------------------
+def bucket_starts(n, buckets):
+    """Start offsets of `buckets` near-equal consecutive slices of `n` rows."""
+    if n <= buckets:
+        return np.arange(n)
+    return np.unique(np.linspace(0, n, buckets + 1)[:-1].astype(np.int64))
+
+
+def aggregate_ohlcv(df, starts):
+    """One bar per bucket: first open, max high, min low, last close, summed volume."""
+    ends = np.r_[starts[1:], len(df)] - 1
+    return pd.DataFrame({
+        "Open": df["Open"].to_numpy()[starts],
+        "High": np.maximum.reduceat(df["High"].to_numpy(dtype=float), starts),
+        "Low": np.minimum.reduceat(df["Low"].to_numpy(dtype=float), starts),
+        "Close": df["Close"].to_numpy()[ends],
+        "Volume": np.add.reduceat(df["Volume"].to_numpy(dtype=float), starts),
+    }, index=df.index[starts])
+
+
+def lttb(x, y, threshold):
+    """
+    Indices of the `threshold` points of (x, y) that best preserve the line's
+    shape (Steinarsson's Largest-Triangle-Three-Buckets). First and last
+    points are always kept.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # Bucket i covers [edges[i], edges[i + 1]); the last point is a bucket of its own
+    edges = np.floor(np.arange(threshold - 1) * (n - 2) / (threshold - 2)).astype(np.int64) + 1
+    edges[-1] = n - 1
+    # Every bucket's mean up front; only the triangle pick depends on the previous choice
+    sizes = np.diff(np.r_[edges, n])
+    mean_x = np.add.reduceat(x, edges) / sizes
+    mean_y = np.add.reduceat(y, edges) / sizes
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        xs, ys = x[start:end], y[start:end]
+        area = np.abs((x[a] - mean_x[i + 1]) * (ys - y[a]) - (x[a] - xs) * (mean_y[i + 1] - y[a]))
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+def downsample_line(series, threshold):
+    """`series` without NaNs, reduced to at most `threshold` points with LTTB."""
+    series = series.dropna()
+    if len(series) <= threshold:
+        return series
+    x = series.index.asi8 if isinstance(series.index, pd.DatetimeIndex) else np.arange(len(series))
+    return series.iloc[lttb(x, series.to_numpy(), threshold)]
+
+
+# ----------------------------
+# Figures
+# ----------------------------
+def payload_bytes(fig):
+    """Size of the JSON Plotly ships to the browser for `fig`."""
+    return len(fig.to_json().encode("utf-8"))
+
+
+def price_chart(hist, indicators, title, show_ma=True, show_rsi=True, show_macd=True, points=None):
+    """
+    Candles, volume and optional MA / RSI / MACD panels for `hist`, with
+    `indicators` aligned to its index. Returns (figure, stats); stats has the
+    bar and point counts and the serialized payload size.
+    """
+    started = time.perf_counter()
+    points = points or max_points()
+    starts = bucket_starts(len(hist), points)
+    candles = aggregate_ohlcv(hist, starts) if len(starts) < len(hist) else hist
+    # Per-bucket value of bar-type indicators, taken at the bucket's last bar like Close
+    ends = np.r_[starts[1:], len(hist)] - 1
+
+    subplot_titles = ["Price (Candlesticks)", "Volume"]
+    row_heights = [0.5, 0.2]
+    if show_rsi:
+        subplot_titles.append("RSI (14)")
+        row_heights.append(0.15)
+    if show_macd:
+        subplot_titles.append("MACD (12, 26, 9)")
+        row_heights.append(0.15)
+    macd_row = len(subplot_titles)
+
+    fig = make_subplots(
+        rows=len(subplot_titles),
+        cols=1,
+        shared_xaxes=True,
+        row_heights=row_heights,
+        vertical_spacing=0.03,
+        subplot_titles=tuple(subplot_titles)
+    )
+
+    fig.add_trace(go.Candlestick(
+        x=candles.index, open=candles["Open"], high=candles["High"],
+        low=candles["Low"], close=candles["Close"],
+        name="Price", increasing_line_color="green", decreasing_line_color="red"
+    ), row=1, col=1)
+
+    line_points = 0
+
+    def add_line(column, row):
+        nonlocal line_points
+        if column not in indicators or not indicators[column].notna().any():
+            return
+        line = downsample_line(indicators[column], points)
+        line_points += len(line)
+        fig.add_trace(go.Scattergl(x=line.index, y=line.to_numpy(), mode="lines",
+                                   line=dict(color=LINE_COLORS[column]), name=column), row=row, col=1)
+
+    if show_ma:
+        add_line("MA50", 1)
+        add_line("MA200", 1)
+
+    # Up/down as 1/0 on a two-color scale: one numeric array instead of a color string per bar
+    rising = (candles["Close"].to_numpy() >= candles["Open"].to_numpy()).astype(np.int8)
+    fig.add_trace(go.Bar(
+        x=candles.index, y=candles["Volume"], name="Volume",
+        marker=dict(color=rising, colorscale=[[0, "red"], [1, "green"]], cmin=0, cmax=1),
+    ), row=2, col=1)
+
+    if show_rsi:
+        add_line("RSI", 3)
+    if show_macd:
+        add_line("MACD", macd_row)
+        add_line("Signal", macd_row)
+        if "MACD_Hist" in indicators:
+            fig.add_trace(go.Bar(x=candles.index, y=indicators["MACD_Hist"].to_numpy()[ends],
+                                 name="MACD Hist", opacity=0.4), row=macd_row, col=1)
+
+    fig.update_layout(height=900, template="plotly_white", title=title)
+    stats = {
+        "bars": len(hist),
+        "candles": len(candles),
+        "line_points": line_points,
+        "payload_bytes": payload_bytes(fig),
+    }
+    observe("plotly.figure", time.perf_counter() - started, bytes=stats["payload_bytes"])
+    return fig, stats
+
+
+def sentiment_history_chart(ticker, close, sentiment, correlation=None):
+    """
+    Close price with recorded sentiment scores on a second axis, and the
+    rolling sentiment / forward-return correlation underneath when given.
+    """
+    rows = 2 if correlation is not None else 1
+    fig = make_subplots(
+        rows=rows, cols=1, shared_xaxes=True, vertical_spacing=0.08,
+        row_heights=[0.7, 0.3][:rows], specs=[[{"secondary_y": True}]] + [[{}]] * (rows - 1),
+    )
+    line = downsample_line(close, max_points())
+    fig.add_trace(go.Scattergl(x=line.index, y=line.to_numpy(), mode="lines", name="Close",
+                               line=dict(color="gray")), row=1, col=1, secondary_y=False)
+    scores = sentiment.to_numpy()
+    fig.add_trace(go.Scattergl(
+        x=sentiment.index, y=scores, mode="markers", name="Sentiment",
+        marker=dict(color=scores, colorscale=[[0, "red"], [0.5, "lightgray"], [1, "green"]], cmin=-1, cmax=1, size=7),
+    ), row=1, col=1, secondary_y=True)
+    fig.update_yaxes(range=[-1.05, 1.05], title_text="sentiment", row=1, col=1, secondary_y=True)
+    if correlation is not None:
+        corr = correlation.dropna()
+        fig.add_trace(go.Scattergl(x=corr.index, y=corr.to_numpy(), mode="lines", name="Rolling corr",
+                                   line=dict(color="purple")), row=2, col=1)
+        fig.update_yaxes(range=[-1, 1], title_text="corr", row=2, col=1)
+    fig.update_layout(height=450 if rows == 2 else 320, template="plotly_white",
+                      title=f"{ticker} — recorded sentiment vs price", margin=dict(t=50))
+    return fig
+
+
+def lead_lag_chart(table):
+    """Bar chart of sentiment / return correlation by lag (sentiment_store.lead_lag)."""
+    fig = go.Figure(go.Bar(
+        x=table.index, y=table["correlation"], name="Pooled",
+        marker=dict(color=(table.index.to_numpy() > 0).astype(np.int8), colorscale=[[0, "gray"], [1, "#1E90FF"]]),
+        customdata=table["pairs"], hovertemplate="lag %{x}d: %{y:.3f} (%{customdata} pairs)<extra></extra>",
+    ))
+    fig.update_layout(height=260, template="plotly_white", margin=dict(t=40),
+                      title="Portfolio lead-lag: sentiment on day t vs return on day t + lag",
+                      xaxis_title="lag (trading days; > 0 = sentiment leads)", yaxis_title="correlation")
+    return fig
+
+
+def sentiment_gauge(score):
+    """Bullet gauge for a sentiment score in [-1, 1]."""
+    color = "green" if score > 0 else "red" if score < 0 else "gray"
+    fig = go.Figure(go.Indicator(
+        mode="gauge+number",
+        value=score,
+        number={"valueformat": "+.2f"},
+        gauge={
+            "shape": "bullet",
+            "axis": {"range": [-1, 1]},
+            "bar": {"color": color},
+            "threshold": {"line": {"color": "black", "width": 2}, "value": 0},
+        },
+    ))
+    fig.update_layout(height=90, margin=dict(l=20, r=20, t=10, b=10))
+    return fig
@@ -1,28 +1,36 @@
  # data_fetcher.py
 import os
-import requests
-import feedparser
-from bs4 import BeautifulSoup
+import time
 from dotenv import load_dotenv
-import streamlit as st
+from av_scheduler import DeadlineExceeded, query_async, result_timeout, wait_result
+from cache import cached
+from news_client import fetch_news, get_news
 
 load_dotenv()
 ALPHA_KEY = os.getenv("ALPHA_VANTAGE_KEY")
 
-@st.cache_data(ttl=3600)
+@cached("fundamentals")
 def get_stock_data(ticker: str):
-    """Fetch company fundamentals using Alpha Vantage Overview + Income Statement."""
+    """
+    Fetch company fundamentals using Alpha Vantage Overview + Income Statement.
+
+    Interactive callers wait at most ALPHA_VANTAGE_INTERACTIVE_TIMEOUT seconds
+    for the quota scheduler and get DeadlineExceeded after that (not cached).
+    """
     data = {}
     if not ALPHA_KEY:
         print("Missing ALPHA_VANTAGE_KEY")
         return data
 
+    timeout = result_timeout()
+    deadline = None if timeout is None else time.monotonic() + timeout
     try:
         # --- Company Overview ---
-        overview = requests.get(
-            f"https://www.alphavantage.co/query?function=OVERVIEW&symbol={ticker}&apikey={ALPHA_KEY}",
-            timeout=10
-        ).json()
+        # Both calls go through the shared quota scheduler and can overlap
+        overview_call = query_async("OVERVIEW", ticker)
+        income_call = query_async("INCOME_STATEMENT", ticker)
+
+        overview = wait_result(overview_call, deadline, f"Fundamentals for {ticker}")
         if "Symbol" in overview:
             data = {
                 "Company": overview.get("Name", ticker),
@@ -38,15 +46,14 @@ def get_stock_data(ticker: str):
             }
 
         # --- Income Statement for EBITDA ---
-        income = requests.get(
-            f"https://www.alphavantage.co/query?function=INCOME_STATEMENT&symbol={ticker}&apikey={ALPHA_KEY}",
-            timeout=10
-        ).json()
+        income = wait_result(income_call, deadline, f"Fundamentals for {ticker}")
         if "annualReports" in income and len(income["annualReports"]) > 0:
             latest = income["annualReports"][0]
             data["EBITDA ($)"] = latest.get("ebitda", "")
             data["Revenue ($)"] = latest.get("totalRevenue", "")
             data["Net Income ($)"] = latest.get("netIncome", "")
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"⚠️ Alpha Vantage fundamentals error for {ticker}: {e}")
 
@@ -55,36 +62,9 @@ def get_stock_data(ticker: str):
 
 def get_extended_news(ticker: str):
     """Fetch recent news headlines from Google News RSS and Finviz."""
-    news_items = []
+    return get_news(ticker)
 
-    # Google News
-    try:
-        feed = feedparser.parse(f"https://news.google.com/rss/search?q={ticker}+stock")
-        for entry in feed.entries[:5]:
-            news_items.append({
-                "title": entry.title,
-                "summary": entry.get("summary", ""),
-                "source": "Google News",
-                "link": entry.link
-            })
-    except Exception as e:
-        print(f"Google News RSS error for {ticker}: {e}")
-
-    # Finviz headlines
-    try:
-        finviz_url = f"https://finviz.com/quote.ashx?t={ticker}"
-        html = requests.get(finviz_url, headers={"User-Agent": "Mozilla/5.0"}, timeout=10).text
-        soup = BeautifulSoup(html, "html.parser")
-        table = soup.find(id="news-table")
-        if table:
-            for row in table.find_all("tr")[:5]:
-                news_items.append({
-                    "title": row.a.text,
-                    "summary": "(via Finviz)",
-                    "source": "Finviz",
-                    "link": row.a["href"]
-                })
-    except Exception as e:
-        print(f"Finviz fetch error for {ticker}: {e}")
 
-    return news_items
+def get_portfolio_news(tickers):
+    """Fetch news for many tickers in one parallel pass; returns {ticker: items}."""
+    return fetch_news(tickers)
@@ -0,0 +1,159 @@
+# finviz_parser.py
+# Extracts the news table from a Finviz quote page without building a tree of
+# the whole document: the table is located by plain string search and only
+# that slice is tokenized, stopping as soon as enough rows were read.
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+FINVIZ_BASE = "https://finviz.com/"
+
+_TABLE_ID = re.compile(r"""id\s*=\s*["']?news-table\b""")
+_DATE = re.compile(r"([A-Z][a-z]{2}-\d{2}-\d{2}|Today)")
+_TIME = re.compile(r"(\d{1,2}:\d{2}\s*[AP]M)", re.IGNORECASE)
+
+
+class _Done(Exception):
+    pass
+
+
+class _NewsTableParser(HTMLParser):
+    """Tokenizes the news table; one dict per <tr>, links from the first <a href>."""
+
+    def __init__(self, limit):
+        super().__init__(convert_charrefs=True)
+        self.limit = limit
+        self.rows = []
+        self._depth = 0     # <table> nesting, 0 until the news table opens
+        self._row = None
+        self._cell = 0
+        self._in_link = False
+        self._in_span = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "table":
+            self._depth += 1
+        elif tag == "tr" and self._depth == 1:
+            self._close_row()
+            self._row = {"stamp": [], "title": [], "href": None, "publisher": []}
+            self._cell = 0
+        elif self._row is None:
+            return
+        elif tag == "td":
+            self._cell += 1
+        elif tag == "a" and self._row["href"] is None:
+            href = dict(attrs).get("href")
+            if href:
+                self._row["href"] = href
+                self._in_link = True
+        elif tag == "span":
+            self._in_span = True
+
+    def handle_endtag(self, tag):
+        if tag == "table":
+            self._depth -= 1
+            if self._depth <= 0:
+                self._close_row()
+                raise _Done
+        elif tag == "tr":
+            self._close_row()
+        elif tag == "a":
+            self._in_link = False
+        elif tag == "span":
+            self._in_span = False
+
+    def handle_data(self, data):
+        if self._row is None:
+            return
+        if self._in_link:
+            self._row["title"].append(data)
+        elif self._in_span:
+            self._row["publisher"].append(data)
+        elif self._cell == 1:
+            self._row["stamp"].append(data)
+
+    def _close_row(self):
+        row, self._row = self._row, None
+        self._in_link = self._in_span = False
+        if row is not None and row["href"] and "".join(row["title"]).strip():
+            self.rows.append(row)
+            if self.limit and len(self.rows) >= self.limit:
+                raise _Done
+
+
+def _parse_stamp(stamp, last_date, today):
+    """
+    Finviz prints the date only on the first row of each day ("Oct-17-25 09:30AM"
+    or "Today 09:30AM"), later rows carry just the time. Returns (published, date).
+    """
+    stamp = stamp.replace("\xa0", " ").strip()
+    date_match = _DATE.search(stamp)
+    time_match = _TIME.search(stamp)
+    date = last_date
+    if date_match:
+        if date_match.group(1) == "Today":
+            date = today
+        else:
+            try:
+                date = datetime.strptime(date_match.group(1), "%b-%d-%y").date()
+            except ValueError:
+                pass
+    if date is None or time_match is None:
+        return None, date
+    try:
+        clock = datetime.strptime(time_match.group(1).replace(" ", "").upper(), "%I:%M%p").time()
+    except ValueError:
+        return None, date
+    return datetime.combine(date, clock).isoformat(), date
+
+
+def parse_news_table(html, limit=None, today=None):
+    """
+    News rows from a Finviz quote page: [{"title", "link", "published",
+    "publisher"}], newest first. Rows without a link are skipped, unparseable
+    timestamps give published=None, and a missing table returns [].
+    """
+    match = _TABLE_ID.search(html or "")
+    if match is None:
+        return []
+    start = html.rfind("<table", 0, match.start())
+    if start < 0:
+        return []
+
+    parser = _NewsTableParser(limit)
+    try:
+        parser.feed(html[start:])
+        parser.close()
+    except _Done:
+        pass
+    except Exception as e:
+        # Keep whatever rows were complete before the markup went bad
+        print(f"⚠️ Finviz news table parse stopped early: {e}")
+
+    today = today or datetime.now().date()
+    items = []
+    last_date = None
+    for row in parser.rows:
+        published, last_date = _parse_stamp("".join(row["stamp"]), last_date, today)
+        items.append({
+            "title": " ".join("".join(row["title"]).split()),
+            "link": urljoin(FINVIZ_BASE, row["href"].strip()),
+            "published": published,
+            "publisher": "".join(row["publisher"]).strip().strip("()") or None,
+        })
+    return items
+
+
+def parse_many(pages, limit=None, processes=None):
+    """
+    Parse many saved pages. Parsing is CPU-bound, so with `processes` > 1 the
+    pages are spread over a process pool; results keep the input order.
+    """
+    pages = list(pages)
+    if processes and processes > 1 and len(pages) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            chunksize = max(1, len(pages) // (processes * 4))
+            return list(pool.map(parse_news_table, pages, [limit] * len(pages), chunksize=chunksize))
+    return [parse_news_table(page, limit) for page in pages]
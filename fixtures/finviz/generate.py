@@ -0,0 +1,96 @@
+# fixtures/finviz/generate.py
+# Regenerates the synthetic Finviz quote pages used by bench_finviz.py. The
+# markup mirrors the live page layout (date only on the first row of each day,
+# publisher in a trailing <span>) plus the failure modes the parser must
+# survive: link-less/ad rows, unclosed tags, truncation and a missing table.
+import os
+import random
+
+rng = random.Random(14)
+OUT = os.path.dirname(os.path.abspath(__file__))
+WORDS = "Apple shares rally record earnings beat guidance analysts upgrade iPhone demand China supply chain margin outlook dividend buyback stock market Fed rates inflation AI chip".split()
+PUBS = ["Reuters", "Bloomberg", "MarketWatch", "Zacks", "Motley Fool", "Yahoo Finance", "Barrons.com", "Investor's Business Daily"]
+
+
+def head(ticker):
+    return f"""<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>{ticker} Stock Quote</title>
+<script>window.FINVIZ={{"ticker":"{ticker}","ads":[1,2,3]}};</script>
+<link rel="stylesheet" href="/assets/dist/main.css"></head>
+<body class="has-sticky-header"><div id="root"><nav class="navbar"><a href="/">Home</a><a href="/news.ashx">News</a></nav>
+"""
+
+
+def filler(n):
+    parts = []
+    for i in range(n):
+        cells = "".join(f'<td class="snapshot-td2" align="left"><b>{rng.choice(WORDS)}</b></td><td class="snapshot-td2"><b>{rng.random()*100:.2f}%</b></td>' for _ in range(6))
+        parts.append(f'<tr class="table-dark-row">{cells}</tr>')
+    return '<table class="snapshot-table2" width="100%">' + "".join(parts) + "</table>\n"
+
+
+def title():
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 14))).capitalize()
+
+
+def row(ts, t, link, pub):
+    return (f'<tr class="cursor-pointer has-label" onclick="trackAndOpenNews(event, \'{pub}\', \'{link}\');">'
+            f'<td width="130" align="right">{ts}</td>'
+            f'<td align="left"><div class="news-link-container"><div class="news-link-left">'
+            f'<a class="tab-link-news" href="{link}" target="_blank" rel="nofollow">{t}</a></div>'
+            f'<div class="news-link-right flex gap-1 items-center"><span>({pub})</span></div></div></td></tr>\n')
+
+
+def news_table(rows):
+    return ('<table width="100%" cellpadding="1" cellspacing="0" border="0" id="news-table" class="fullview-news-outer news-table">\n'
+            + "".join(rows) + "</table>\n")
+
+
+def tail():
+    return '<div class="footer">' + filler(20) + "<script>var x=1;</script></div></div></body></html>\n"
+
+
+def dated_rows(n, start_day=17, today=False):
+    rows = []
+    day = start_day
+    for i in range(n):
+        time_s = f"{rng.randint(1,12):02d}:{rng.randint(0,59):02d}{rng.choice(['AM','PM'])}"
+        if i % 4 == 0:
+            date = "Today" if (today and i == 0) else f"Oct-{day:02d}-25"
+            ts = f"{date} {time_s}"
+            day -= 1
+        else:
+            ts = f"&nbsp;{time_s}" if i % 3 else time_s
+        rows.append(row(ts, title(), f"https://news.example.com/{rng.getrandbits(40):x}?utm_source=finviz", rng.choice(PUBS)))
+    return rows
+
+
+pages = {
+    "aapl_full.html": head("AAPL") + filler(300) + news_table(dated_rows(100, today=True)) + tail(),
+    "msft_full.html": head("MSFT") + filler(300) + news_table(dated_rows(100)) + tail(),
+    "small_cap_few_rows.html": head("TINY") + filler(80) + news_table(dated_rows(3)) + tail(),
+}
+
+# Rows without links, empty rows, ad rows and nested markup in titles
+bad = dated_rows(8)
+bad.insert(1, '<tr><td width="130" align="right">Oct-18-25 07:00AM</td><td align="left"><div class="news-link-left">Sponsored content (no link)</div></td></tr>\n')
+bad.insert(3, "<tr></tr>\n")
+bad.insert(5, '<tr class="news-ad"><td colspan="2"><div id="ad-slot"></div></td></tr>\n')
+bad.insert(6, row("Oct-10-25 11:11AM", "Apple &amp; Google <b>AI</b> deal &#8211; what it means", "https://news.example.com/nested", "Reuters"))
+bad.insert(7, '<tr><td>garbage timestamp</td><td><a class="tab-link-news" href="/news/relative">Relative link headline</a></td></tr>\n')
+pages["malformed_rows.html"] = head("BAD") + filler(50) + news_table(bad) + tail()
+# Page cut off in the middle of the news table
+full = head("CUT") + filler(50) + news_table(dated_rows(20))
+table_at = full.index("news-table")
+pages["truncated.html"] = full[: full.index("</tr>", table_at + (len(full) - table_at) // 2)]
+pages["no_news_table.html"] = head("NONE") + filler(120) + "<p>No news found.</p>" + tail()
+pages["unclosed_tags.html"] = head("LAX") + filler(30) + news_table(
+    [r.replace("</td></tr>", "</td>").replace("</div></div>", "</div>") for r in dated_rows(10)]
+) + tail()
+
+
+if __name__ == "__main__":
+    for name, html in pages.items():
+        with open(os.path.join(OUT, name), "w") as f:
+            f.write(html)
+        print(f"{name}: {len(html):,} bytes")
@@ -0,0 +1,263 @@
+# history_store.py
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from av_scheduler import DeadlineExceeded, get_scheduler, result_timeout, wait_result
+
+HISTORY_DIR = os.getenv("FINGPT_HISTORY_DIR", os.path.join(".cache", "history"))
+# How often a ticker may spend an Alpha Vantage call looking for new bars.
+REFRESH_SECONDS = float(os.getenv("FINGPT_HISTORY_REFRESH_HOURS", "6")) * 3600
+
+# A bar fetched before this long after the 16:00 New York close may still be the
+# partial intraday bar Alpha Vantage serves during the session
+MARKET_TZ = "America/New_York"
+SETTLE_AFTER_CLOSE = pd.Timedelta(hours=16, minutes=30)
+
+COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+PERIODS = {
+    "1mo": pd.DateOffset(months=1),
+    "3mo": pd.DateOffset(months=3),
+    "6mo": pd.DateOffset(months=6),
+    "1y": pd.DateOffset(years=1),
+    "2y": pd.DateOffset(years=2),
+    "5y": pd.DateOffset(years=5),
+}
+
+_locks = {}
+_locks_guard = threading.Lock()
+_time_series = None
+_time_series_lock = threading.Lock()
+
+
+# ----------------------------
+# On-disk layout
+# ----------------------------
+# One float64 array per ticker, shape (6, N): row 0 holds the bar date as days
+# since the epoch, rows 1-5 hold Open/High/Low/Close/Volume. Each row is a
+# contiguous column, the whole thing is one file (so replacing it is atomic)
+# and reads are memory-mapped, so slicing a period only touches those bars.
+def _paths(ticker):
+    return (
+        os.path.join(HISTORY_DIR, f"{ticker}.npy"),
+        os.path.join(HISTORY_DIR, f"{ticker}.json"),
+    )
+
+
+def _lock_for(ticker):
+    with _locks_guard:
+        return _locks.setdefault(ticker, threading.Lock())
+
+
+def _read_array(ticker):
+    path, _ = _paths(ticker)
+    if not os.path.exists(path):
+        return None
+    return np.load(path, mmap_mode="r")
+
+
+def _read_meta(ticker):
+    _, meta_path = _paths(ticker)
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write(ticker, array, meta):
+    os.makedirs(HISTORY_DIR, exist_ok=True)
+    path, meta_path = _paths(ticker)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp, path)
+    _write_meta(ticker, meta)
+
+
+def _write_meta(ticker, meta):
+    os.makedirs(HISTORY_DIR, exist_ok=True)
+    _, meta_path = _paths(ticker)
+    tmp = f"{meta_path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp, meta_path)
+
+
+def _to_array(df):
+    days = df.index.values.astype("datetime64[D]").astype("int64").astype("float64")
+    return np.vstack([days] + [df[c].to_numpy(dtype="float64") for c in COLUMNS])
+
+
+def _to_frame(array):
+    index = pd.DatetimeIndex(np.asarray(array[0]).astype("int64").astype("datetime64[D]"), name="date")
+    return pd.DataFrame({c: np.asarray(array[i + 1]) for i, c in enumerate(COLUMNS)}, index=index)
+
+
+# ----------------------------
+# Alpha Vantage fetch
+# ----------------------------
+def _get_time_series():
+    """One alpha_vantage TimeSeries client per process, created on first fetch."""
+    global _time_series
+    with _time_series_lock:
+        if _time_series is None:
+            from alpha_vantage.timeseries import TimeSeries
+            _time_series = TimeSeries(key=os.getenv("ALPHA_VANTAGE_KEY"), output_format="pandas")
+        return _time_series
+
+
+def _fetch_daily(ticker, outputsize):
+    """Fetch daily bars via the shared Alpha Vantage scheduler, oldest first (interactive callers time out)."""
+    ts = _get_time_series()
+    timeout = result_timeout()
+    future = get_scheduler().submit(
+        ("TIME_SERIES_DAILY", ticker, outputsize),
+        lambda: ts.get_daily(symbol=ticker, outputsize=outputsize),
+    )
+    data, _ = wait_result(future, None if timeout is None else time.monotonic() + timeout, f"Daily bars for {ticker}")
+    data = data.rename(columns={
+        "1. open": "Open",
+        "2. high": "High",
+        "3. low": "Low",
+        "4. close": "Close",
+        "5. volume": "Volume"
+    })
+    data.index = pd.to_datetime(data.index)
+    return data.sort_index()[COLUMNS]
+
+
+def _seed(ticker):
+    """First load: try the full series, fall back to compact (~100 bars) on free keys."""
+    try:
+        return _fetch_daily(ticker, "full"), "full"
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        print(f"⚠️ Full history unavailable for {ticker} ({e}); seeding with compact.")
+        return _fetch_daily(ticker, "compact"), "compact"
+
+
+def _settled_at(day):
+    """Epoch seconds after which the bar for `day` is final."""
+    return (pd.Timestamp(day.date()).tz_localize(MARKET_TZ) + SETTLE_AFTER_CLOSE).timestamp()
+
+
+# ----------------------------
+# Public API
+# ----------------------------
+def refresh(ticker, force=False):
+    """
+    Bring the local store for `ticker` up to date.
+
+    Seeds once, then appends bars newer than the last stored date and
+    rewrites the last stored bar (it may have been a partial intraday bar).
+    A ticker is checked at most once per FINGPT_HISTORY_REFRESH_HOURS unless
+    `force` is set or its last bar was stored before that session settled.
+    Returns the number of bars added.
+    """
+    ticker = ticker.strip().upper()
+    with _lock_for(ticker):
+        array = _read_array(ticker)
+        meta = _read_meta(ticker)
+        now = time.time()
+
+        if array is None or array.shape[1] == 0:
+            df, seeded = _seed(ticker)
+            _write(ticker, _to_array(df), {"seeded": seeded, "checked_at": now})
+            print(f"✅ Seeded {len(df)} bars for {ticker} ({seeded})")
+            return len(df)
+
+        last_date = pd.Timestamp(int(array[0, -1]), unit="D")
+        # The newest bar may have been stored mid-session; it is re-fetched once the day settles
+        last_final = meta.get("checked_at", 0) >= _settled_at(last_date)
+        if not force:
+            if last_final and last_date >= pd.Timestamp.today().normalize():
+                return 0
+            settling = not last_final and now >= _settled_at(last_date)
+            if not settling and now - meta.get("checked_at", 0) < REFRESH_SECONDS:
+                return 0
+
+        delta = _fetch_daily(ticker, "compact")
+        if not delta.empty and delta.index[0] > last_date + pd.Timedelta(days=1) and meta.get("seeded") == "full":
+            # Compact no longer reaches back to our last bar; refill the gap
+            try:
+                delta = _fetch_daily(ticker, "full")
+            except Exception as e:
+                print(f"⚠️ Gap in {ticker} history after {last_date.date()} could not be filled: {e}")
+
+        meta["checked_at"] = now
+        if last_date in delta.index:
+            # Overwrite the last stored bar too, in case it was partial
+            fresh = delta[delta.index >= last_date]
+            kept = np.asarray(array)[:, :-1]
+        else:
+            fresh = delta[delta.index > last_date]
+            kept = np.asarray(array)
+        new_count = int((fresh.index > last_date).sum())
+        if fresh.empty:
+            _write_meta(ticker, meta)
+            return 0
+
+        _write(ticker, np.hstack([kept, _to_array(fresh)]), meta)
+        if new_count:
+            print(f"✅ Appended {new_count} new bars for {ticker}")
+        return new_count
+
+
+def get_history(ticker, period="6mo", refresh_first=True):
+    """Return daily OHLCV bars for `period` ("1mo" … "5y", or "max") from the local store."""
+    ticker = ticker.strip().upper()
+    if refresh_first:
+        try:
+            refresh(ticker)
+        except Exception as e:
+            # Serve whatever is already stored rather than nothing
+            print(f"❌ History refresh failed for {ticker}: {e}")
+
+    array = _read_array(ticker)
+    if array is None or array.shape[1] == 0:
+        return pd.DataFrame(columns=COLUMNS)
+
+    offset = PERIODS.get(period)
+    if offset is not None:
+        last = pd.Timestamp(int(array[0, -1]), unit="D")
+        start_day = np.datetime64((last - offset).date(), "D").astype("int64")
+        start = int(np.searchsorted(array[0], float(start_day), side="left"))
+        array = array[:, start:]
+    return _to_frame(array)
+
+
+def last_bar_date(ticker):
+    """Date of the newest stored bar, or None if the ticker has never been loaded."""
+    array = _read_array(ticker.strip().upper())
+    if array is None or array.shape[1] == 0:
+        return None
+    return pd.Timestamp(int(array[0, -1]), unit="D")
+
+
+def version(ticker):
+    """Opaque stamp that changes whenever the stored bars for `ticker` are rewritten (None if absent)."""
+    path, _ = _paths(ticker.strip().upper())
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def read_closes(ticker, after_day=None):
+    """
+    (days, closes) NumPy arrays straight from the store, without building a
+    DataFrame; days are days since the epoch. With `after_day`, only newer bars.
+    """
+    array = _read_array(ticker.strip().upper())
+    if array is None or array.shape[1] == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    start = 0
+    if after_day is not None:
+        start = int(np.searchsorted(array[0], float(after_day), side="right"))
+    return np.asarray(array[0, start:]).astype(np.int64), np.array(array[4, start:])
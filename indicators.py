@@ -0,0 +1,399 @@
+# indicators.py
+"""
+Technical indicators as NumPy kernels.
+
+Every kernel takes a 2-D ``(bars, tickers)`` matrix (1-D series work too) and
+returns arrays of the same shape, so a whole watchlist is computed in one
+pass. Columns may start with NaN (tickers with shorter histories); values
+after a column's first bar are assumed present.
+
+`IndicatorState` carries the recursive state (EMAs, Wilder averages, rolling
+sums) so one new bar updates every indicator in O(1).
+"""
+import copy
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import span
+
+RSI_PERIOD = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+BOLLINGER_WINDOW, BOLLINGER_K = 20, 2.0
+ATR_PERIOD = 14
+MA_WINDOWS = (50, 200)
+
+
+def _as_matrix(x):
+    x = np.asarray(x, dtype="float64")
+    return (x[:, None], True) if x.ndim == 1 else (x, False)
+
+
+def _restore(x, squeeze):
+    return x[:, 0] if squeeze else x
+
+
+# ----------------------------
+# Kernels
+# ----------------------------
+def sma(x, window):
+    """Simple moving average; NaN until `window` values are available."""
+    x, squeeze = _as_matrix(x)
+    valid = ~np.isnan(x)
+    csum = np.cumsum(np.where(valid, x, 0.0), axis=0)
+    ccount = np.cumsum(valid, axis=0)
+    csum = np.vstack([np.zeros((1, x.shape[1])), csum])
+    ccount = np.vstack([np.zeros((1, x.shape[1])), ccount])
+
+    out = np.full(x.shape, np.nan)
+    if x.shape[0] >= window:
+        sums = csum[window:] - csum[:-window]
+        counts = ccount[window:] - ccount[:-window]
+        out[window - 1:] = np.where(counts == window, sums / window, np.nan)
+    return _restore(out, squeeze)
+
+
+def rolling_std(x, window):
+    """Rolling population standard deviation (ddof=0)."""
+    x, squeeze = _as_matrix(x)
+    mean = _as_matrix(sma(x, window))[0]
+    mean_sq = _as_matrix(sma(x * x, window))[0]
+    out = np.sqrt(np.maximum(mean_sq - mean * mean, 0.0))
+    return _restore(out, squeeze)
+
+
+_EMA_BLOCK = 64
+
+
+def _fill_gaps(x):
+    """Forward-fill interior NaNs and back-fill each column's leading NaNs with its first value."""
+    valid = ~np.isnan(x)
+    rows = np.arange(x.shape[0])[:, None]
+    last_valid = np.maximum.accumulate(np.where(valid, rows, -1), axis=0)
+    first_valid = valid.argmax(axis=0)
+    source = np.where(last_valid >= 0, last_valid, first_valid[None, :])
+    return np.take_along_axis(x, source, axis=0), first_valid, valid.any(axis=0)
+
+
+def ema(x, span=None, alpha=None, min_periods=0):
+    """
+    Exponential moving average matching ``pandas.ewm(adjust=False)``.
+
+    The recursion is unrolled in blocks of bars, so each block is one small
+    matrix product across all tickers instead of a Python step per bar.
+    Interior gaps are forward-filled.
+    """
+    if alpha is None:
+        alpha = 2.0 / (span + 1.0)
+    x, squeeze = _as_matrix(x)
+    n_bars = x.shape[0]
+    out = np.full(x.shape, np.nan)
+    if n_bars == 0:
+        return _restore(out, squeeze)
+
+    filled, first_valid, has_data = _fill_gaps(x)
+
+    # Within a block: y[j] = decay^(j+1) * y_prev + sum_k alpha * decay^(j-k) * x[k]
+    block = min(_EMA_BLOCK, n_bars)
+    decay = 1.0 - alpha
+    j = np.arange(block)
+    lags = j[:, None] - j[None, :]
+    weights = np.where(lags >= 0, alpha * decay ** np.clip(lags, 0, None), 0.0)
+    carry = decay ** (j + 1)
+
+    prev = filled[0]
+    for start in range(0, n_bars, block):
+        chunk = filled[start:start + block]
+        size = chunk.shape[0]
+        y = weights[:size, :size] @ chunk + carry[:size, None] * prev
+        out[start:start + size] = y
+        prev = y[-1]
+
+    count = np.arange(1, n_bars + 1)[:, None] - first_valid[None, :]
+    out[(count < max(min_periods, 1)) | ~has_data[None, :]] = np.nan
+    return _restore(out, squeeze)
+
+
+def _diff(x):
+    d = np.full(x.shape, np.nan)
+    d[1:] = x[1:] - x[:-1]
+    return d
+
+
+def rsi(close, period=RSI_PERIOD):
+    """Wilder RSI (same definition as the original pandas code in app.py)."""
+    close, squeeze = _as_matrix(close)
+    delta = _diff(close)
+    gain = np.where(np.isnan(delta), np.nan, np.clip(delta, 0, None))
+    loss = np.where(np.isnan(delta), np.nan, -np.clip(delta, None, 0))
+    avg_gain = ema(gain, alpha=1.0 / period, min_periods=period)
+    avg_loss = ema(loss, alpha=1.0 / period, min_periods=period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = 100 - 100 / (1 + avg_gain / avg_loss)
+    return _restore(out, squeeze)
+
+
+def macd(close, fast=MACD_FAST, slow=MACD_SLOW, signal=MACD_SIGNAL):
+    """Returns ``(macd, signal, histogram)``."""
+    line = ema(close, span=fast) - ema(close, span=slow)
+    signal_line = ema(line, span=signal)
+    return line, signal_line, line - signal_line
+
+
+def bollinger(close, window=BOLLINGER_WINDOW, k=BOLLINGER_K):
+    """Returns ``(middle, upper, lower)`` bands."""
+    mid = sma(close, window)
+    width = k * rolling_std(close, window)
+    return mid, mid + width, mid - width
+
+
+def true_range(high, low, close):
+    high, squeeze = _as_matrix(high)
+    low = _as_matrix(low)[0]
+    close = _as_matrix(close)[0]
+    prev_close = np.vstack([np.full((1, close.shape[1]), np.nan), close[:-1]])
+    tr = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    return _restore(tr, squeeze)
+
+
+def atr(high, low, close, period=ATR_PERIOD):
+    """Wilder average true range."""
+    return ema(true_range(high, low, close), alpha=1.0 / period, min_periods=period)
+
+
+def obv(close, volume):
+    """On-balance volume, starting at 0 on each ticker's first bar."""
+    close, squeeze = _as_matrix(close)
+    volume = _as_matrix(volume)[0]
+    direction = np.sign(np.nan_to_num(_diff(close)))
+    out = np.cumsum(direction * np.nan_to_num(volume), axis=0)
+    out[np.isnan(close)] = np.nan
+    return _restore(out, squeeze)
+
+
+def compute_all(open_, high, low, close, volume):
+    """Every indicator for a (bars, tickers) panel, as a dict of matrices."""
+    line, signal_line, hist = macd(close)
+    mid, upper, lower = bollinger(close)
+    result = {f"MA{w}": sma(close, w) for w in MA_WINDOWS}
+    result.update({
+        "RSI": rsi(close),
+        "MACD": line,
+        "Signal": signal_line,
+        "MACD_Hist": hist,
+        "BB_Mid": mid,
+        "BB_Upper": upper,
+        "BB_Lower": lower,
+        "ATR": atr(high, low, close),
+        "OBV": obv(close, volume),
+    })
+    return result
+
+
+# ----------------------------
+# Incremental state
+# ----------------------------
+class IndicatorState:
+    """
+    Recursive state for a set of tickers, so `update()` costs O(1) per bar.
+
+    Build it with `from_history()` (one vectorized pass), then feed new bars.
+    Every ticker needs a complete history (no leading NaNs).
+    """
+
+    def __init__(self, n):
+        nan = np.full(n, np.nan)
+        self.n = n
+        self.bars = 0
+        self.prev_close = nan.copy()
+        self.ema_fast = nan.copy()
+        self.ema_slow = nan.copy()
+        self.signal = nan.copy()
+        self.avg_gain = nan.copy()
+        self.avg_loss = nan.copy()
+        self.atr = nan.copy()
+        self.obv = np.zeros(n)
+        window = max(MA_WINDOWS + (BOLLINGER_WINDOW,))
+        self.window = deque(maxlen=window)  # last closes, newest at the right
+        self.sums = {w: np.zeros(n) for w in MA_WINDOWS + (BOLLINGER_WINDOW,)}
+        self.bb_sq_sum = np.zeros(n)
+
+    @classmethod
+    def from_history(cls, open_, high, low, close, volume):
+        """Seed state from full (bars, tickers) matrices."""
+        close, _ = _as_matrix(close)
+        high = _as_matrix(high)[0]
+        low = _as_matrix(low)[0]
+        volume = _as_matrix(volume)[0]
+        state = cls(close.shape[1])
+        state.bars = close.shape[0]
+
+        delta = _diff(close)
+        gain = np.where(np.isnan(delta), np.nan, np.clip(delta, 0, None))
+        loss = np.where(np.isnan(delta), np.nan, -np.clip(delta, None, 0))
+        state.avg_gain = ema(gain, alpha=1.0 / RSI_PERIOD)[-1]
+        state.avg_loss = ema(loss, alpha=1.0 / RSI_PERIOD)[-1]
+        fast = ema(close, span=MACD_FAST)
+        slow = ema(close, span=MACD_SLOW)
+        state.ema_fast = fast[-1]
+        state.ema_slow = slow[-1]
+        state.signal = ema(fast - slow, span=MACD_SIGNAL)[-1]
+        state.atr = ema(true_range(high, low, close), alpha=1.0 / ATR_PERIOD)[-1]
+        state.obv = obv(close, volume)[-1]
+        state.prev_close = close[-1]
+        for row in close[-state.window.maxlen:]:
+            state.window.append(row)
+        for w in state.sums:
+            state.sums[w] = np.nansum(close[-w:], axis=0)
+        state.bb_sq_sum = np.nansum(close[-BOLLINGER_WINDOW:] ** 2, axis=0)
+        return state
+
+    @staticmethod
+    def _step(prev, x, alpha):
+        return np.where(np.isnan(prev), x, prev + alpha * (x - prev))
+
+    def update(self, open_, high, low, close, volume):
+        """Fold in one bar per ticker and return the latest indicator values."""
+        close = np.asarray(close, dtype="float64").reshape(self.n)
+        high = np.asarray(high, dtype="float64").reshape(self.n)
+        low = np.asarray(low, dtype="float64").reshape(self.n)
+        volume = np.asarray(volume, dtype="float64").reshape(self.n)
+
+        delta = close - self.prev_close
+        if self.bars > 0:
+            self.avg_gain = self._step(self.avg_gain, np.clip(delta, 0, None), 1.0 / RSI_PERIOD)
+            self.avg_loss = self._step(self.avg_loss, -np.clip(delta, None, 0), 1.0 / RSI_PERIOD)
+            tr = np.fmax(high - low, np.fmax(np.abs(high - self.prev_close), np.abs(low - self.prev_close)))
+            self.obv = self.obv + np.sign(delta) * volume
+        else:
+            tr = high - low
+        self.atr = self._step(self.atr, tr, 1.0 / ATR_PERIOD)
+        self.ema_fast = self._step(self.ema_fast, close, 2.0 / (MACD_FAST + 1))
+        self.ema_slow = self._step(self.ema_slow, close, 2.0 / (MACD_SLOW + 1))
+        line = self.ema_fast - self.ema_slow
+        self.signal = self._step(self.signal, line, 2.0 / (MACD_SIGNAL + 1))
+
+        # Rolling sums: add the new close, drop the one leaving each window
+        history = len(self.window)
+        for w in self.sums:
+            leaving = self.window[-w] if history >= w else 0.0
+            self.sums[w] = self.sums[w] + close - leaving
+        leaving_bb = self.window[-BOLLINGER_WINDOW] if history >= BOLLINGER_WINDOW else 0.0
+        self.bb_sq_sum = self.bb_sq_sum + close ** 2 - np.asarray(leaving_bb) ** 2
+        self.window.append(close)
+        self.prev_close = close
+        self.bars += 1
+
+        return self.latest()
+
+    def latest(self):
+        """Current indicator values (NaN where a warm-up period isn't met)."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rsi_now = 100 - 100 / (1 + self.avg_gain / self.avg_loss)
+        line = self.ema_fast - self.ema_slow
+        values = {
+            f"MA{w}": self.sums[w] / w if self.bars >= w else np.full(self.n, np.nan)
+            for w in MA_WINDOWS
+        }
+        mid = self.sums[BOLLINGER_WINDOW] / BOLLINGER_WINDOW
+        std = np.sqrt(np.maximum(self.bb_sq_sum / BOLLINGER_WINDOW - mid ** 2, 0.0))
+        enough_bb = self.bars >= BOLLINGER_WINDOW
+        values.update({
+            "RSI": rsi_now if self.bars > RSI_PERIOD else np.full(self.n, np.nan),
+            "MACD": line,
+            "Signal": self.signal,
+            "MACD_Hist": line - self.signal,
+            "BB_Mid": mid if enough_bb else np.full(self.n, np.nan),
+            "BB_Upper": mid + BOLLINGER_K * std if enough_bb else np.full(self.n, np.nan),
+            "BB_Lower": mid - BOLLINGER_K * std if enough_bb else np.full(self.n, np.nan),
+            "ATR": self.atr if self.bars >= ATR_PERIOD else np.full(self.n, np.nan),
+            "OBV": self.obv,
+        })
+        return values
+
+
+# ----------------------------
+# Per-ticker cache
+# ----------------------------
+_cache = {}  # ticker -> (first_date, last_date, last_bar, frame, state)
+_cache_lock = threading.Lock()
+
+
+OHLCV = ("Open", "High", "Low", "Close", "Volume")
+
+
+def _ohlcv(df):
+    return [df[c].to_numpy(dtype="float64") for c in OHLCV]
+
+
+def _last_bar(df):
+    return tuple(df.iloc[-1][list(OHLCV)])
+
+
+def indicators_for(ticker, hist):
+    """
+    Indicator frame for one ticker's OHLCV history, aligned to `hist.index`.
+
+    Results are cached by ticker and last bar (date and values); when `hist`
+    only adds bars to the cached history, just the new bars are folded in.
+    """
+    with span("indicators") as timing:
+        timing.set(items=len(hist))
+        return _indicators_for(ticker, hist, timing)
+
+
+def _indicators_for(ticker, hist, timing):
+    if hist.empty:
+        return pd.DataFrame(index=hist.index)
+
+    with _cache_lock:
+        cached = _cache.get(ticker)
+
+    if cached is not None:
+        first_date, last_date, last_bar, frame, state = cached
+        # A rewritten last bar (the store replaces partial intraday bars) invalidates the state
+        same_last = last_date in hist.index and tuple(hist.loc[last_date, list(OHLCV)]) == last_bar
+        if same_last and hist.index[0] == first_date and hist.index[-1] == last_date and len(hist) == len(frame):
+            timing.set(cache="hit")
+            return frame.copy()
+        if same_last and hist.index[0] == first_date and hist.index.get_loc(last_date) == len(frame) - 1:
+            timing.set(cache="incremental")
+            # Other sessions may be folding bars into the cached state right now;
+            # advance a private copy and swap it in
+            state = copy.deepcopy(state)
+            new_bars = hist.iloc[len(frame):]
+            rows = [
+                {k: v[0] for k, v in state.update(*bar).items()}
+                for bar in zip(*_ohlcv(new_bars))
+            ]
+            frame = pd.concat([frame, pd.DataFrame(rows, index=new_bars.index)])
+            with _cache_lock:
+                _cache[ticker] = (first_date, hist.index[-1], _last_bar(hist), frame, state)
+            return frame.copy()
+
+    timing.set(cache="miss")
+    columns = _ohlcv(hist)
+    frame = pd.DataFrame({k: v for k, v in compute_all(*columns).items()}, index=hist.index)
+    state = IndicatorState.from_history(*columns)
+    with _cache_lock:
+        _cache[ticker] = (hist.index[0], hist.index[-1], _last_bar(hist), frame, state)
+    return frame.copy()
+
+
+def panel(histories):
+    """
+    Indicators for many tickers at once.
+
+    `histories` maps ticker -> OHLCV DataFrame; bars are aligned on a shared
+    date index and every indicator comes back as a (dates, tickers) DataFrame.
+    """
+    fields = {}
+    for field in ("Open", "High", "Low", "Close", "Volume"):
+        fields[field] = pd.DataFrame({t: h[field] for t, h in histories.items()}).sort_index()
+    index, columns = fields["Close"].index, fields["Close"].columns
+    with span("indicators.panel") as timing:
+        timing.set(items=len(columns))
+        results = compute_all(*(fields[f].to_numpy(dtype="float64") for f in ("Open", "High", "Low", "Close", "Volume")))
+    return {name: pd.DataFrame(values, index=index, columns=columns) for name, values in results.items()}
@@ -0,0 +1,401 @@
+# instrumentation.py
+import contextlib
+import contextvars
+import cProfile
+import functools
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Latency histogram buckets (seconds), Prometheus-style cumulative "le" bounds.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+RECENT_PER_SPAN = 256
+
+# FINGPT_PROFILE=cprofile|sample profiles the next FINGPT_PROFILE_RUNS runs
+# (Streamlit reruns or job runs) of this process and writes them to PROFILE_DIR.
+PROFILE_MODE = os.getenv("FINGPT_PROFILE", "").strip().lower()
+PROFILE_RUNS = int(os.getenv("FINGPT_PROFILE_RUNS", "1"))
+PROFILE_DIR = os.getenv("FINGPT_PROFILE_DIR", os.path.join(".cache", "profiles"))
+SAMPLE_INTERVAL = float(os.getenv("FINGPT_PROFILE_INTERVAL_MS", "5")) / 1000
+
+_current = contextvars.ContextVar("fingpt_span", default=None)
+
+
+class Span:
+    """One timed operation. Attach sizes and cache outcomes with `set()`."""
+
+    __slots__ = ("name", "labels", "bytes", "items", "cache", "error", "started", "seconds")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.bytes = 0
+        self.items = None
+        self.cache = None
+        self.error = None
+        self.started = time.perf_counter()
+        self.seconds = None
+
+    def set(self, bytes=None, items=None, cache=None):
+        if bytes is not None:
+            self.bytes += int(bytes)
+        if items is not None:
+            self.items = items
+        if cache is not None:
+            self.cache = cache
+        return self
+
+
+class _Stats:
+    __slots__ = ("count", "errors", "seconds", "bytes", "buckets", "cache", "recent")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.bytes = 0
+        self.buckets = [0] * len(BUCKETS)
+        self.cache = defaultdict(int)
+        self.recent = deque(maxlen=RECENT_PER_SPAN)
+
+
+class Registry:
+    """Aggregates finished spans per (name, labels) and collects gauges from other modules."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._collectors = []
+
+    def record(self, span):
+        key = (span.name, tuple(sorted(span.labels.items())))
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _Stats()
+            stats.count += 1
+            stats.seconds += span.seconds
+            stats.bytes += span.bytes
+            stats.recent.append(span.seconds)
+            if span.error is not None:
+                stats.errors += 1
+            if span.cache is not None:
+                stats.cache[span.cache] += 1
+            for i, bound in enumerate(BUCKETS):
+                if span.seconds <= bound:
+                    stats.buckets[i] += 1
+
+    def register_collector(self, fn):
+        """`fn()` returns [(metric, labels dict, value, "gauge"|"counter")], read at export time."""
+        with self._lock:
+            self._collectors.append(fn)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def summary(self):
+        """One row per span name/labels for display: count, p50/p95, bytes, cache hit ratio."""
+        with self._lock:
+            items = [(k, s.count, s.errors, s.seconds, s.bytes, dict(s.cache), list(s.recent)) for k, s in self._stats.items()]
+        rows = []
+        for (name, labels), count, errors, seconds, nbytes, cache, recent in sorted(items):
+            lookups = cache.get("hit", 0) + cache.get("miss", 0)
+            rows.append({
+                "span": name + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else ""),
+                "count": count,
+                "errors": errors,
+                "p50_ms": round(float(np.percentile(recent, 50)) * 1000, 1) if recent else None,
+                "p95_ms": round(float(np.percentile(recent, 95)) * 1000, 1) if recent else None,
+                "total_s": round(seconds, 3),
+                "kb": round(nbytes / 1024, 1),
+                "cache_hit_ratio": round(cache.get("hit", 0) / lookups, 2) if lookups else None,
+            })
+        return rows
+
+    def prometheus(self):
+        """Metrics in the Prometheus text exposition format."""
+        lines = [
+            "# TYPE fingpt_span_seconds histogram",
+        ]
+        with self._lock:
+            items = [(k, s.count, s.errors, s.seconds, s.bytes, list(s.buckets), dict(s.cache)) for k, s in self._stats.items()]
+            collectors = list(self._collectors)
+
+        extra = defaultdict(list)
+        for (name, labels), count, errors, seconds, nbytes, buckets, cache in sorted(items):
+            base = _labels({"span": name, **dict(labels)})
+            for bound, n in zip(BUCKETS, buckets):
+                lines.append(f'fingpt_span_seconds_bucket{_labels({"span": name, **dict(labels), "le": bound})} {n}')
+            lines.append(f'fingpt_span_seconds_bucket{_labels({"span": name, **dict(labels), "le": "+Inf"})} {count}')
+            lines.append(f"fingpt_span_seconds_sum{base} {seconds:.6f}")
+            lines.append(f"fingpt_span_seconds_count{base} {count}")
+            extra["fingpt_span_errors_total counter"].append(f"fingpt_span_errors_total{base} {errors}")
+            extra["fingpt_span_bytes_total counter"].append(f"fingpt_span_bytes_total{base} {nbytes}")
+            for result, n in sorted(cache.items()):
+                extra["fingpt_span_cache_total counter"].append(
+                    f'fingpt_span_cache_total{_labels({"span": name, **dict(labels), "result": result})} {n}'
+                )
+
+        for fn in collectors:
+            try:
+                for metric, labels, value, kind in fn():
+                    extra[f"{metric} {kind}"].append(f"{metric}{_labels(labels)} {value}")
+            except Exception as e:
+                print(f"⚠️ Metrics collector failed: {e}")
+
+        for header, samples in extra.items():
+            lines.append(f"# TYPE {header}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        k + '="' + str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for k, v in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+registry = Registry()
+
+
+# ----------------------------
+# Spans
+# ----------------------------
+@contextlib.contextmanager
+def span(name, **labels):
+    """
+    Time a block as span `name`. Keep `labels` low-cardinality (provider,
+    function, source), never tickers. Errors are counted and re-raised.
+    """
+    s = Span(name, labels)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = e
+        raise
+    finally:
+        try:
+            _current.reset(token)
+        except ValueError:
+            pass  # a generator closed from another context
+        s.seconds = time.perf_counter() - s.started
+        registry.record(s)
+
+
+def observe(name, seconds, bytes=0, cache=None, error=None, **labels):
+    """Record an already-timed operation (e.g. one spanning generator yields)."""
+    s = Span(name, labels)
+    s.seconds = seconds
+    s.set(bytes=bytes, cache=cache)
+    s.error = error
+    registry.record(s)
+
+
+def current_span():
+    """The innermost open span in this thread/context, or None."""
+    return _current.get()
+
+
+def add_bytes(n):
+    """Add a payload size to the current span, if any (for code that doesn't own the span)."""
+    s = _current.get()
+    if s is not None:
+        s.set(bytes=n)
+
+
+def timed(name, **labels):
+    """Decorator form of `span`."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def summary():
+    return registry.summary()
+
+
+def prometheus_text():
+    return registry.prometheus()
+
+
+def register_collector(fn):
+    registry.register_collector(fn)
+
+
+# ----------------------------
+# Export
+# ----------------------------
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+_metrics_server = None
+_metrics_lock = threading.Lock()
+
+
+def start_metrics_server(port=None):
+    """Serve /metrics on `port` (default FINGPT_METRICS_PORT) once per process; no-op if unset."""
+    global _metrics_server
+    port = port or os.getenv("FINGPT_METRICS_PORT")
+    if not port:
+        return None
+    with _metrics_lock:
+        if _metrics_server is None:
+            try:
+                _metrics_server = ThreadingHTTPServer(("0.0.0.0", int(port)), _MetricsHandler)
+            except OSError as e:
+                print(f"⚠️ Metrics server not started on port {port}: {e}")
+                return None
+            threading.Thread(target=_metrics_server.serve_forever, name="metrics", daemon=True).start()
+            print(f"📈 Prometheus metrics on :{port}/metrics")
+        return _metrics_server
+
+
+def write_metrics(path):
+    """Write the current metrics to `path` (e.g. for a node-exporter textfile collector)."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(prometheus_text())
+    os.replace(tmp, path)
+
+
+# ----------------------------
+# Profiling
+# ----------------------------
+class _Sampler:
+    """Samples every thread's stack at a fixed interval; output is collapsed stacks (flame graph input)."""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.counts = defaultdict(int)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampler", daemon=True)
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.counts[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            for stack, n in sorted(self.counts.items(), key=lambda kv: -kv[1]):
+                f.write(f"{stack} {n}\n")
+
+
+class _Profile:
+    def __init__(self, label, mode):
+        self.label = label
+        self.mode = mode
+        self.path = None
+        self._profiler = cProfile.Profile() if mode == "cprofile" else _Sampler()
+
+    def start(self):
+        if self.mode == "cprofile":
+            self._profiler.enable()
+        else:
+            self._profiler.start()
+        return self
+
+    def stop(self):
+        if self.mode == "cprofile":
+            self._profiler.disable()
+        else:
+            self._profiler.stop()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        suffix = "prof" if self.mode == "cprofile" else "collapsed.txt"
+        self.path = os.path.join(PROFILE_DIR, f"{self.label}-{stamp}-{os.getpid()}.{suffix}")
+        if self.mode == "cprofile":
+            self._profiler.dump_stats(self.path)
+        else:
+            self._profiler.dump(self.path)
+        print(f"🔬 Profile written to {self.path}")
+        return self.path
+
+
+_profile_lock = threading.Lock()
+_profiles_left = PROFILE_RUNS if PROFILE_MODE in ("cprofile", "sample") else 0
+_active = None
+
+
+def start_profile(label, mode=None):
+    """
+    Start profiling a run if FINGPT_PROFILE is set (and runs are left) or
+    `mode` is given explicitly. Returns the profile or None. A profile left
+    running by an interrupted run (e.g. a Streamlit rerun) is finished first.
+    """
+    global _profiles_left, _active
+    with _profile_lock:
+        if _active is not None:
+            _active.stop()
+            _active = None
+        if mode is None:
+            if _profiles_left <= 0:
+                return None
+            _profiles_left -= 1
+            mode = PROFILE_MODE
+        if mode not in ("cprofile", "sample"):
+            return None
+        _active = _Profile(label, mode).start()
+        return _active
+
+
+def stop_profile():
+    """Finish the running profile, if any; returns the dump path."""
+    global _active
+    with _profile_lock:
+        profile, _active = _active, None
+    return profile.stop() if profile is not None else None
+
+
+@contextlib.contextmanager
+def profile_run(label, mode=None):
+    """Profile the enclosed job run when profiling is switched on."""
+    profile = start_profile(label, mode)
+    try:
+        yield profile
+    finally:
+        if profile is not None:
+            stop_profile()
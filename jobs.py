@@ -0,0 +1,246 @@
+# jobs.py
+"""
+Durable job queue in a SQLite file, shared by the web process (which
+enqueues and polls) and worker.py (which runs jobs).
+
+A job is a `kind` plus JSON arguments. Jobs with the same `dedupe_key` are
+merged while one is queued or running, so a burst of clicks is one job.
+Failures are retried with exponential backoff up to `max_attempts`; a worker
+holds a lease on each job it runs and renews it while the job is alive, so a
+job whose worker died is picked up again once the lease lapses.
+"""
+import json
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+
+JOBS_DB = os.getenv("FINGPT_JOBS_DB", os.path.join(".cache", "jobs.sqlite3"))
+MAX_ATTEMPTS = int(os.getenv("FINGPT_JOB_MAX_ATTEMPTS", "3"))
+BACKOFF_SECONDS = float(os.getenv("FINGPT_JOB_BACKOFF_SECONDS", "30"))
+LEASE_SECONDS = float(os.getenv("FINGPT_JOB_LEASE_SECONDS", "300"))
+# Finished jobs are kept this long for status polling, then purged
+KEEP_SECONDS = 7 * 24 * 3600
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+ACTIVE = (QUEUED, RUNNING)
+
+_COLUMNS = ("id", "kind", "args", "dedupe_key", "status", "attempts", "max_attempts", "run_at",
+            "created_at", "started_at", "finished_at", "worker", "lease_until", "result", "error")
+
+
+def _row(row):
+    if row is None:
+        return None
+    job = dict(zip(_COLUMNS, row))
+    job["args"] = json.loads(job["args"]) if job["args"] else {}
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+class JobQueue:
+    def __init__(self, path=JOBS_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit mode; claims use explicit BEGIN IMMEDIATE so two workers never take the same job
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, args TEXT, dedupe_key TEXT,"
+                " status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL,"
+                " run_at REAL NOT NULL, created_at REAL NOT NULL, started_at REAL, finished_at REAL,"
+                " worker TEXT, lease_until REAL, result TEXT, error TEXT)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_dedupe ON jobs (dedupe_key, status)")
+
+    def _transaction(self):
+        return _Immediate(self._conn, self._lock)
+
+    def enqueue(self, kind, args=None, dedupe_key=None, max_attempts=MAX_ATTEMPTS, delay=0.0):
+        """
+        Queue a job and return its id. If a job with `dedupe_key` is already
+        queued or running, nothing is added and that job's id is returned.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            if dedupe_key is not None:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE dedupe_key = ? AND status IN (?, ?) ORDER BY id LIMIT 1",
+                    (dedupe_key, *ACTIVE),
+                ).fetchone()
+                if row is not None:
+                    return row[0]
+            cursor = conn.execute(
+                "INSERT INTO jobs (kind, args, dedupe_key, status, max_attempts, run_at, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (kind, json.dumps(args or {}), dedupe_key, QUEUED, max(1, max_attempts), now + delay, now),
+            )
+            return cursor.lastrowid
+
+    def claim(self, worker, kinds=None, lease=LEASE_SECONDS):
+        """
+        Take the next due job (or one whose previous worker's lease lapsed) and
+        mark it running for `worker`. Returns the job dict or None.
+        """
+        now = time.time()
+        kind_filter, params = "", []
+        if kinds:
+            kind_filter = f" AND kind IN ({','.join('?' * len(kinds))})"
+            params = list(kinds)
+        with self._transaction() as conn:
+            # A job that outlived its lease on its last attempt (its worker died) is not retried again
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, lease_until = NULL, error = ?"
+                " WHERE status = ? AND lease_until < ? AND attempts >= max_attempts",
+                (FAILED, now, "worker lease expired", RUNNING, now),
+            )
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE ((status = ? AND run_at <= ?) OR (status = ? AND lease_until < ?))"
+                + kind_filter + " ORDER BY run_at, id LIMIT 1",
+                [QUEUED, now, RUNNING, now] + params,
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, worker = ?, lease_until = ?"
+                " WHERE id = ?",
+                (RUNNING, now, worker, now + lease, row[0]),
+            )
+            return _row(conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (row[0],)).fetchone())
+
+    def renew(self, job_ids, worker, lease=LEASE_SECONDS):
+        """Extend the lease on jobs `worker` is still running."""
+        if not job_ids:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = ?",
+                [(time.time() + lease, job_id, worker, RUNNING) for job_id in job_ids],
+            )
+
+    def complete(self, job_id, worker, result=None):
+        """
+        Record success for a job `worker` still holds. Returns False (and
+        changes nothing) if its lease lapsed and the job moved on.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, lease_until = NULL, result = ?, error = NULL"
+                " WHERE id = ? AND worker = ? AND status = ?",
+                (SUCCEEDED, time.time(), json.dumps(result, default=str), job_id, worker, RUNNING),
+            )
+            return cursor.rowcount > 0
+
+    def fail(self, job_id, worker, error):
+        """
+        Record a failed attempt: re-queue with exponential backoff (with
+        jitter) while attempts remain, otherwise mark the job failed. Returns
+        the new status, or None if `worker` no longer holds the job.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            # A stale attempt must not re-queue or fail a job another worker has since claimed
+            row = conn.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND worker = ? AND status = ?",
+                (job_id, worker, RUNNING),
+            ).fetchone()
+            if row is None:
+                return None
+            attempts, max_attempts = row
+            if attempts < max_attempts:
+                delay = BACKOFF_SECONDS * 2 ** (attempts - 1) * random.uniform(0.8, 1.2)
+                conn.execute(
+                    "UPDATE jobs SET status = ?, run_at = ?, lease_until = NULL, error = ? WHERE id = ?",
+                    (QUEUED, now + delay, str(error), job_id),
+                )
+                return QUEUED
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, lease_until = NULL, error = ? WHERE id = ?",
+                (FAILED, now, str(error), job_id),
+            )
+            return FAILED
+
+    def get(self, job_id):
+        """Job dict (status, attempts, result, error, timestamps) or None."""
+        with self._lock:
+            return _row(self._conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def recent(self, limit=20, kind=None):
+        query = f"SELECT {', '.join(_COLUMNS)} FROM jobs"
+        params = []
+        if kind:
+            query += " WHERE kind = ?"
+            params.append(kind)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY id DESC LIMIT ?", params + [limit]).fetchall()
+        return [_row(r) for r in rows]
+
+    def counts(self):
+        """{status: number of jobs}."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def purge(self, older_than=KEEP_SECONDS):
+        """Delete finished jobs older than `older_than` seconds; returns how many."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (SUCCEEDED, FAILED, time.time() - older_than),
+            )
+            return cursor.rowcount
+
+
+class _Immediate:
+    """BEGIN IMMEDIATE ... COMMIT under the queue's thread lock (write lock across processes)."""
+
+    def __init__(self, conn, lock):
+        self.conn = conn
+        self.lock = lock
+
+    def __enter__(self):
+        self.lock.acquire()
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+        except Exception:
+            self.lock.release()
+            raise
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.lock.release()
+        return False
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
+
+
+def enqueue(kind, args=None, dedupe_key=None, **kwargs):
+    return get_queue().enqueue(kind, args, dedupe_key, **kwargs)
+
+
+def status(job_id):
+    return get_queue().get(job_id)
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
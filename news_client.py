@@ -0,0 +1,199 @@
+# news_client.py
+import hashlib
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote_plus
+
+import feedparser
+import requests
+from requests.adapters import HTTPAdapter
+
+from cache import get_cache, make_key
+from finviz_parser import parse_news_table
+from instrumentation import observe, span
+
+# Base URLs are configurable so benchmarks and tests can point at a local stub.
+GOOGLE_NEWS_URL = os.getenv("FINGPT_GOOGLE_NEWS_URL", "https://news.google.com/rss/search")
+FINVIZ_URL = os.getenv("FINGPT_FINVIZ_URL", "https://finviz.com/quote.ashx")
+
+NEWS_WORKERS = int(os.getenv("FINGPT_NEWS_WORKERS", "8"))
+REQUEST_TIMEOUT = 10
+ITEMS_PER_SOURCE = 5
+# Validators + parsed items per URL outlive the news TTL so an expired entry
+# can still be revalidated with a cheap 304.
+VALIDATOR_TTL = 7 * 24 * 3600
+USER_AGENT = "Mozilla/5.0"
+
+_session = None
+_session_lock = threading.Lock()
+_pool = ThreadPoolExecutor(max_workers=NEWS_WORKERS, thread_name_prefix="news")
+
+
+# ----------------------------
+# HTTP
+# ----------------------------
+def get_session():
+    """Shared keep-alive session; connections to each host are pooled and reused."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=NEWS_WORKERS)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({"User-Agent": USER_AGENT, "Accept-Encoding": "gzip, deflate"})
+            _session = session
+        return _session
+
+
+def _conditional_get(url, parse, source):
+    """
+    GET `url` with the ETag / Last-Modified seen last time. A 304 reuses the
+    previously parsed items; a 200 is parsed with `parse(response)` and stored.
+    """
+    cache = get_cache()
+    key = make_key("news_http", url)
+    previous = cache.get("news_http", key)
+    headers = {}
+    if previous:
+        if previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous.get("last_modified"):
+            headers["If-Modified-Since"] = previous["last_modified"]
+
+    with span("news.http", source=source) as s:
+        response = get_session().get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+        s.set(bytes=len(response.content))
+        if response.status_code == 304 and previous:
+            s.set(cache="hit")
+            return previous["items"]
+        s.set(cache="miss")
+        response.raise_for_status()
+
+    with span("news.parse", source=source):
+        items = parse(response)
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if etag or last_modified:
+        cache.set("news_http", key, {"etag": etag, "last_modified": last_modified, "items": items}, VALIDATOR_TTL)
+    return items
+
+
+# ----------------------------
+# Sources
+# ----------------------------
+def _parse_google(response):
+    feed = feedparser.parse(response.content)
+    return [
+        {
+            "title": entry.title,
+            "summary": entry.get("summary", ""),
+            "source": "Google News",
+            "link": entry.link,
+            "published": entry.get("published"),
+        }
+        for entry in feed.entries[:ITEMS_PER_SOURCE]
+    ]
+
+
+def _parse_finviz(response):
+    return [
+        {
+            "title": row["title"],
+            "summary": "(via Finviz)",
+            "source": "Finviz",
+            "link": row["link"],
+            "published": row["published"],
+        }
+        for row in parse_news_table(response.text, limit=ITEMS_PER_SOURCE)
+    ]
+
+
+SOURCES = {
+    "Google News": (lambda t: f"{GOOGLE_NEWS_URL}?q={quote_plus(t + ' stock')}", _parse_google),
+    "Finviz": (lambda t: f"{FINVIZ_URL}?t={quote_plus(t)}", _parse_finviz),
+}
+
+
+def _fetch_source(ticker, source):
+    url_for, parse = SOURCES[source]
+    try:
+        return _conditional_get(url_for(ticker), parse, source)
+    except Exception as e:
+        print(f"⚠️ {source} news error for {ticker}: {e}")
+        return None
+
+
+# ----------------------------
+# Dedupe
+# ----------------------------
+_PUNCT = re.compile(r"[^a-z0-9 ]+")
+_SPACES = re.compile(r"\s+")
+
+
+def title_fingerprint(title):
+    """
+    Hash of a headline normalized for cross-source matching: lowercase, no
+    punctuation, and without Google News' trailing " - Publisher".
+    """
+    title = title or ""
+    head, sep, tail = title.rpartition(" - ")
+    if sep and len(tail.split()) <= 4:
+        title = head
+    normalized = _SPACES.sub(" ", _PUNCT.sub(" ", title.lower())).strip()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def dedupe(items):
+    """Drop items whose normalized title was already seen (first source wins)."""
+    seen = set()
+    unique = []
+    for item in items:
+        fingerprint = title_fingerprint(item.get("title"))
+        if fingerprint not in seen:
+            seen.add(fingerprint)
+            unique.append(item)
+    return unique
+
+
+# ----------------------------
+# Public API
+# ----------------------------
+def fetch_news(tickers, use_cache=True):
+    """
+    News for many tickers at once: every (ticker, source) request runs in
+    parallel over pooled connections. Returns {ticker: items}, deduped per ticker.
+    """
+    tickers = list(dict.fromkeys(t.strip().upper() for t in tickers if t and t.strip()))
+    cache = get_cache()
+    results = {}
+    missing = []
+    for ticker in tickers:
+        items = cache.get("news", make_key("news", ticker)) if use_cache else None
+        if items is None:
+            missing.append(ticker)
+        else:
+            results[ticker] = items
+        observe("news.lookup", 0.0, cache="miss" if items is None else "hit")
+
+    futures = {
+        (ticker, source): _pool.submit(_fetch_source, ticker, source)
+        for ticker in missing
+        for source in SOURCES
+    }
+    for ticker in missing:
+        fetched = [futures[(ticker, source)].result() for source in SOURCES]
+        items = dedupe([item for batch in fetched if batch for item in batch])
+        results[ticker] = items
+        # Don't pin a partial result if a source errored
+        if items and all(batch is not None for batch in fetched):
+            cache.set("news", make_key("news", ticker), items)
+
+    return {ticker: results[ticker] for ticker in tickers}
+
+
+def get_news(ticker):
+    """News items for one ticker."""
+    return fetch_news([ticker]).get(ticker.strip().upper(), [])
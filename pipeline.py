@@ -0,0 +1,287 @@
+# pipeline.py
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from article_index import get_index
+from av_scheduler import BACKGROUND, request_deadline, request_priority
+from batch_summarizer import summarize_batch
+from data_fetcher import get_stock_data, get_extended_news
+from sentiment import label, score_batch, sentiment_score
+from sentiment_store import record_many
+from summarizer import FALLBACK_SUMMARY, summarize_text
+
+# Max in-flight calls per external provider, shared by every ticker in a run.
+PROVIDER_LIMITS = {
+    "alpha_vantage": int(os.getenv("ALPHA_VANTAGE_CONCURRENCY", "2")),
+    "news": int(os.getenv("NEWS_CONCURRENCY", "8")),
+    "openai": int(os.getenv("OPENAI_CONCURRENCY", "4")),
+}
+_semaphores = {name: threading.BoundedSemaphore(limit) for name, limit in PROVIDER_LIMITS.items()}
+
+# Share of the per-ticker timeout the fetch stages may use, so a slow news source
+# still leaves time to summarize whatever did arrive.
+FETCH_BUDGET = 0.6
+
+
+# ----------------------------
+# Stage helpers
+# ----------------------------
+class StageCancelled(Exception):
+    """A stage was skipped because its ticker's deadline passed or the run finished."""
+
+
+def _run_stage(provider, stage, timings, priority, deadline, cancelled, fn, *args):
+    """
+    Run one stage under its provider's concurrency limit and record its latency.
+
+    A stage still queued for its provider when `deadline` passes or
+    `cancelled` is set is skipped, and Alpha Vantage calls it queues are
+    dropped unsent after `deadline`, so stragglers stop spending quota. A
+    straggler that finishes anyway records no latency: its ticker has
+    already been reported without it.
+    """
+    def expired():
+        return cancelled.is_set() or time.monotonic() >= deadline
+
+    if expired():
+        raise StageCancelled(f"{stage} skipped")
+    with _semaphores[provider], request_priority(priority), request_deadline(deadline):
+        if expired():
+            raise StageCancelled(f"{stage} skipped")
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            if not expired():
+                timings[stage] = time.perf_counter() - start
+
+
+def _collect(future, deadline, stage, result, default):
+    """Wait for a stage until the ticker deadline; on timeout/error keep going with `default`."""
+    try:
+        return future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except FutureTimeout:
+        result["missing"].append(stage)
+        result["errors"][stage] = "timed out"
+    except Exception as e:
+        result["missing"].append(stage)
+        result["errors"][stage] = str(e)
+    result["status"] = "partial"
+    return default
+
+
+def _finalize(result):
+    """Detach `result` from stages still running, so its timings no longer change once it is returned."""
+    result["timings"] = dict(result["timings"])
+    return result
+
+
+def _article_text(item):
+    return item["title"] + ": " + item["summary"]
+
+
+def _new_result(ticker):
+    return {
+        "ticker": ticker,
+        "status": "ok",
+        "sentiment": None,
+        "score": None,
+        "summary": None,
+        "new_articles": None,
+        "reused": False,
+        "missing": [],
+        "errors": {},
+        "timings": {},
+    }
+
+
+def _fetch(ticker, stage_pool, timeout, priority, incremental, cancelled):
+    """
+    Fundamentals and news for one ticker within its fetch budget. Returns
+    (result, data, news); `data`/`news` are None when no summary is needed
+    because the ticker failed or, with `incremental`, had no new articles.
+    """
+    result = _new_result(ticker)
+    timings = result["timings"]
+    fetch_deadline = time.monotonic() + timeout * FETCH_BUDGET
+
+    fundamentals_future = stage_pool.submit(_run_stage, "alpha_vantage", "fundamentals", timings, priority,
+                                            fetch_deadline, cancelled, get_stock_data, ticker)
+    news_future = stage_pool.submit(_run_stage, "news", "news", timings, priority,
+                                    fetch_deadline, cancelled, get_extended_news, ticker)
+    data = _collect(fundamentals_future, fetch_deadline, "fundamentals", result, default={})
+    news = _collect(news_future, fetch_deadline, "news", result, default=[])
+
+    if not data and not news:
+        result["status"] = "failed"
+        return result, None, None
+
+    if incremental:
+        index = get_index()
+        news = index.unseen(ticker, news)
+        result["new_articles"] = len(news)
+        previous = index.aggregate(ticker)
+        if not news and previous is not None:
+            # Nothing new since the last run: reuse the stored summary and score
+            result["summary"] = previous["summary"]
+            result["score"] = previous["score"]
+            result["sentiment"] = label(previous["score"])
+            result["reused"] = True
+            return result, None, None
+    return result, data, news
+
+
+def _score(result, summary_text, news, incremental):
+    """Score a finished summary into `result` (a missing summary fails the ticker)."""
+    if summary_text == FALLBACK_SUMMARY:
+        # summarize_text hides OpenAI errors behind the fallback text
+        result["missing"].append("summary")
+        result["errors"]["summary"] = "summary unavailable"
+        summary_text = None
+    if summary_text is None:
+        result["status"] = "failed"
+        return result
+
+    start = time.perf_counter()
+    score = sentiment_score(summary_text)
+    if incremental and news:
+        # Only record articles once their summary succeeded, so failures are retried next run
+        article_scores = score_batch([_article_text(n) for n in news])
+        score = get_index().record(result["ticker"], news, article_scores, summary_text)["score"]
+    result["timings"]["sentiment"] = time.perf_counter() - start
+
+    result["summary"] = summary_text
+    result["sentiment"] = label(score)
+    result["score"] = score
+    return result
+
+
+def analyze_ticker(ticker, stage_pool, timeout, priority=BACKGROUND, incremental=False, cancelled=None):
+    """
+    Fetch fundamentals and news concurrently, then summarize and score one ticker.
+
+    With `incremental`, only articles missing from the article index are
+    summarized, the score is the ticker's decayed aggregate over per-article
+    scores, and a ticker with no new articles skips the LLM entirely.
+    Setting `cancelled` stops stages that haven't started yet.
+    """
+    cancelled = cancelled or threading.Event()
+    deadline = time.monotonic() + timeout
+    result, data, news = _fetch(ticker, stage_pool, timeout, priority, incremental, cancelled)
+    if data is None:
+        return _finalize(result)
+
+    summary_future = stage_pool.submit(_run_stage, "openai", "summary", result["timings"], priority,
+                                       deadline, cancelled, summarize_text, ticker, data, news)
+    summary_text = _collect(summary_future, deadline, "summary", result, default=None)
+    return _finalize(_score(result, summary_text, news, incremental))
+
+
+def _analyze_batched(tickers, ticker_pool, stage_pool, timeout, priority, incremental, cancelled):
+    """
+    Fetch every ticker concurrently, then summarize all of them through one
+    set of OpenAI batch jobs (batch_summarizer) instead of a call per ticker.
+    """
+    fetched = []
+    for ticker, future in [(t, ticker_pool.submit(_fetch, t, stage_pool, timeout, priority, incremental, cancelled)) for t in tickers]:
+        try:
+            fetched.append(future.result())
+        except Exception as e:
+            result = _new_result(ticker)
+            result["status"] = "failed"
+            result["errors"]["pipeline"] = str(e)
+            fetched.append((result, None, None))
+
+    todo = [(result, data, news) for result, data, news in fetched if data is not None]
+    start = time.perf_counter()
+    summaries, _ = summarize_batch([(r["ticker"], data, news) for r, data, news in todo], label="pipeline")
+    seconds = time.perf_counter() - start
+    for (result, _, news), summary_text in zip(todo, summaries):
+        result["timings"]["summary"] = seconds
+        if summary_text is None:
+            result["missing"].append("summary")
+            result["errors"]["summary"] = "batch summary failed"
+        _score(result, summary_text, news, incremental)
+    return [_finalize(result) for result, _, _ in fetched]
+
+
+# ----------------------------
+# Runner
+# ----------------------------
+def _stage_stats(results, wall_time):
+    stages = {}
+    for r in results:
+        for stage, seconds in r["timings"].items():
+            stages.setdefault(stage, []).append(seconds)
+
+    status_counts = {}
+    for r in results:
+        status_counts[r["status"]] = status_counts.get(r["status"], 0) + 1
+
+    return {
+        "wall_time": round(wall_time, 3),
+        "tickers": len(results),
+        "status_counts": status_counts,
+        "llm_skipped": sum(1 for r in results if r["reused"]),
+        "stages": {
+            stage: {
+                "count": len(times),
+                "total": round(sum(times), 3),
+                "mean": round(sum(times) / len(times), 3),
+                "max": round(max(times), 3),
+            }
+            for stage, times in stages.items()
+        },
+    }
+
+
+def run_pipeline(tickers, max_workers=8, ticker_timeout=60, priority=BACKGROUND, incremental=False,
+                 source="pipeline", batch=False):
+    """
+    Analyze many tickers concurrently (see analyze_ticker for `incremental`).
+
+    Returns `(results, stats)`; `results` follows the order of `tickers` regardless
+    of completion order, and tickers that time out are reported as partial/failed
+    rather than holding up the rest. Scores are logged to the sentiment store
+    under `source`. With `batch`, summaries go through the OpenAI Batch API
+    after all fetches finish (for scheduled jobs, where throughput and cost
+    matter more than latency).
+    """
+    tickers = list(dict.fromkeys(t.strip().upper() for t in tickers if t))
+    start = time.perf_counter()
+
+    # Set when the run returns, so stages still queued behind provider limits never start
+    cancelled = threading.Event()
+    ticker_pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="ticker")
+    stage_pool = ThreadPoolExecutor(max_workers=max(1, max_workers) * 3, thread_name_prefix="stage")
+    try:
+        if batch:
+            results = _analyze_batched(tickers, ticker_pool, stage_pool, ticker_timeout, priority, incremental, cancelled)
+        else:
+            futures = [
+                ticker_pool.submit(analyze_ticker, t, stage_pool, ticker_timeout, priority, incremental, cancelled)
+                for t in tickers
+            ]
+            results = []
+            for ticker, future in zip(tickers, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    result = _new_result(ticker)
+                    result["status"] = "failed"
+                    result["errors"]["pipeline"] = str(e)
+                    results.append(result)
+    finally:
+        # Don't wait on stragglers that already blew their deadline
+        cancelled.set()
+        ticker_pool.shutdown(wait=False, cancel_futures=True)
+        stage_pool.shutdown(wait=False, cancel_futures=True)
+
+    # A reused aggregate was recorded when it was computed; logging it again
+    # every run would flood the history with copies of one stale point. The
+    # fallback text's ~0 score is no sentiment at all.
+    record_many([(r["ticker"], r["score"], source) for r in results
+                 if not r["reused"] and r["summary"] != FALLBACK_SUMMARY])
+    return results, _stage_stats(results, time.perf_counter() - start)
@@ -1,35 +1,33 @@
 # portfolio.py
-import json
-import os
-import yfinance as yf
+import numpy as np
 import pandas as pd
-
-PORTFOLIO_FILE = "portfolio.json"
+from quotes import get_last_prices
+from portfolio_store import get_store
 
 
 # ----------------------------
 # Helper functions
 # ----------------------------
 def load_portfolio():
-    """Load the user's portfolio from JSON."""
-    if not os.path.exists(PORTFOLIO_FILE):
-        with open(PORTFOLIO_FILE, "w") as f:
-            json.dump([], f)
-    with open(PORTFOLIO_FILE) as f:
-        return json.load(f)
+    """Load the user's holdings (aggregated across lots)."""
+    return get_store().holdings()
 
 
 def save_portfolio(portfolio):
-    """Save the portfolio to JSON."""
-    with open(PORTFOLIO_FILE, "w") as f:
-        json.dump(portfolio, f, indent=2)
+    """Replace the stored portfolio with `portfolio`."""
+    get_store().replace_all(portfolio)
+
+
+def get_lots(ticker=None):
+    """Individual purchase lots with their own cost basis."""
+    return get_store().lots(ticker)
 
 
 # ----------------------------
 # CRUD operations
 # ----------------------------
 def add_holding(ticker: str, shares: float, buy_price: float):
-    """Add or update a holding in the portfolio."""
+    """Add a new lot for a holding; the holding's cost basis is the weighted average of its lots."""
     ticker = ticker.strip().upper()
 
     if not ticker:
@@ -39,33 +37,20 @@ def add_holding(ticker: str, shares: float, buy_price: float):
     if buy_price <= 0:
         raise ValueError("Buy price must be greater than zero.")
 
-    portfolio = load_portfolio()
-    existing = next((item for item in portfolio if item["ticker"] == ticker), None)
+    get_store().apply([("buy", ticker, shares, buy_price)])
+    return load_portfolio()
 
-    if existing:
-        # Update existing holding
-        total_shares = existing["shares"] + shares
-        existing["buy_price"] = (existing["buy_price"] * existing["shares"] + buy_price * shares) / total_shares
-        existing["shares"] = total_shares
-    else:
-        # Add new holding
-        portfolio.append({
-            "ticker": ticker,
-            "shares": shares,
-            "buy_price": buy_price
-        })
 
-    save_portfolio(portfolio)
-    return portfolio
+def remove_holding(ticker: str):
+    """Remove a holding (all of its lots) by ticker."""
+    get_store().apply([("remove", ticker)])
+    return load_portfolio()
 
 
-def remove_holding(ticker: str):
-    """Remove a holding by ticker."""
-    portfolio = load_portfolio()
-    ticker = ticker.strip().upper()
-    portfolio = [item for item in portfolio if item["ticker"] != ticker]
-    save_portfolio(portfolio)
-    return portfolio
+def apply_trades(trades):
+    """Apply several buys/sells/removals atomically (see PortfolioStore.apply)."""
+    get_store().apply(trades)
+    return load_portfolio()
 
 
 # ----------------------------
@@ -73,55 +58,57 @@ def remove_holding(ticker: str):
 # ----------------------------
 def calculate_portfolio_value():
     """Calculate total portfolio value and P/L."""
-    portfolio = load_portfolio()
-    results = []
-    total_value = 0.0
-    total_cost = 0.0
+    return value_holdings(load_portfolio())
+
 
+def value_holdings(portfolio, price_lookup=None):
+    """
+    Value an arbitrary list of holdings. With `price_lookup` (ticker -> price,
+    e.g. one batch fetched for many portfolios) no quotes are requested.
+    """
+    holdings = []
     for holding in portfolio:
         ticker = holding.get("ticker", "").strip().upper()
-        shares = holding.get("shares", 0)
-        buy_price = holding.get("buy_price", 0)
-
         if not ticker:
-            print("⚠️ Skipping empty ticker entry in portfolio.json.")
+            print("⚠️ Skipping empty ticker entry in portfolio.")
             continue
+        holdings.append((ticker, holding.get("shares", 0), holding.get("buy_price", 0)))
 
-        try:
-            stock = yf.Ticker(ticker)
-            data = stock.history(period="1d")
-
-            if data.empty:
-                print(f"⚠️ No recent data found for {ticker}. Skipping.")
-                continue
-
-            current_price = data["Close"].iloc[-1]
-            value = current_price * shares
-            cost = buy_price * shares
-            pnl = value - cost
-
-            results.append({
-                "Ticker": ticker,
-                "Shares": shares,
-                "Buy Price ($)": round(buy_price, 2),
-                "Current Price ($)": round(current_price, 2),
-                "Value ($)": round(value, 2),
-                "P/L ($)": round(pnl, 2),
-            })
-
-            total_value += value
-            total_cost += cost
-
-        except Exception as e:
-            print(f"❌ Error fetching data for {ticker}: {e}")
-            continue
+    tickers = [h[0] for h in holdings]
+    shares = np.array([h[1] for h in holdings], dtype=float)
+    buy_prices = np.array([h[2] for h in holdings], dtype=float)
 
-    df = pd.DataFrame(results)
+    if price_lookup is None:
+        # One batched quote request for the whole book instead of a round trip per holding
+        prices, failed = get_last_prices(tickers)
+    else:
+        prices = np.array([price_lookup.get(t, np.nan) for t in tickers], dtype=float)
+        failed = [t for t, p in zip(tickers, prices) if np.isnan(p)]
+    for ticker in failed:
+        print(f"⚠️ No recent data found for {ticker}. Skipping.")
+
+    priced = ~np.isnan(prices)
+    values = prices * shares
+    costs = buy_prices * shares
+    pnls = values - costs
+
+    df = pd.DataFrame({
+        "Ticker": np.array(tickers, dtype=object)[priced],
+        "Shares": shares[priced],
+        "Buy Price ($)": np.round(buy_prices[priced], 2),
+        "Current Price ($)": np.round(prices[priced], 2),
+        "Value ($)": np.round(values[priced], 2),
+        "P/L ($)": np.round(pnls[priced], 2),
+    })
+
+    total_value = float(values[priced].sum())
+    total_cost = float(costs[priced].sum())
     total_pnl = total_value - total_cost
     summary = {
         "Total Value ($)": round(total_value, 2),
         "Total Cost ($)": round(total_cost, 2),
         "Net P/L ($)": round(total_pnl, 2),
+        "Failed Tickers": failed,
     }
 
-    return df, summary
\ No newline at end of file
+    return df, summary
@@ -0,0 +1,201 @@
+# portfolio_store.py
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+PORTFOLIO_DB = os.getenv("FINGPT_PORTFOLIO_DB", "portfolio.db")
+LEGACY_PORTFOLIO_FILE = "portfolio.json"
+
+
+class PortfolioStore:
+    """
+    SQLite-backed portfolio of individual lots.
+
+    Every write runs in one IMMEDIATE transaction, so concurrent Streamlit
+    sessions and the alert jobs can't lose each other's updates. Reads are
+    served from an in-process snapshot that is only rebuilt when the database
+    changes (PRAGMA data_version covers other processes, a local counter
+    covers our own commits).
+    """
+
+    def __init__(self, path=PORTFOLIO_DB, legacy_file=LEGACY_PORTFOLIO_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS lots ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " ticker TEXT NOT NULL,"
+            " shares REAL NOT NULL CHECK (shares > 0),"
+            " price REAL NOT NULL CHECK (price > 0),"
+            " opened_at TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS lots_ticker ON lots (ticker)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._local_writes = 0
+        self._snapshot = None
+        self._snapshot_version = None
+        self._migrate(legacy_file)
+
+    # --- internals ---
+    def _version(self):
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        return data_version, self._local_writes
+
+    def _write(self, fn):
+        """Run `fn(conn)` inside one IMMEDIATE transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._local_writes += 1
+            return result
+
+    def _migrate(self, legacy_file):
+        """Import the old portfolio.json once, as one lot per holding."""
+        def migrate(conn):
+            if conn.execute("SELECT value FROM meta WHERE key = 'migrated'").fetchone():
+                return 0
+            rows = []
+            if legacy_file and os.path.exists(legacy_file):
+                try:
+                    with open(legacy_file) as f:
+                        items = json.load(f)
+                except (OSError, ValueError) as e:
+                    # Not marked migrated: a repaired file is imported on the next start
+                    print(f"⚠️ Could not read {legacy_file} ({e}); left in place, holdings not imported")
+                    return 0
+                for item in items:
+                    lot = _valid_lot(item, source=legacy_file)
+                    if lot:
+                        rows.append(lot + (None,))
+            conn.executemany("INSERT INTO lots (ticker, shares, price, opened_at) VALUES (?, ?, ?, ?)", rows)
+            conn.execute("INSERT INTO meta (key, value) VALUES ('migrated', ?)", (_now(),))
+            return len(rows)
+
+        migrated = self._write(migrate)
+        if migrated:
+            print(f"✅ Migrated {migrated} holdings from {legacy_file} to {self.path}")
+
+    # --- reads ---
+    def holdings(self):
+        """Aggregated holdings (weighted-average cost), in first-bought order."""
+        with self._lock:
+            version = self._version()
+            if self._snapshot is None or version != self._snapshot_version:
+                rows = self._conn.execute(
+                    "SELECT ticker, SUM(shares), SUM(shares * price) / SUM(shares), MIN(id) AS first_id"
+                    " FROM lots GROUP BY ticker ORDER BY first_id"
+                ).fetchall()
+                self._snapshot = [
+                    {"ticker": ticker, "shares": shares, "buy_price": avg_price}
+                    for ticker, shares, avg_price, _ in rows
+                ]
+                self._snapshot_version = version
+            return [dict(h) for h in self._snapshot]
+
+    def lots(self, ticker=None):
+        """Individual lots with their own cost basis."""
+        query = "SELECT id, ticker, shares, price, opened_at FROM lots"
+        params = ()
+        if ticker:
+            query += " WHERE ticker = ?"
+            params = (ticker.strip().upper(),)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY id", params).fetchall()
+        return [
+            {"id": i, "ticker": t, "shares": s, "price": p, "opened_at": o}
+            for i, t, s, p, o in rows
+        ]
+
+    # --- writes ---
+    def apply(self, operations):
+        """
+        Apply several changes atomically. Each operation is one of:
+          ("buy", ticker, shares, price)
+          ("sell", ticker, shares)     -- closes lots first-in, first-out
+          ("remove", ticker)
+        """
+        def run(conn):
+            for op in operations:
+                kind, ticker = op[0], op[1].strip().upper()
+                if kind == "buy":
+                    conn.execute(
+                        "INSERT INTO lots (ticker, shares, price, opened_at) VALUES (?, ?, ?, ?)",
+                        (ticker, float(op[2]), float(op[3]), _now()),
+                    )
+                elif kind == "sell":
+                    _sell_fifo(conn, ticker, float(op[2]))
+                elif kind == "remove":
+                    conn.execute("DELETE FROM lots WHERE ticker = ?", (ticker,))
+                else:
+                    raise ValueError(f"Unknown portfolio operation: {kind}")
+        self._write(run)
+
+    def replace_all(self, holdings):
+        """Replace the whole portfolio with `holdings` (one lot each)."""
+        lots = [lot for lot in (_valid_lot(h) for h in holdings) if lot]
+
+        def run(conn):
+            conn.execute("DELETE FROM lots")
+            conn.executemany(
+                "INSERT INTO lots (ticker, shares, price, opened_at) VALUES (?, ?, ?, ?)",
+                [lot + (_now(),) for lot in lots],
+            )
+        self._write(run)
+
+
+def _valid_lot(item, source="portfolio"):
+    """(ticker, shares, price) from a holding dict, or None (with a warning) if it can't be stored."""
+    try:
+        ticker = str(item.get("ticker") or "").strip().upper()
+        shares, price = float(item.get("shares", 0)), float(item.get("buy_price", 0))
+    except (AttributeError, TypeError, ValueError):
+        print(f"⚠️ Skipping malformed holding in {source}: {item!r}")
+        return None
+    if not ticker or not shares > 0 or not price > 0:
+        # `not x > 0` also rejects NaN
+        print(f"⚠️ Skipping holding in {source} without a ticker or with non-positive shares/price: {item!r}")
+        return None
+    return ticker, shares, price
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _sell_fifo(conn, ticker, shares):
+    held = conn.execute("SELECT COALESCE(SUM(shares), 0) FROM lots WHERE ticker = ?", (ticker,)).fetchone()[0]
+    if shares > held + 1e-9:
+        raise ValueError(f"Cannot sell {shares} shares of {ticker}; only {held} held.")
+    for lot_id, lot_shares in conn.execute(
+        "SELECT id, shares FROM lots WHERE ticker = ? ORDER BY id", (ticker,)
+    ).fetchall():
+        if shares <= 1e-9:
+            break
+        if lot_shares <= shares + 1e-9:
+            conn.execute("DELETE FROM lots WHERE id = ?", (lot_id,))
+            shares -= lot_shares
+        else:
+            conn.execute("UPDATE lots SET shares = ? WHERE id = ?", (lot_shares - shares, lot_id))
+            shares = 0
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Process-wide portfolio store."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PortfolioStore()
+        return _store
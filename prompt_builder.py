@@ -0,0 +1,363 @@
+# prompt_builder.py
+"""
+Token-budgeted summary prompts.
+
+The raw inputs repeat themselves: Google News and Finviz carry the same
+stories, Google's RSS summary is the headline again wrapped in HTML, and
+Alpha Vantage returns every number as a long digit string. `build()` keeps
+one copy of each story, ranks stories by recency and relevance to the ticker,
+formats fundamentals compactly and adds headlines until the prompt reaches
+FINGPT_PROMPT_TOKENS, counted with the model's tokenizer.
+"""
+import html
+import math
+import os
+import re
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from instrumentation import register_collector, span
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("FINGPT_PROMPT_TOKENS", "700"))
+# Headlines whose word sets overlap at least this much (Jaccard) are one story
+SIMILARITY_THRESHOLD = float(os.getenv("FINGPT_HEADLINE_SIMILARITY", "0.6"))
+RECENCY_HALF_LIFE_HOURS = float(os.getenv("FINGPT_NEWS_HALF_LIFE_HOURS", "24"))
+# Undated items are assumed to be this many hours apart (feeds list newest first)
+UNDATED_SPACING_HOURS = 12
+SUMMARY_MAX_WORDS = 40
+LEGACY_NEWS_CHARS = 2000
+NO_FUNDAMENTALS = "Fundamental data not available."
+NO_NEWS = "No recent news available."
+
+PROMPT_TEMPLATE = """
+You are a professional equity research analyst.
+
+Write a concise, structured 3-paragraph summary of the stock **{ticker}** based on its fundamentals and recent market/news context.
+
+---
+
+### FUNDAMENTALS
+{fundamentals}
+
+### RECENT NEWS & MARKET EVENTS
+{news}
+
+---
+
+### OUTPUT INSTRUCTIONS
+Write three clearly separated paragraphs (no bullet points):
+1️ **Overview** — Describe what the company does, its sector, valuation ratios, market position, and key financial highlights.
+2️ **Recent Developments** — Summarize at least two meaningful updates from the recent news or analyst commentary.
+3️ **Risks & Outlook** — Provide a brief risk analysis and investor outlook based on financial or macro trends.
+
+Use a neutral, professional tone (similar to a Morningstar or Goldman Sachs summary).
+Keep the response under 250 words.
+Do NOT include section headers or markdown symbols — just clean paragraphs separated by a blank line.
+"""
+
+_EMPTY_VALUES = {"", "none", "null", "n/a", "na", "nan", "-", "--"}
+_NAME_SUFFIXES = {"inc", "corp", "corporation", "co", "company", "ltd", "limited", "plc", "group",
+                  "holdings", "class", "the", "com", "sa", "ag", "nv", "llc"}
+_STOPWORDS = {"a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "with", "at", "by", "from",
+              "as", "is", "are", "was", "be", "its", "it", "this", "that", "after", "over", "via", "s"}
+_TAGS = re.compile(r"<[^>]+>")
+_SPACES = re.compile(r"\s+")
+_WORDS = re.compile(r"[a-z0-9]+(?:\.[a-z0-9]+)?")
+_VIA = re.compile(r"^\(via [^)]*\)$", re.IGNORECASE)
+_ESTIMATE = re.compile(r"\w+|[^\w\s]")
+
+
+# ----------------------------
+# Token counting
+# ----------------------------
+_encodings = {}
+_encoding_lock = threading.Lock()
+
+
+def _encoding(model):
+    """tiktoken encoding for `model`, or None when tiktoken or its data is unavailable."""
+    with _encoding_lock:
+        if model not in _encodings:
+            try:
+                import tiktoken
+                try:
+                    _encodings[model] = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    _encodings[model] = tiktoken.get_encoding("o200k_base")
+            except Exception as e:
+                print(f"⚠️ tiktoken unavailable for {model} ({e}); estimating token counts")
+                _encodings[model] = None
+        return _encodings[model]
+
+
+def tokenizer_name(model):
+    encoding = _encoding(model)
+    return f"tiktoken:{encoding.name}" if encoding is not None else "estimate"
+
+
+def count_tokens(text, model):
+    """Tokens in `text` for `model`; a word/punctuation estimate if tiktoken can't load."""
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    # BPE vocabularies keep common words whole and split long ones
+    return sum(1 + len(piece) // 8 for piece in _ESTIMATE.findall(text))
+
+
+# ----------------------------
+# Fundamentals
+# ----------------------------
+def _abbreviate(number):
+    for scale, suffix in ((1e12, "T"), (1e9, "B"), (1e6, "M"), (1e3, "K")):
+        if abs(number) >= scale:
+            return f"{number / scale:.3g}{suffix}"
+    return f"{number:.4g}"
+
+
+def format_value(key, value):
+    """Compact display of one fundamentals value, or None when it is empty."""
+    text = str(value).strip() if value is not None else ""
+    if text.lower() in _EMPTY_VALUES:
+        return None
+    try:
+        number = float(text.replace(",", ""))
+    except ValueError:
+        return text
+    if not math.isfinite(number):
+        return None
+    if "yield" in key.lower() and abs(number) < 1:
+        return f"{number * 100:.2f}%"
+    formatted = _abbreviate(number)
+    if "$" in key:
+        formatted = ("-$" + formatted[1:]) if formatted.startswith("-") else "$" + formatted
+    return formatted
+
+
+def format_fundamentals(fundamentals):
+    """One `Label: value` line per non-empty field; numbers abbreviated (3.45T, 0.44%)."""
+    if not fundamentals or not isinstance(fundamentals, dict):
+        return NO_FUNDAMENTALS
+    lines = []
+    for key, value in fundamentals.items():
+        formatted = format_value(str(key), value)
+        if formatted is not None:
+            lines.append(f"{str(key).replace(' ($)', '').strip()}: {formatted}")
+    return "\n".join(lines) or NO_FUNDAMENTALS
+
+
+# ----------------------------
+# Headlines
+# ----------------------------
+def _clean(text):
+    return _SPACES.sub(" ", html.unescape(_TAGS.sub(" ", text or ""))).strip()
+
+
+def _strip_publisher(title):
+    """Drop Google News' trailing " - Publisher" (same rule as news_client.title_fingerprint)."""
+    head, sep, tail = title.rpartition(" - ")
+    if sep and head and len(tail.split()) <= 4:
+        return head.strip(), tail.strip()
+    return title, None
+
+
+def _words(text):
+    return {w for w in _WORDS.findall(text.lower()) if w not in _STOPWORDS}
+
+
+def _published(value):
+    """Aware datetime from an RSS date or an ISO timestamp; None if missing or unparseable."""
+    if isinstance(value, datetime):
+        parsed = value
+    elif not value:
+        return None
+    else:
+        try:
+            parsed = datetime.fromisoformat(str(value))
+        except ValueError:
+            try:
+                parsed = parsedate_to_datetime(str(value))
+            except (TypeError, ValueError):
+                return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _split_line(line):
+    """
+    A `title: summary` line as the callers used to build them. The summary is
+    only split off where it is recognisable (HTML or a "(via Finviz)" tag), since
+    headlines often contain ": " themselves.
+    """
+    head, sep, tail = line.partition(": <")
+    if sep:
+        return head, "<" + tail
+    head, sep, tail = line.rpartition(": (via ")
+    if sep and tail.endswith(")"):
+        return head, "(via " + tail
+    return line, ""
+
+
+def news_items(news):
+    """
+    Normalize news to dicts with title, summary, source and published. Accepts
+    the news item dicts from news_client or the older newline-joined
+    `title: summary` text.
+    """
+    if not news:
+        return []
+    if isinstance(news, str):
+        items = []
+        for line in news.splitlines():
+            if line.strip():
+                title, summary = _split_line(line.strip())
+                items.append({"title": title, "summary": summary, "source": None, "published": None})
+        return items
+    return [n for n in news if isinstance(n, dict) and n.get("title")]
+
+
+def news_lines(news):
+    """The `title: summary` lines the prompt used to be built from (also the cache key input)."""
+    if isinstance(news, str):
+        return [line.strip() for line in news.splitlines() if line.strip()]
+    return [f"{n['title']}: {n.get('summary') or ''}" for n in news_items(news)]
+
+
+def _relevance(words, ticker_words, name_words):
+    return bool(words & ticker_words) or bool(name_words and name_words <= words)
+
+
+def _company_words(fundamentals):
+    name = (fundamentals or {}).get("Company") if isinstance(fundamentals, dict) else None
+    words = [w for w in _WORDS.findall(str(name or "").lower()) if w not in _NAME_SUFFIXES]
+    return set(words[:1]) if words and len(words[0]) >= 3 else set()
+
+
+def rank_headlines(ticker, news, fundamentals=None, now=None):
+    """
+    Unique stories, best first. Each item is scored by recency (halving every
+    FINGPT_NEWS_HALF_LIFE_HOURS) plus relevance (ticker or company name in the
+    headline: +1, only in the summary: +0.5); near-duplicates of a better
+    item are dropped. Returns (ranked items, number of duplicates dropped).
+    """
+    now = now or datetime.now(timezone.utc)
+    ticker_words = {ticker.strip().lower(), "$" + ticker.strip().lower()}
+    name_words = _company_words(fundamentals)
+    positions = {}
+    candidates = []
+    for item in news_items(news):
+        title, publisher = _strip_publisher(_clean(item["title"]))
+        summary = _clean(item.get("summary"))
+        title_words = _words(title)
+        summary_words = _words(summary) - (_words(publisher) if publisher else set())
+        # Google's summary is the headline again plus the publisher; Finviz has none
+        if _VIA.match(summary) or not summary_words or len(summary_words - title_words) <= 1:
+            summary, summary_words = "", set()
+        elif len(summary.split()) > SUMMARY_MAX_WORDS:
+            summary = " ".join(summary.split()[:SUMMARY_MAX_WORDS]) + "…"
+
+        source = item.get("source")
+        position = positions[source] = positions.get(source, -1) + 1
+        published = _published(item.get("published"))
+        if published is not None:
+            age_hours = max((now - published).total_seconds() / 3600, 0.0)
+        else:
+            age_hours = position * UNDATED_SPACING_HOURS
+        relevance = 1.0 if _relevance(title_words, ticker_words, name_words) else (
+            0.5 if _relevance(summary_words, ticker_words, name_words) else 0.0)
+        candidates.append({
+            "title": title, "summary": summary, "published": published, "words": title_words | summary_words,
+            "score": 0.5 ** (age_hours / RECENCY_HALF_LIFE_HOURS) + relevance,
+        })
+
+    candidates.sort(key=lambda c: -c["score"])
+    kept = []
+    for candidate in candidates:
+        if any(len(candidate["words"] & k["words"]) / max(len(candidate["words"] | k["words"]), 1)
+               >= SIMILARITY_THRESHOLD for k in kept):
+            continue
+        kept.append(candidate)
+    return kept, len(candidates) - len(kept)
+
+
+def headline_line(item):
+    date = f"{item['published']:%b} {item['published'].day}: " if item["published"] is not None else ""
+    return f"- {date}{item['title']}" + (f" — {item['summary']}" if item["summary"] else "")
+
+
+# ----------------------------
+# Prompts
+# ----------------------------
+_totals = {"prompts": 0, "tokens": 0, "baseline_tokens": 0}
+_totals_lock = threading.Lock()
+
+
+def legacy_prompt(ticker, fundamentals, news):
+    """The prompt as it was built before compaction: every field, news cut at 2000 characters."""
+    if fundamentals and isinstance(fundamentals, dict) and len(fundamentals) > 0:
+        fundamentals_text = "\n".join([f"{k}: {v}" for k, v in fundamentals.items()])
+    else:
+        fundamentals_text = NO_FUNDAMENTALS
+    news_text = "\n".join(news_lines(news))
+    return PROMPT_TEMPLATE.format(ticker=ticker, fundamentals=fundamentals_text,
+                                  news=news_text[:LEGACY_NEWS_CHARS] if news_text else NO_NEWS)
+
+
+def build(ticker, fundamentals, news, model, budget=None):
+    """
+    Compact prompt for `ticker` within `budget` tokens (default
+    FINGPT_PROMPT_TOKENS). Returns (prompt, report); the report has the token
+    count, the tokens saved against `legacy_prompt`, and how many headlines
+    were received, dropped as duplicates and used.
+    """
+    budget = PROMPT_TOKEN_BUDGET if budget is None else budget
+    with span("prompt.build"):
+        fundamentals_text = format_fundamentals(fundamentals)
+        ranked, duplicates = rank_headlines(ticker, news, fundamentals)
+        frame = PROMPT_TEMPLATE.format(ticker=ticker, fundamentals=fundamentals_text, news="")
+        available = budget - count_tokens(frame, model)
+        lines = []
+        for item in ranked:
+            line = headline_line(item)
+            cost = count_tokens(line, model) + 1
+            if cost > available and item["summary"]:
+                line = headline_line(dict(item, summary=""))
+                cost = count_tokens(line, model) + 1
+            if cost <= available:
+                lines.append(line)
+                available -= cost
+        prompt = PROMPT_TEMPLATE.format(ticker=ticker, fundamentals=fundamentals_text,
+                                        news="\n".join(lines) if lines else NO_NEWS)
+        tokens = count_tokens(prompt, model)
+        baseline = count_tokens(legacy_prompt(ticker, fundamentals, news), model)
+
+    report = {
+        "tokens": tokens,
+        "baseline_tokens": baseline,
+        "saved": baseline - tokens,
+        "headlines": len(news_items(news)),
+        "duplicates": duplicates,
+        "used": len(lines),
+        "tokenizer": tokenizer_name(model),
+    }
+    with _totals_lock:
+        _totals["prompts"] += 1
+        _totals["tokens"] += tokens
+        _totals["baseline_tokens"] += baseline
+    return prompt, report
+
+
+def totals():
+    with _totals_lock:
+        return dict(_totals)
+
+
+def _prompt_metrics():
+    t = totals()
+    return [
+        ("fingpt_prompts_total", {}, t["prompts"], "counter"),
+        ("fingpt_prompt_tokens_total", {"kind": "sent"}, t["tokens"], "counter"),
+        ("fingpt_prompt_tokens_total", {"kind": "baseline"}, t["baseline_tokens"], "counter"),
+    ]
+
+
+register_collector(_prompt_metrics)
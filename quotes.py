@@ -0,0 +1,108 @@
+# quotes.py
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from instrumentation import span
+
+# Last prices are reused for this many seconds so Streamlit reruns don't re-hit Yahoo.
+QUOTE_TTL = float(os.getenv("QUOTE_TTL_SECONDS", "60"))
+# yf.download URLs get unwieldy past a few hundred symbols, so large books are split.
+CHUNK_SIZE = int(os.getenv("QUOTE_CHUNK_SIZE", "100"))
+
+_price_cache = {}  # ticker -> (price, fetched_at)
+_cache_lock = threading.Lock()
+
+
+# ----------------------------
+# Batched download
+# ----------------------------
+def _download_closes(tickers):
+    """Download recent daily closes for many tickers in one request.
+
+    Returns a DataFrame indexed by date with one column per ticker.
+    """
+    data = yf.download(
+        tickers,
+        period="5d",  # covers weekends and market holidays
+        interval="1d",
+        group_by="column",
+        auto_adjust=False,
+        threads=True,
+        progress=False,
+    )
+    if data is None or data.empty:
+        return pd.DataFrame(columns=tickers)
+
+    if isinstance(data.columns, pd.MultiIndex):
+        closes = data["Close"]
+    else:
+        closes = data[["Close"]].rename(columns={"Close": tickers[0]})
+    return closes
+
+
+def _fetch_prices(tickers):
+    """Fetch last closes for `tickers`, chunked. Returns {ticker: price} for successes."""
+    prices = {}
+    for start in range(0, len(tickers), CHUNK_SIZE):
+        chunk = tickers[start:start + CHUNK_SIZE]
+        try:
+            with span("yfinance.download") as s:
+                s.set(items=len(chunk))
+                closes = _download_closes(chunk)
+        except Exception as e:
+            print(f"❌ Batch quote download failed for {len(chunk)} tickers: {e}")
+            continue
+
+        last = closes.ffill().iloc[-1] if not closes.empty else pd.Series(dtype=float)
+        for ticker in chunk:
+            price = last.get(ticker, np.nan)
+            if pd.notna(price):
+                prices[ticker] = float(price)
+    return prices
+
+
+# ----------------------------
+# Public API
+# ----------------------------
+def get_last_prices(tickers, ttl=None):
+    """Resolve last prices for `tickers` in as few round trips as possible.
+
+    Returns `(prices, failed)` where `prices` is a float array aligned with
+    `tickers` (NaN where no quote was found) and `failed` lists the tickers
+    that could not be priced.
+    """
+    ttl = QUOTE_TTL if ttl is None else ttl
+    tickers = [t.strip().upper() for t in tickers]
+    now = time.time()
+
+    resolved = {}
+    with _cache_lock:
+        for ticker in set(tickers):
+            cached = _price_cache.get(ticker)
+            if cached and now - cached[1] < ttl:
+                resolved[ticker] = cached[0]
+
+    missing = sorted(set(tickers) - set(resolved))
+    with span("quotes.last_prices") as s:
+        s.set(items=len(tickers), cache="miss" if missing else "hit")
+        if missing:
+            fetched = _fetch_prices(missing)
+            with _cache_lock:
+                for ticker, price in fetched.items():
+                    _price_cache[ticker] = (price, now)
+            resolved.update(fetched)
+
+    prices = np.array([resolved.get(t, np.nan) for t in tickers], dtype=float)
+    failed = [t for t in dict.fromkeys(tickers) if t not in resolved]
+    return prices, failed
+
+
+def clear_price_cache():
+    """Drop all cached last prices."""
+    with _cache_lock:
+        _price_cache.clear()
@@ -0,0 +1,350 @@
+# rules.py
+"""
+Incremental alert rules with per-rule state, stored in SQLite.
+
+A rule watches one input of one ticker for one recipient. The kinds are
+sentiment score, price move % over N days, RSI band and position P/L %.
+Each rule row remembers the fingerprint of the input it last saw, whether
+it is currently breached, its last value and when it last fired.
+
+`evaluate()` takes the current inputs as ``{(input, ticker): (fingerprint,
+value)}`` and only looks at rules whose stored fingerprint differs. The
+work done grows with the number of changed inputs, not rules x tickers.
+
+A rule alerts when it starts breaching its threshold. It stays quiet while
+the breach lasts and re-arms only after the value recovers past the
+threshold by `hysteresis`. Alerts within `cooldown_hours` of the previous
+one are suppressed. Callers merge each recipient's alerts into one email
+(render_alerts).
+
+Rules are owned by a `source` (the job that syncs them, e.g. "monitor" or
+"alert_job"), so two jobs alerting the same address keep separate rule sets.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from history_store import read_closes, version
+from indicators import RSI_PERIOD, rsi
+from instrumentation import span
+
+RULES_DB = os.getenv("FINGPT_RULES_DB", os.path.join(".cache", "rules.sqlite3"))
+COOLDOWN_HOURS = float(os.getenv("FINGPT_RULE_COOLDOWN_HOURS", "24"))
+DEFAULT_SOURCE = "default"
+
+# kind -> input it reads and its defaults; `below`/`above` are the breach
+# thresholds (value <= below or value >= above), `hysteresis` the recovery margin
+KINDS = {
+    "sentiment": {"input": "sentiment", "below": -0.5, "above": None, "hysteresis": 0.1},
+    "price_move": {"input": "closes", "below": -5.0, "above": 5.0, "hysteresis": 1.0, "days": 1},
+    "rsi": {"input": "closes", "below": 30.0, "above": 70.0, "hysteresis": 5.0, "period": RSI_PERIOD},
+    "drawdown": {"input": "position", "below": -10.0, "above": None, "hysteresis": 2.0},
+}
+
+_COLUMNS = ("id", "source", "recipient", "kind", "ticker", "input", "below", "above", "hysteresis", "cooldown_hours",
+            "params", "fingerprint", "active", "value", "evaluated_at", "fired_at")
+
+
+def _row(row):
+    rule = dict(zip(_COLUMNS, row))
+    rule["params"] = json.loads(rule["params"]) if rule["params"] else {}
+    rule["active"] = bool(rule["active"])
+    return rule
+
+
+def _fingerprint(value):
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+# ----------------------------
+# Rule specs
+# ----------------------------
+def expand_spec(spec):
+    """
+    One rule per ticker from a spec such as ``{"kind": "rsi", "tickers":
+    ["AAPL"], "above": 75}``; omitted fields take the kind's defaults.
+    Returns a list of rule dicts (unknown kinds are skipped with a warning).
+    """
+    kind = spec.get("kind")
+    if kind not in KINDS:
+        print(f"⚠️ Unknown alert rule kind: {kind!r}")
+        return []
+    defaults = KINDS[kind]
+    tickers = spec.get("tickers") or [spec.get("ticker")]
+    if isinstance(tickers, str):
+        tickers = tickers.split(",")
+    params = {k: spec.get(k, defaults[k]) for k in ("days", "period") if k in defaults}
+    rules = []
+    for ticker in dict.fromkeys(t.strip().upper() for t in tickers if t and t.strip()):
+        rules.append({
+            "kind": kind, "ticker": ticker, "input": defaults["input"],
+            "below": spec.get("below", defaults["below"]), "above": spec.get("above", defaults["above"]),
+            "hysteresis": float(spec.get("hysteresis", defaults["hysteresis"])),
+            "cooldown_hours": float(spec.get("cooldown_hours", COOLDOWN_HOURS)), "params": params,
+        })
+    return rules
+
+
+def _signature(rule):
+    return _fingerprint([rule[k] for k in ("kind", "ticker", "below", "above", "hysteresis", "cooldown_hours", "params")])
+
+
+def parse_specs(raw):
+    """Rule specs from a list or a JSON string (e.g. a user_configs column); [] when unusable."""
+    if not raw:
+        return []
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except ValueError as e:
+            print(f"⚠️ Ignoring malformed alert rules: {e}")
+            return []
+    return [spec for spec in raw if isinstance(spec, dict)]
+
+
+# ----------------------------
+# Rule values
+# ----------------------------
+def _rule_value(rule, data, memo):
+    """The number a rule compares against its thresholds, or None if it can't be computed yet."""
+    kind, params = rule["kind"], rule["params"]
+    if kind == "sentiment":
+        return None if data is None else float(data)
+    if kind == "drawdown":
+        price, buy_price = data
+        return 100.0 * (price / buy_price - 1) if price and buy_price and buy_price > 0 else None
+
+    closes = data
+    if kind == "price_move":
+        days = int(params.get("days", 1))
+        if len(closes) <= days or not closes[-1 - days]:
+            return None
+        return 100.0 * (closes[-1] / closes[-1 - days] - 1)
+    period = int(params.get("period", RSI_PERIOD))
+    key = ("rsi", rule["ticker"], period)
+    if key not in memo:
+        # Several RSI rules on one ticker share one pass over its closes
+        memo[key] = float(rsi(closes, period)[-1]) if len(closes) > period else float("nan")
+    return None if np.isnan(memo[key]) else memo[key]
+
+
+def breached(rule, value, active):
+    """New breach state with hysteresis: entering needs the threshold, leaving needs threshold +/- hysteresis."""
+    below, above, margin = rule["below"], rule["above"], rule["hysteresis"]
+    if (below is not None and value <= below) or (above is not None and value >= above):
+        return True
+    if not active:
+        return False
+    return (below is not None and value <= below + margin) or (above is not None and value >= above - margin)
+
+
+def describe(alert):
+    """One digest line for an alert."""
+    value, rule = alert["value"], alert["rule"]
+    side = "at or below" if rule["below"] is not None and value <= rule["below"] else "at or above"
+    limit = rule["below"] if side == "at or below" else rule["above"]
+    if rule["kind"] == "sentiment":
+        return f"{rule['ticker']} — sentiment {value:+.2f} ({side} {limit:+.2f})"
+    if rule["kind"] == "price_move":
+        days = rule["params"].get("days", 1)
+        return f"{rule['ticker']} — moved {value:+.1f}% over {days} day(s) ({side} {limit:+.1f}%)"
+    if rule["kind"] == "rsi":
+        return f"{rule['ticker']} — RSI {value:.0f} ({side} {limit:.0f})"
+    return f"{rule['ticker']} — position P/L {value:+.1f}% ({side} {limit:+.1f}%)"
+
+
+# ----------------------------
+# Store / engine
+# ----------------------------
+class RuleEngine:
+    def __init__(self, path=RULES_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS rules ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, source TEXT NOT NULL, recipient TEXT NOT NULL,"
+                " kind TEXT NOT NULL,"
+                " ticker TEXT NOT NULL, input TEXT NOT NULL, below REAL, above REAL, hysteresis REAL NOT NULL,"
+                " cooldown_hours REAL NOT NULL, params TEXT, signature TEXT NOT NULL, fingerprint TEXT,"
+                " active INTEGER NOT NULL DEFAULT 0, value REAL, evaluated_at REAL, fired_at REAL,"
+                " UNIQUE (source, recipient, signature))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS rules_input ON rules (input, ticker)")
+
+    def sync(self, rules_by_recipient, source=DEFAULT_SOURCE):
+        """
+        Make each recipient's stored rules from `source` match
+        ``{recipient: [spec, ...]}``; other sources' rules for the same
+        recipient are untouched. Rules that didn't change keep their state;
+        new ones are evaluated on the next run, removed ones are deleted.
+        Returns (added, removed).
+        """
+        added = removed = 0
+        with self._lock, self._conn:
+            for recipient, specs in rules_by_recipient.items():
+                wanted = {}
+                for spec in specs:
+                    for rule in expand_spec(spec):
+                        wanted[_signature(rule)] = rule
+                existing = {sig: rule_id for rule_id, sig in self._conn.execute(
+                    "SELECT id, signature FROM rules WHERE source = ? AND recipient = ?", (source, recipient))}
+                stale = [(existing[sig],) for sig in existing.keys() - wanted.keys()]
+                self._conn.executemany("DELETE FROM rules WHERE id = ?", stale)
+                self._conn.executemany(
+                    "INSERT INTO rules (source, recipient, kind, ticker, input, below, above, hysteresis,"
+                    " cooldown_hours, params, signature) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(source, recipient, r["kind"], r["ticker"], r["input"], r["below"], r["above"], r["hysteresis"],
+                      r["cooldown_hours"], json.dumps(r["params"]), sig)
+                     for sig, r in wanted.items() if sig not in existing],
+                )
+                added += len(wanted.keys() - existing.keys())
+                removed += len(stale)
+        return added, removed
+
+    def rules(self, recipient=None, source=None):
+        filters = {"recipient": recipient, "source": source}
+        where = [f"{column} = ?" for column, value in filters.items() if value is not None]
+        query = f"SELECT {', '.join(_COLUMNS)} FROM rules"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        params = [value for value in filters.values() if value is not None]
+        with self._lock:
+            return [_row(r) for r in self._conn.execute(query + " ORDER BY id", params)]
+
+    def evaluate(self, inputs, recipients=None, now=None, commit=True, source=DEFAULT_SOURCE):
+        """
+        Evaluate the rules whose input changed since they last saw it.
+        `inputs` is ``{(input, ticker): (fingerprint, value)}``; `value` may
+        be a zero-argument callable, called only if some rule needs it. With
+        `recipients`, other recipients' rules are left for their own run;
+        only `source`'s rules are looked at; with `commit=False` (dry runs) rule state is not updated.
+        Returns (alerts, stats); each alert is {"recipient", "rule", "value"}.
+        """
+        now = time.time() if now is None else now
+        started = time.perf_counter()
+        stats = {"inputs": len(inputs), "changed_inputs": 0, "evaluated": 0, "fired": 0, "suppressed": 0,
+                 "cleared": 0}
+        recipient_filter, recipient_params = " AND source = ?", [source]
+        if recipients is not None:
+            recipients = list(recipients)
+            if not recipients:
+                return [], stats
+            recipient_filter += f" AND recipient IN ({','.join('?' * len(recipients))})"
+            recipient_params += recipients
+
+        alerts, updates, memo = [], [], {}
+        with span("rules.evaluate") as s, self._lock:
+            for (name, ticker), (fingerprint, value) in inputs.items():
+                fingerprint = _fingerprint(fingerprint)
+                rows = self._conn.execute(
+                    f"SELECT {', '.join(_COLUMNS)} FROM rules WHERE input = ? AND ticker = ?"
+                    " AND fingerprint IS NOT ?" + recipient_filter,
+                    [name, ticker, fingerprint] + recipient_params,
+                ).fetchall()
+                if not rows:
+                    continue
+                stats["changed_inputs"] += 1
+                if callable(value):
+                    value = value()
+                for rule in map(_row, rows):
+                    stats["evaluated"] += 1
+                    current = _rule_value(rule, value, memo) if value is not None else None
+                    active, fired_at = rule["active"], rule["fired_at"]
+                    if current is not None:
+                        active = breached(rule, current, rule["active"])
+                        if active and not rule["active"]:
+                            if fired_at is None or now - fired_at >= rule["cooldown_hours"] * 3600:
+                                alerts.append({"recipient": rule["recipient"], "rule": rule, "value": current})
+                                fired_at = now
+                                stats["fired"] += 1
+                            else:
+                                stats["suppressed"] += 1
+                        elif rule["active"] and not active:
+                            stats["cleared"] += 1
+                    updates.append((fingerprint, int(active), current, now, fired_at, rule["id"]))
+            s.set(items=stats["evaluated"])
+            if not commit:
+                updates = []
+            with self._conn:
+                self._conn.executemany(
+                    "UPDATE rules SET fingerprint = ?, active = ?, value = COALESCE(?, value), evaluated_at = ?,"
+                    " fired_at = ? WHERE id = ?",
+                    updates,
+                )
+        stats["seconds"] = round(time.perf_counter() - started, 4)
+        return alerts, stats
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = RuleEngine()
+        return _engine
+
+
+# ----------------------------
+# Inputs
+# ----------------------------
+def sentiment_inputs(results):
+    """Inputs from pipeline results (tickers without a score are left out)."""
+    return {
+        ("sentiment", r["ticker"]): (round(r["score"], 4), r["score"])
+        for r in results if r.get("score") is not None
+    }
+
+
+def close_inputs(tickers):
+    """Inputs from the history store; only the file stamp is read unless a rule needs the closes."""
+    inputs = {}
+    for ticker in dict.fromkeys(t.strip().upper() for t in tickers if t):
+        stamp = version(ticker)
+        if stamp is not None:
+            inputs[("closes", ticker)] = (stamp, lambda t=ticker: read_closes(t)[1])
+    return inputs
+
+
+def position_inputs(df):
+    """Inputs from a valued portfolio (value_holdings' DataFrame): current price and cost basis."""
+    inputs = {}
+    for ticker, price, buy_price in zip(df["Ticker"], df["Current Price ($)"], df["Buy Price ($)"]):
+        if np.isnan(price) or buy_price <= 0:
+            continue
+        inputs[("position", ticker)] = ([float(price), float(buy_price)], (float(price), float(buy_price)))
+    return inputs
+
+
+# ----------------------------
+# Digests
+# ----------------------------
+def render_alerts(alerts, notes=None):
+    """
+    Digest section for one recipient's alerts, in the order they fired.
+    `notes` ({ticker: text}) is appended under sentiment alerts, e.g. the
+    summary behind the score.
+    """
+    if not alerts:
+        return ""
+    lines = []
+    for alert in alerts:
+        line = describe(alert)
+        note = (notes or {}).get(alert["rule"]["ticker"]) if alert["rule"]["kind"] == "sentiment" else None
+        if note:
+            line += f"\n{note[:400]}..."
+        lines.append(line)
+    return "\n🚨 New Alerts\n\n" + "\n\n".join(lines) + "\n"
+
@@ -0,0 +1,112 @@
+# sentiment.py
+import re
+
+import numpy as np
+
+# Weighted lexicons; inflected forms are listed explicitly so a plain
+# token -> weight lookup covers them.
+POSITIVE = {
+    "growth": 1.0, "growing": 0.8, "grew": 0.8,
+    "strong": 1.0, "stronger": 1.0, "strength": 0.8,
+    "beat": 1.2, "beats": 1.2, "topped": 1.0,
+    "bullish": 1.5, "outperform": 1.2, "outperformed": 1.2,
+    "upgrade": 1.2, "upgraded": 1.2, "upgrades": 1.2,
+    "improved": 0.8, "improving": 0.8, "improvement": 0.8,
+    "upside": 1.0, "profit": 0.6, "profitable": 0.8, "profitability": 0.6,
+    "resilient": 0.8, "momentum": 0.7, "record": 0.6, "rally": 1.0, "rallied": 1.0,
+    "surge": 1.0, "surged": 1.0, "soar": 1.2, "soared": 1.2, "gain": 0.6, "gains": 0.6,
+    "robust": 0.8, "expansion": 0.5, "tailwind": 0.8, "tailwinds": 0.8, "raised guidance": 1.2,
+}
+NEGATIVE = {
+    "decline": 1.0, "declined": 1.0, "declining": 1.0, "declines": 1.0,
+    "weak": 1.0, "weaker": 1.0, "weakness": 1.0, "weakening": 1.0,
+    "bearish": 1.5, "underperform": 1.2, "underperformed": 1.2,
+    "loss": 1.0, "losses": 1.0, "miss": 1.0, "missed": 1.0, "misses": 1.0,
+    "downgrade": 1.2, "downgraded": 1.2, "downgrades": 1.2,
+    "headwind": 0.8, "headwinds": 0.8, "slowdown": 0.9, "slowing": 0.7,
+    "risk": 0.4, "risks": 0.4, "uncertainty": 0.5, "volatility": 0.3,
+    "plunge": 1.3, "plunged": 1.3, "drop": 0.8, "dropped": 0.8, "fell": 0.8, "slump": 1.0,
+    "lawsuit": 0.8, "investigation": 0.8, "recall": 0.8, "layoffs": 0.8,
+    "cut guidance": 1.2, "lowered guidance": 1.2, "warning": 0.8,
+}
+NEGATORS = (
+    "not", "no", "never", "without", "neither", "nor", "cannot",
+    "isn't", "wasn't", "aren't", "weren't", "didn't", "doesn't", "don't", "won't",
+    "lack", "lacks", "lacking", "fails", "failed",
+)
+# A negator flips the polarity of lexicon hits in the next few words of the same clause.
+NEGATION_WINDOW = 3
+NEGATION_DAMPING = 0.75
+# Scores within ±NEUTRAL_BAND are labelled neutral.
+NEUTRAL_BAND = 0.15
+
+_WEIGHTS = {**POSITIVE, **{term: -weight for term, weight in NEGATIVE.items()}}
+_NEGATORS = frozenset(NEGATORS)
+_BIGRAMS = {tuple(term.split()): weight for term, weight in _WEIGHTS.items() if " " in term}
+_BIGRAM_HEADS = frozenset(head for head, _ in _BIGRAMS)
+_CLAUSE_BREAKS = frozenset(".;!?\n\x00")
+
+# One compiled tokenizer: words (with contractions) and clause-breaking punctuation.
+_TOKEN = re.compile(r"[a-z]+(?:'[a-z]+)?|[.;!?\n\x00]")
+_SEPARATOR = "\n\x00\n"
+
+
+def _scan(texts):
+    """
+    Tokenize all `texts` in one regex pass, look every token up in the
+    weighted lexicon, and apply negation windows as array operations.
+
+    Returns (positive, negative) weight totals per text.
+    """
+    tokens = _TOKEN.findall(_SEPARATOR.join(texts).lower())
+    n = len(tokens)
+    weights = np.fromiter((_WEIGHTS.get(t, 0.0) for t in tokens), dtype=float, count=n)
+    for i in (i for i, t in enumerate(tokens[:-1]) if t in _BIGRAM_HEADS):
+        weight = _BIGRAMS.get((tokens[i], tokens[i + 1]))
+        if weight is not None:
+            weights[i] = weight
+            weights[i + 1] = 0.0
+
+    index = np.arange(n)
+    is_negator = np.fromiter((t in _NEGATORS for t in tokens), dtype=bool, count=n)
+    is_break = np.fromiter((t in _CLAUSE_BREAKS for t in tokens), dtype=bool, count=n)
+    last_negator = np.maximum.accumulate(np.where(is_negator, index, -1)) if n else index
+    last_break = np.maximum.accumulate(np.where(is_break, index, -1)) if n else index
+    negated = (last_negator >= 0) & (last_negator > last_break) & (index - last_negator <= NEGATION_WINDOW)
+    weights = np.where(negated, -weights * NEGATION_DAMPING, weights)
+
+    doc = np.cumsum(np.fromiter((t == "\x00" for t in tokens), dtype=bool, count=n))
+    positive = np.bincount(doc, weights=np.clip(weights, 0, None), minlength=len(texts))
+    negative = np.bincount(doc, weights=np.clip(-weights, 0, None), minlength=len(texts))
+    return positive[:len(texts)], negative[:len(texts)]
+
+
+def _to_score(positive, negative):
+    # Bounded in (-1, 1); the +1 keeps a single mild hit from reading as extreme
+    return (positive - negative) / (positive + negative + 1.0)
+
+
+def sentiment_score(text):
+    """Continuous sentiment score in [-1, 1] for one text."""
+    if not text:
+        return 0.0
+    positive, negative = _scan([text])
+    return float(_to_score(positive, negative)[0])
+
+
+def score_batch(texts):
+    """Score many texts in one tokenizer pass; returns a float array aligned with `texts`."""
+    texts = [t or "" for t in texts]
+    if not texts:
+        return np.zeros(0)
+    positive, negative = _scan(texts)
+    return _to_score(positive, negative)
+
+
+def label(score):
+    """Map a score to "positive" / "neutral" / "negative"."""
+    if score > NEUTRAL_BAND:
+        return "positive"
+    if score < -NEUTRAL_BAND:
+        return "negative"
+    return "neutral"
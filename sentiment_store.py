@@ -0,0 +1,226 @@
+# sentiment_store.py
+"""
+Append-only log of every sentiment score, plus vectorized queries over it.
+
+Each observation is one fixed-size binary record (timestamp, ticker, score,
+source) appended to FINGPT_SENTIMENT_LOG with a single write, so the web app,
+the alert jobs and the warmer can all append to the same file. Readers keep
+the decoded records in memory and only read bytes appended since their last
+call.
+
+Queries turn the log into a ``(trading days, tickers)`` matrix aligned with
+analytics.price_matrix and compute correlations from windowed sums, so the
+whole portfolio is handled in a few array passes.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from analytics import price_matrix
+
+SENTIMENT_LOG = os.getenv("FINGPT_SENTIMENT_LOG", os.path.join(".cache", "sentiment.bin"))
+RECORD = np.dtype([("ts", "<f8"), ("ticker", "S12"), ("score", "<f4"), ("source", "S12")])
+DAY_SECONDS = 86400
+
+
+class SentimentStore:
+    def __init__(self, path=SENTIMENT_LOG):
+        self.path = path
+        self._records = np.empty(0, dtype=RECORD)
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def append(self, rows):
+        """Append (ticker, score, source[, ts]) tuples; rows with no score are skipped."""
+        now = time.time()
+        records = np.array([
+            (row[3] if len(row) > 3 and row[3] is not None else now,
+             row[0].strip().upper().encode()[:12], row[1], str(row[2]).encode()[:12])
+            for row in rows if row[1] is not None
+        ], dtype=RECORD)
+        if not len(records):
+            return 0
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # One O_APPEND write per batch keeps concurrent writers from interleaving records
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, records.tobytes())
+        finally:
+            os.close(fd)
+        return len(records)
+
+    def records(self):
+        """Every record so far; only bytes appended since the last call are read."""
+        with self._lock:
+            try:
+                size = os.path.getsize(self.path)
+            except OSError:
+                return self._records
+            if size < self._offset:
+                # Log was replaced; start over
+                self._records, self._offset = np.empty(0, dtype=RECORD), 0
+            complete = size - (size - self._offset) % RECORD.itemsize
+            if complete > self._offset:
+                with open(self.path, "rb") as f:
+                    f.seek(self._offset)
+                    fresh = np.frombuffer(f.read(complete - self._offset), dtype=RECORD)
+                self._records = np.concatenate([self._records, fresh])
+                self._offset = complete
+            return self._records
+
+    def history(self, ticker):
+        """Raw observations for one ticker as a DataFrame (time, score, source)."""
+        records = self.records()
+        rows = records[records["ticker"] == ticker.strip().upper().encode()]
+        return pd.DataFrame({
+            "score": rows["score"].astype(float),
+            "source": rows["source"].astype(str),
+        }, index=pd.to_datetime(rows["ts"], unit="s", utc=True).rename("time"))
+
+    def matrix(self, tickers, days):
+        """
+        Mean score per (trading day, ticker), NaN where nothing was recorded.
+        A score recorded on a non-trading day counts toward the next trading day.
+        """
+        records = self.records()
+        out = np.full((len(days), len(tickers)), np.nan)
+        if not len(records) or not len(days):
+            return out
+        codes = np.array([t.encode() for t in tickers], dtype="S12")
+        order = np.argsort(codes)
+        pos = np.searchsorted(codes[order], records["ticker"])
+        pos = np.minimum(pos, len(codes) - 1)
+        known = codes[order][pos] == records["ticker"]
+        rows = np.searchsorted(days, (records["ts"] // DAY_SECONDS).astype(np.int64), side="left")
+        keep = known & (rows < len(days))
+        cells = rows[keep] * len(tickers) + order[pos[keep]]
+        sums = np.bincount(cells, weights=records["score"][keep], minlength=out.size).reshape(out.shape)
+        counts = np.bincount(cells, minlength=out.size).reshape(out.shape)
+        np.divide(sums, counts, out=out, where=counts > 0)
+        return out
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SentimentStore()
+        return _store
+
+
+def record(ticker, score, source):
+    """Log one sentiment score."""
+    return record_many([(ticker, score, source)])
+
+
+def record_many(rows):
+    """Log many (ticker, score, source) scores in one append; never raises."""
+    try:
+        return get_store().append(rows)
+    except Exception as e:
+        print(f"⚠️ Could not record sentiment: {e}")
+        return 0
+
+
+# ----------------------------
+# Vectorized statistics
+# ----------------------------
+def _trailing(x, window):
+    """Sum over a trailing `window` of rows (rows before the first full window use what exists)."""
+    c = np.cumsum(np.vstack([np.zeros((1,) + x.shape[1:]), x]), axis=0)
+    start = np.maximum(np.arange(1, len(x) + 1) - window, 0)
+    return c[1:] - c[start]
+
+
+def _corr_from_sums(n, sx, sy, sxx, syy, sxy, min_pairs):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = sxy - sx * sy / n
+        vx = sxx - sx * sx / n
+        vy = syy - sy * sy / n
+        corr = cov / np.sqrt(vx * vy)
+    return np.where((n >= min_pairs) & (vx > 0) & (vy > 0), corr, np.nan)
+
+
+def _pair_sums(x, y):
+    """Per-cell count and moment terms over the positions where both x and y exist."""
+    both = np.isfinite(x) & np.isfinite(y)
+    x0, y0 = np.where(both, x, 0.0), np.where(both, y, 0.0)
+    return [both.astype(float), x0, y0, x0 * x0, y0 * y0, x0 * y0]
+
+
+def _aligned(tickers):
+    matrix = price_matrix(tickers)
+    days, prices, _, _ = matrix.snapshot()
+    return days, prices, get_store().matrix(tickers, days)
+
+
+def rolling_correlation(tickers, horizon=5, window=60, min_pairs=10):
+    """
+    Rolling correlation between a day's sentiment and the next `horizon`-day
+    return, per ticker and pooled across all tickers. Returns
+    {"tickers": DataFrame (date × ticker), "portfolio": Series}.
+    """
+    tickers = list(dict.fromkeys(t.strip().upper() for t in tickers))
+    days, prices, sentiment = _aligned(tickers)
+    index = pd.DatetimeIndex(days.astype("datetime64[D]"), name="date")
+    if len(days) <= horizon:
+        return {"tickers": pd.DataFrame(index=index, columns=tickers, dtype=float), "portfolio": pd.Series(dtype=float)}
+
+    forward = np.full_like(prices, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        forward[:-horizon] = prices[horizon:] / prices[:-horizon] - 1
+    sums = [_trailing(s, window) for s in _pair_sums(sentiment, forward)]
+    per_ticker = _corr_from_sums(*sums, min_pairs)
+    pooled = _corr_from_sums(*[s.sum(axis=1) for s in sums], min_pairs)
+    return {
+        "tickers": pd.DataFrame(per_ticker, index=index, columns=tickers),
+        "portfolio": pd.Series(pooled, index=index, name="portfolio"),
+    }
+
+
+def lead_lag(tickers, max_lag=10, min_pairs=10):
+    """
+    Correlation of sentiment on day t with the daily return on day t + lag,
+    for lag in [-max_lag, max_lag] (positive: sentiment leads price). Returns a
+    DataFrame indexed by lag with the pooled correlation, the median
+    per-ticker correlation and the number of pairs.
+    """
+    tickers = list(dict.fromkeys(t.strip().upper() for t in tickers))
+    days, prices, sentiment = _aligned(tickers)
+    returns = np.full_like(prices, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns[1:] = prices[1:] / prices[:-1] - 1
+
+    # Sentiment is sparse: work on the observed (day, ticker) cells and gather
+    # the lagged return for each, instead of shifting the whole matrix
+    obs_rows, obs_cols = np.nonzero(np.isfinite(sentiment))
+    scores = sentiment[obs_rows, obs_cols]
+    n_tickers = len(tickers)
+    rows = []
+    for lag in range(-max_lag, max_lag + 1):
+        target = obs_rows + lag
+        inside = (target >= 0) & (target < len(returns))
+        x, cols = scores[inside], obs_cols[inside]
+        y = returns[target[inside], cols]
+        both = np.isfinite(y)
+        x, y, cols = x[both], y[both], cols[both]
+        sums = [np.bincount(cols, weights=w, minlength=n_tickers)
+                for w in (np.ones_like(x), x, y, x * x, y * y, x * y)]
+        per_ticker = _corr_from_sums(*sums, min_pairs)
+        pooled = _corr_from_sums(*[s.sum() for s in sums], min_pairs)
+        rows.append({
+            "lag": lag,
+            "correlation": float(pooled),
+            "median_ticker_correlation": float(np.nanmedian(per_ticker)) if np.isfinite(per_ticker).any() else np.nan,
+            "pairs": int(sums[0].sum()),
+        })
+    return pd.DataFrame(rows).set_index("lag")
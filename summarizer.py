@@ -1,82 +1,180 @@
 # summarizer.py
 import os
-from openai import OpenAI
+import threading
 from dotenv import load_dotenv
+from cache import get_cache, join_flight, land_flight, make_key, single_flight
+import time
+from instrumentation import observe, span
+import prompt_builder
+from prompt_builder import news_lines
+from sentiment import label, sentiment_score
 
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+MODEL = "gpt-4o-mini"
+# Bump whenever the prompt (prompt_builder.py) changes so cached summaries are regenerated.
+PROMPT_VERSION = 2
+FALLBACK_SUMMARY = "AI summary unavailable — check your OpenAI API key or network connection."
+# Last item of a summarize_text_stream that broke off after some text was sent
+STREAM_INCOMPLETE = object()
 
-def summarize_text(ticker, fundamentals, news_text):
-    """
-    Generate a structured 3-paragraph equity summary:
-    Overview
-    Recent Developments
-    Risks & Outlook
-    """
-    
-    # Handle None or empty fundamentals
-    if fundamentals and isinstance(fundamentals, dict) and len(fundamentals) > 0:
-        fundamentals_text = "\n".join([f"{k}: {v}" for k, v in fundamentals.items()])
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """OpenAI client, created on first use and shared by the whole process."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            # The SDK takes most of a second to import; only pay for it when a summary is generated
+            from openai import OpenAI
+            _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return _client
+
+
+def summary_cache_key(ticker, fundamentals, news):
+    """Content hash of everything that determines a summary."""
+    if fundamentals and isinstance(fundamentals, dict):
+        fundamentals_part = sorted((str(k).strip(), str(v).strip()) for k, v in fundamentals.items())
     else:
-        fundamentals_text = "Fundamental data not available."
+        fundamentals_part = []
+    # Same headlines in a different order (or repeated) are the same news set
+    news_part = sorted(set(news_lines(news)))
+    return make_key(MODEL, PROMPT_VERSION, prompt_builder.PROMPT_TOKEN_BUDGET, ticker.strip().upper(),
+                    fundamentals_part, news_part)
 
-    prompt = f"""
-You are a professional equity research analyst.
 
-Write a concise, structured 3-paragraph summary of the stock **{ticker}** based on its fundamentals and recent market/news context.
+def build_prompt(ticker, fundamentals, news):
+    """
+    Prompt for one summary, compacted to FINGPT_PROMPT_TOKENS (see
+    prompt_builder.py). Logs the token count and the tokens saved.
+    """
+    prompt, report = prompt_builder.build(ticker, fundamentals, news, MODEL)
+    print(f"✂️ Prompt for {ticker}: {report['tokens']} tokens, {report['saved']} saved "
+          f"({report['used']}/{report['headlines']} headlines, {report['duplicates']} duplicates)")
+    return prompt
 
----
 
-### FUNDAMENTALS
-{fundamentals_text}
+def chat_request(ticker, fundamentals, news):
+    """Chat completion parameters for one summary (shared by the sync, streaming and batch paths)."""
+    return {
+        "model": MODEL,
+        "messages": [{"role": "user", "content": build_prompt(ticker, fundamentals, news)}],
+        "max_tokens": 500,
+        "temperature": 0.6,
+    }
 
-### RECENT NEWS & MARKET EVENTS
-{news_text[:2000] if news_text else "No recent news available."}
 
----
+def normalize_summary(summary):
+    """Normalize paragraph spacing for UI formatting."""
+    return "\n\n".join([p.strip() for p in summary.strip().split("\n") if p.strip()])
 
-### OUTPUT INSTRUCTIONS
-Write three clearly separated paragraphs (no bullet points):
-1️ **Overview** — Describe what the company does, its sector, valuation ratios, market position, and key financial highlights.
-2️ **Recent Developments** — Summarize at least two meaningful updates from the recent news or analyst commentary.
-3️ **Risks & Outlook** — Provide a brief risk analysis and investor outlook based on financial or macro trends.
 
-Use a neutral, professional tone (similar to a Morningstar or Goldman Sachs summary).
-Keep the response under 250 words.
-Do NOT include section headers or markdown symbols — just clean paragraphs separated by a blank line.
-"""
+def _generate_summary(ticker, fundamentals, news):
+    with span("openai.chat", model=MODEL) as s:
+        response = get_client().chat.completions.create(**chat_request(ticker, fundamentals, news))
+        content = response.choices[0].message.content or ""
+        s.set(bytes=len(content.encode("utf-8")))
+    return normalize_summary(content)
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=500,
-            temperature=0.6,
-        )
-        summary = response.choices[0].message.content.strip()
 
-        # Normalize paragraph spacing for UI formatting
-        summary = "\n\n".join([p.strip() for p in summary.split("\n") if p.strip()])
+def summarize_text(ticker, fundamentals, news):
+    """
+    Generate a structured 3-paragraph equity summary:
+    Overview
+    Recent Developments
+    Risks & Outlook
 
+    `news` is the list of news items (or newline-joined headline text).
+    Summaries are cached by content hash (FINGPT_TTL_LLM seconds, persisted
+    across restarts), and concurrent calls for the same inputs share one
+    OpenAI request.
+    """
+    key = summary_cache_key(ticker, fundamentals, news)
+    cached_summary = get_cache().get("llm", key)
+    observe("llm.lookup", 0.0, cache="hit" if cached_summary else "miss")
+    if cached_summary:
+        return cached_summary
+
+    def generate():
+        # Another caller may have finished while we waited to lead
+        summary = get_cache().get("llm", key)
+        if not summary:
+            summary = _generate_summary(ticker, fundamentals, news)
+            get_cache().set("llm", key, summary)
         return summary
 
+    try:
+        return single_flight(("llm", key), generate)
+    except Exception as e:
+        print(f"❌ Summarization error: {e}")
+        return FALLBACK_SUMMARY
+
+
+def summarize_text_stream(ticker, fundamentals, news):
+    """
+    Streaming variant of `summarize_text`: yields text chunks as the model
+    produces them. A cached summary is yielded in one piece, and a completed
+    stream is written back to the same cache. If the stream fails after some
+    text went out, the last item is STREAM_INCOMPLETE instead of a chunk.
+
+    Like `summarize_text`, concurrent calls for the same inputs share one
+    OpenAI request: only the first streams, the rest get its finished
+    summary in one piece.
+    """
+    key = summary_cache_key(ticker, fundamentals, news)
+    cached_summary = get_cache().get("llm", key)
+    observe("llm.lookup", 0.0, cache="hit" if cached_summary else "miss")
+    if cached_summary:
+        yield cached_summary
+        return
+
+    future, leader = join_flight(("llm", key))
+    if not leader:
+        try:
+            summary = future.result()
+        except Exception:
+            summary = None  # the leader already logged it
+        yield summary or FALLBACK_SUMMARY
+        return
+
+    chunks, summary, error = [], None, None
+    started = time.perf_counter()
+    try:
+        # Another caller may have finished while we waited to lead
+        summary = get_cache().get("llm", key)
+        if summary:
+            yield summary
+            return
+        stream = get_client().chat.completions.create(**chat_request(ticker, fundamentals, news), stream=True)
+        for event in stream:
+            if not event.choices:
+                continue
+            delta = event.choices[0].delta.content
+            if delta:
+                chunks.append(delta)
+                yield delta
+        observe("openai.stream", time.perf_counter() - started, bytes=len("".join(chunks).encode("utf-8")), model=MODEL)
+        summary = normalize_summary("".join(chunks))
+        if summary:
+            get_cache().set("llm", key, summary)
     except Exception as e:
+        error = e
+        observe("openai.stream", time.perf_counter() - started, error=e, model=MODEL)
         print(f"❌ Summarization error: {e}")
-        return "AI summary unavailable — check your OpenAI API key or network connection."
+        yield STREAM_INCOMPLETE if chunks else FALLBACK_SUMMARY
+    finally:
+        # Also runs if the consumer abandons the stream, so followers never hang
+        if summary:
+            land_flight(("llm", key), future, result=summary)
+        else:
+            land_flight(("llm", key), future, error=error or RuntimeError("summary stream ended without text"))
 
 
 def analyze_sentiment(summary):
     """
-    Simple rule-based sentiment analyzer using keywords from AI summary tone.
+    Rule-based sentiment label ("positive" / "neutral" / "negative") for an AI
+    summary; see sentiment.py for the weighted, negation-aware scorer.
     """
-    text = summary.lower()
-    positive_keywords = ["growth", "strong", "beat", "bullish", "improved", "upside", "profit", "resilient", "momentum"]
-    negative_keywords = ["decline", "weak", "bearish", "loss", "downgrade", "headwind", "slowdown", "risk"]
-
-    if any(word in text for word in positive_keywords):
-        return "positive"
-    elif any(word in text for word in negative_keywords):
-        return "negative"
-    else:
-        return "neutral"
+    return label(sentiment_score(summary))
@@ -0,0 +1,244 @@
+# warmer.py
+# Background cache warmer: on a schedule, pre-fetches what the Portfolio
+# Tracker and Analyze views need for every portfolio and watchlist ticker and
+# writes it into the shared cache / history store the web process reads.
+# Run: python warmer.py [--once]
+import argparse
+import datetime
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import schedule
+from dotenv import load_dotenv
+
+import history_store
+from analytics import BENCHMARK
+from av_scheduler import BACKGROUND, INTERACTIVE_RESERVE, QuotaExceeded, request_priority, usage
+from cache import get_cache, make_key
+from data_fetcher import get_portfolio_news, get_stock_data
+from instrumentation import profile_run, span, write_metrics
+from portfolio import load_portfolio
+from sentiment import sentiment_score
+from sentiment_store import record
+from summarizer import summarize_text, summary_cache_key
+
+load_dotenv()
+
+# Comma-separated daily run times ("HH:MM", local time), or a fixed interval
+WARM_AT = [t.strip() for t in os.getenv("FINGPT_WARM_AT", "06:00,12:30").split(",") if t.strip()]
+WARM_INTERVAL_MINUTES = int(os.getenv("FINGPT_WARM_INTERVAL_MINUTES", "0"))
+WARM_WORKERS = int(os.getenv("FINGPT_WARM_WORKERS", "4"))
+WATCHLIST = os.getenv("FINGPT_WATCHLIST", "")
+# Input fingerprints only need to outlive the gap between runs
+FINGERPRINT_TTL = 7 * 24 * 3600
+# Cache entry holding when the last pass finished
+LAST_PASS_KEY = "_last_pass"
+# Alpha Vantage calls per ticker: daily bars, plus OVERVIEW + INCOME_STATEMENT if not cached
+HISTORY_CALLS = 1
+FUNDAMENTALS_CALLS = 2
+
+
+# ----------------------------
+# Tickers
+# ----------------------------
+def _split(tickers):
+    if isinstance(tickers, str):
+        tickers = tickers.split(",")
+    return [t.strip().upper() for t in tickers or [] if t and t.strip()]
+
+
+def watched_tickers(include_users=True):
+    """Portfolio tickers, FINGPT_WATCHLIST, and every enabled user's watchlist."""
+    tickers = [h["ticker"] for h in load_portfolio()] + _split(WATCHLIST)
+    if include_users and os.getenv("SUPABASE_URL") and os.getenv("SUPABASE_KEY"):
+        try:
+            from alert_job import iter_configs, supabase_page_fetcher
+            for config in iter_configs(supabase_page_fetcher()):
+                tickers += _split(config.get("tickers"))
+        except Exception as e:
+            print(f"⚠️ Could not load user watchlists: {e}")
+    return list(dict.fromkeys(_split(tickers)))
+
+
+# ----------------------------
+# Warming
+# ----------------------------
+def _quota_left():
+    """
+    Alpha Vantage calls background work may still spend today, read from the
+    shared quota row, so calls made by the web app and other jobs count too.
+    """
+    return usage()["day_remaining"] - INTERACTIVE_RESERVE - 1
+
+
+class _Budget:
+    """
+    Calls the current pass may still start; tickers claim theirs before any
+    request goes out. Each claim also re-checks the shared quota, since other
+    processes keep spending it while the pass runs.
+    """
+
+    def __init__(self, calls):
+        self.calls = calls
+        self._lock = threading.Lock()
+
+    def claim(self, calls):
+        with self._lock:
+            if calls > self.calls or calls > _quota_left():
+                return False
+            self.calls -= calls
+            return True
+
+
+def _fingerprint(ticker, fundamentals, news):
+    bar = history_store.last_bar_date(ticker)
+    return make_key(summary_cache_key(ticker, fundamentals, news), bar.date().isoformat() if bar is not None else None)
+
+
+def warm_ticker(ticker, news, budget=None):
+    """
+    Refresh history, fundamentals and the AI summary for one ticker.
+    Returns "warmed", "unchanged", "partial" or "failed".
+    """
+    cache = get_cache()
+    status = "warmed"
+    budget = budget or _Budget(_quota_left())
+    needed = HISTORY_CALLS + (0 if get_stock_data.peek(ticker) else FUNDAMENTALS_CALLS)
+    # The ticker goes in the log line, not a span label: one series per ticker would swamp the metrics
+    print(f"🔥 Warming {ticker}")
+    with span("warmer.ticker"), request_priority(BACKGROUND):
+        if budget.claim(needed):
+            try:
+                history_store.refresh(ticker)
+            except QuotaExceeded as e:
+                print(f"⏸️ History for {ticker} skipped: {e}")
+                status = "partial"
+            except Exception as e:
+                print(f"⚠️ History refresh failed for {ticker}: {e}")
+                status = "partial"
+            fundamentals = get_stock_data(ticker)
+        else:
+            # Never spend the interactive reserve; use whatever is already cached
+            fundamentals = get_stock_data.peek(ticker)
+            status = "partial"
+
+        if not fundamentals:
+            # Without fundamentals the summary would differ from the app's anyway
+            return "partial"
+
+        fingerprint = _fingerprint(ticker, fundamentals, news)
+        key = summary_cache_key(ticker, fundamentals, news)
+        summary = cache.get("llm", key)
+        if cache.get("warm", ticker) == fingerprint and summary:
+            # Already recorded when this summary was generated; a repeat point would skew the history
+            return "unchanged"
+        summarize_text(ticker, fundamentals, news)
+        summary = cache.get("llm", key)
+        if not summary:
+            return "partial"
+        cache.set("warm", ticker, fingerprint, FINGERPRINT_TTL)
+        record(ticker, sentiment_score(summary), "warmer")
+    return status
+
+
+def warm(tickers=None, workers=WARM_WORKERS):
+    """One warming pass. Returns per-status counts."""
+    start = time.perf_counter()
+    tickers = watched_tickers() if tickers is None else _split(tickers)
+    stats = {"tickers": len(tickers), "warmed": 0, "unchanged": 0, "partial": 0, "failed": 0}
+    if not tickers:
+        print("ℹ️ Nothing to warm.")
+        return stats
+
+    av_before = usage()["calls"]
+    print(f"🔥 Warming {len(tickers)} tickers...")
+    with profile_run("warmer"):
+        # News for every ticker in one parallel pass; it also fills the per-ticker cache
+        news = get_portfolio_news(tickers)
+        # The Tracker's beta needs the benchmark's bars too (history only)
+        if BENCHMARK and _quota_left() > 0:
+            with request_priority(BACKGROUND):
+                try:
+                    history_store.refresh(BENCHMARK)
+                except Exception as e:
+                    print(f"⚠️ Benchmark {BENCHMARK} history not refreshed: {e}")
+
+        budget = _Budget(_quota_left())
+
+        def run(ticker):
+            try:
+                return warm_ticker(ticker, news.get(ticker, []), budget)
+            except Exception as e:
+                print(f"❌ Warming {ticker} failed: {e}")
+                return "failed"
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for status in pool.map(run, tickers):
+                stats[status] += 1
+
+    stats["alpha_vantage_calls"] = usage()["calls"] - av_before
+    get_cache().set("warm", LAST_PASS_KEY, time.time(), FINGERPRINT_TTL)
+    stats["seconds"] = round(time.perf_counter() - start, 2)
+    print(f"✅ Warm pass done: {stats}")
+    metrics_file = os.getenv("FINGPT_METRICS_FILE")
+    if metrics_file:
+        write_metrics(metrics_file)
+    return stats
+
+
+# ----------------------------
+# Schedule
+# ----------------------------
+def _startup_due(now=None):
+    """
+    Whether a restart should warm right away: only when the cache is cold (no
+    pass on record) or a scheduled pass was missed since the last one.
+    """
+    last = get_cache().get("warm", LAST_PASS_KEY)
+    if last is None:
+        return True
+    now = time.time() if now is None else now
+    if WARM_INTERVAL_MINUTES > 0:
+        return now - last >= WARM_INTERVAL_MINUTES * 60
+    current = datetime.datetime.fromtimestamp(now)
+    for at in WARM_AT:
+        hour, minute = (int(part) for part in at.split(":")[:2])
+        slot = current.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if slot > current:
+            slot -= datetime.timedelta(days=1)
+        if slot.timestamp() > last:
+            return True
+    return False
+
+
+def run_forever():
+    if WARM_INTERVAL_MINUTES > 0:
+        schedule.every(WARM_INTERVAL_MINUTES).minutes.do(warm)
+        print(f"⏰ Warming every {WARM_INTERVAL_MINUTES} minutes")
+    else:
+        for at in WARM_AT:
+            schedule.every().day.at(at).do(warm)
+        print(f"⏰ Warming daily at {', '.join(WARM_AT)}")
+
+    # Warm right away if a fresh deploy would otherwise wait for the first
+    # slot; a plain restart shouldn't burn a pass's worth of quota again
+    if _startup_due():
+        warm()
+    else:
+        print("ℹ️ Last warm pass is recent; waiting for the next slot")
+    while True:
+        schedule.run_pending()
+        time.sleep(30)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-compute Portfolio Tracker and Analyze data.")
+    parser.add_argument("--once", action="store_true", help="run a single warming pass and exit")
+    parser.add_argument("tickers", nargs="*", help="warm only these tickers")
+    args = parser.parse_args()
+    if args.once or args.tickers:
+        warm(args.tickers or None)
+    else:
+        run_forever()
@@ -0,0 +1,212 @@
+# worker.py
+# Background worker for the job queue (jobs.py): runs what the web process
+# enqueues (Analyze prefetches, test emails, sentiment scans) and schedules
+# the daily sentiment scan.
+# Run: python worker.py [--concurrency 2] [--once]
+import argparse
+import os
+import threading
+import time
+import traceback
+
+import schedule
+from dotenv import load_dotenv
+
+import jobs
+from instrumentation import profile_run, span, write_metrics
+
+load_dotenv()
+
+WORKER_CONCURRENCY = int(os.getenv("FINGPT_WORKER_CONCURRENCY", "2"))
+POLL_SECONDS = float(os.getenv("FINGPT_WORKER_POLL_SECONDS", "1"))
+# Comma-separated daily times ("HH:MM", local time) for the portfolio sentiment scan; empty disables it
+SCAN_AT = [t.strip() for t in os.getenv("FINGPT_SCAN_AT", "07:00").split(",") if t.strip()]
+
+
+# ----------------------------
+# Handlers
+# ----------------------------
+# Each takes the job's args dict and returns a JSON-serializable result;
+# raising marks the attempt failed (and retried with backoff).
+def analyze_prefetch(args):
+    """Warm the Analyze page's data for one ticker: history, fundamentals, news and the AI summary."""
+    from data_fetcher import get_extended_news
+    from warmer import warm_ticker
+
+    ticker = args["ticker"].strip().upper()
+    status = warm_ticker(ticker, get_extended_news(ticker))
+    if status == "failed":
+        raise RuntimeError(f"prefetch failed for {ticker}")
+    return {"ticker": ticker, "status": status}
+
+
+def send_test_email(args):
+    """Revalue the portfolio and email the daily summary to one address."""
+    from alerts import generate_daily_summary, send_email
+
+    content, report_path = generate_daily_summary()
+    try:
+        os.remove(report_path)
+    except OSError:
+        pass
+    if send_email(args["email"], content) is None:
+        raise RuntimeError(f"email to {args['email']} was not sent")
+    return {"email": args["email"]}
+
+
+def sentiment_scan(args):
+    """
+    Run monitor_sentiment over the portfolio (emails ALERT_EMAIL its new rule
+    alerts). Summaries use the OpenAI Batch API only when `batch` is set (the
+    scheduled scans): a batch can hold this worker thread for up to
+    FINGPT_BATCH_TIMEOUT_MINUTES, too long for a scan someone is waiting on.
+    """
+    from alerts import monitor_sentiment
+
+    kwargs = {k: args[k] for k in ("threshold",) if k in args}
+    outcome = monitor_sentiment(batch=bool(args.get("batch", False)), **kwargs)
+    return {
+        "bearish": [t for t, _, _ in outcome["bearish"]],
+        "alerts": len(outcome["alerts"]),
+        "tickers": outcome["stats"]["tickers"],
+        "status_counts": outcome["stats"]["status_counts"],
+    }
+
+
+HANDLERS = {
+    "analyze_prefetch": analyze_prefetch,
+    "send_test_email": send_test_email,
+    "sentiment_scan": sentiment_scan,
+}
+
+
+# ----------------------------
+# Worker
+# ----------------------------
+class Worker:
+    """`concurrency` threads claiming and running jobs, plus a lease-renewal thread."""
+
+    def __init__(self, queue=None, concurrency=WORKER_CONCURRENCY, handlers=None, poll=POLL_SECONDS):
+        self.queue = queue or jobs.get_queue()
+        self.concurrency = max(1, concurrency)
+        self.handlers = handlers or HANDLERS
+        self.poll = poll
+        self.name = jobs.worker_name()
+        self.stop_event = threading.Event()
+        self._running = {}  # job id -> lease owner of the thread running it
+        self._running_lock = threading.Lock()
+        self.processed = 0
+
+    def run_one(self, slot=0):
+        """
+        Claim and run one job; returns False when nothing was due. Each job
+        thread (`slot`) holds leases under its own owner name, so a thread
+        can't settle a job another thread re-claimed after its lease lapsed.
+        """
+        owner = f"{self.name}/{slot}"
+        job = self.queue.claim(owner, kinds=list(self.handlers))
+        if job is None:
+            return False
+        with self._running_lock:
+            self._running[job["id"]] = owner
+        try:
+            print(f"▶️ Job {job['id']} {job['kind']} {job['args']} (attempt {job['attempts']}/{job['max_attempts']})")
+            with span("job", kind=job["kind"]):
+                result = self.handlers[job["kind"]](job["args"])
+            if self.queue.complete(job["id"], owner, result):
+                print(f"✅ Job {job['id']} {job['kind']} done")
+            else:
+                print(f"⚠️ Job {job['id']} {job['kind']} finished after its lease lapsed; result dropped")
+        except Exception as e:
+            status = self.queue.fail(job["id"], owner, f"{type(e).__name__}: {e}")
+            if status is None:
+                print(f"⚠️ Job {job['id']} {job['kind']} failed after its lease lapsed: {e}")
+            else:
+                print(f"❌ Job {job['id']} {job['kind']} failed ({'will retry' if status == jobs.QUEUED else 'giving up'}): {e}")
+                print(traceback.format_exc())
+        finally:
+            with self._running_lock:
+                # Another thread may have re-claimed it meanwhile; keep renewing that one
+                if self._running.get(job["id"]) == owner:
+                    del self._running[job["id"]]
+            self.processed += 1
+        return True
+
+    def _loop(self, slot):
+        while not self.stop_event.is_set():
+            try:
+                if not self.run_one(slot):
+                    self.stop_event.wait(self.poll)
+            except Exception as e:
+                # The queue itself failed (e.g. database locked too long); back off and keep going
+                print(f"⚠️ Worker loop error: {e}")
+                self.stop_event.wait(self.poll * 5)
+
+    def _renew_leases(self):
+        while not self.stop_event.wait(jobs.LEASE_SECONDS / 3):
+            by_owner = {}
+            with self._running_lock:
+                for job_id, owner in self._running.items():
+                    by_owner.setdefault(owner, []).append(job_id)
+            try:
+                for owner, job_ids in by_owner.items():
+                    self.queue.renew(job_ids, owner)
+            except Exception as e:
+                print(f"⚠️ Could not renew job leases: {e}")
+
+    def start(self):
+        threads = [threading.Thread(target=self._renew_leases, name="job-lease", daemon=True)]
+        threads += [threading.Thread(target=self._loop, args=(i,), name=f"job-worker-{i}", daemon=True)
+                    for i in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def drain(self):
+        """Run due jobs until none are left (single-threaded); returns how many ran."""
+        ran = 0
+        while self.run_one():
+            ran += 1
+        return ran
+
+
+def schedule_scans(queue):
+    def enqueue_scan():
+        from batch_summarizer import BATCH_ENABLED
+
+        job_id = queue.enqueue("sentiment_scan", {"batch": BATCH_ENABLED}, dedupe_key="sentiment_scan")
+        print(f"🗓️ Sentiment scan queued (job {job_id})")
+
+    for at in SCAN_AT:
+        schedule.every().day.at(at).do(enqueue_scan)
+    schedule.every().day.at("03:00").do(lambda: queue.purge())
+    if SCAN_AT:
+        print(f"⏰ Sentiment scan daily at {', '.join(SCAN_AT)}")
+
+
+def run_forever(concurrency=WORKER_CONCURRENCY):
+    worker = Worker(concurrency=concurrency)
+    schedule_scans(worker.queue)
+    worker.start()
+    print(f"👷 Worker {worker.name} running {worker.concurrency} job thread(s) on {worker.queue.path}")
+    try:
+        while True:
+            schedule.run_pending()
+            time.sleep(30)
+    except KeyboardInterrupt:
+        worker.stop_event.set()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run queued background jobs.")
+    parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY, help="jobs run at the same time")
+    parser.add_argument("--once", action="store_true", help="run every due job, then exit")
+    args = parser.parse_args()
+    if args.once:
+        with profile_run("worker"):
+            ran = Worker(concurrency=1).drain()
+        print(f"✅ Ran {ran} job(s)")
+        if os.getenv("FINGPT_METRICS_FILE"):
+            write_metrics(os.getenv("FINGPT_METRICS_FILE"))
+    else:
+        run_forever(args.concurrency)